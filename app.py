@@ -1,14 +1,40 @@
 # app.py
+import time
+# Importações do script: no primeiro rerun do processo elas são frias e entram no perfil de partida
+SCRIPT_IMPORTS_STARTED = time.perf_counter()
+import atexit
+import functools
+import json
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-import plotly.express as px
-from pyvis.network import Network
+import plotly.io as pio
 import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from collections import deque
 from datetime import datetime, timedelta
 from contextlib import contextmanager
 
+from guardian.diagnostics import Diagnostics
+from guardian.evaluation import LabelReplay, ModelEvaluator
+from guardian.figcache import FigureCache
+from guardian.inference import FEATURE_COLUMNS, HIGH_RISK, BatchInference, head_weights, user_features, write_predictions
+from guardian.ingest import IngestionService, parse_source
+from guardian.jobs import CANCELLED, DONE, JobExecutor
+from guardian.metrics import MetricsStore
+from guardian.optimizer import VELOCITY_CHECK_MULT, ThresholdOptimizer, candidate_costs
+from guardian.profiler import RerunProfile, StartupProfile
+from guardian.registry import ModelRegistry
+from guardian.scoring import peer_means, score_users
+from guardian.shared import OverlayRegistry, SharedDataset
+from guardian.storage import DEFAULT_DATA_DIR
+from guardian.synthetic import DATA_PROFILES, LEGIT_TYPOLOGY, ensure_synthetic_dataset
+from guardian.training import LogisticModel, ModelTrainer, holdout_start, transaction_features
+
+SCRIPT_IMPORTS_MS = (time.perf_counter() - SCRIPT_IMPORTS_STARTED) * 1e3
+
 # ==============================================================================
 # --- CONFIGURAÇÃO DA PÁGINA E TEMA ---
 # ==============================================================================
@@ -19,6 +45,24 @@ st.set_page_config(
     layout="wide",
 )
 
+# Início deste rerun (a latência total é medida e exibida na navegação entre atos)
+RERUN_STARTED = time.perf_counter()
+RERUN_PROFILE = RerunProfile(RERUN_STARTED)
+
+# Módulos pesados carregados só quando o painel que os usa é renderizado (ou pelo warm-up)
+LAZY_MODULES = ("plotly.express", "pyvis.network")
+
+@st.cache_resource
+def get_startup_profile():
+    """Perfil de partida do processo, criado no primeiro rerun (com as importações ainda frias dele)."""
+    return StartupProfile(SCRIPT_IMPORTS_MS)
+
+def lazy_import(name):
+    """Módulo importado na primeira vez que é usado; o custo dessa importação vai para o perfil."""
+    return get_startup_profile().import_module(name)
+
+get_startup_profile()
+
 # Dicionários de tema para light e dark mode
 LIGHT_THEME = {
     "primary": "#1976D2",
@@ -56,6 +100,15 @@ DARK_THEME = {
     "highlight": "#FF9800"
 }
 
+THEMES = {"light": LIGHT_THEME, "dark": DARK_THEME}
+
+# Paleta em que as figuras são construídas e cacheadas; nos demais temas elas só trocam de cores
+BASE_THEME = "light"
+
+def theme_name(theme):
+    """Nome de um dicionário de tema em ``THEMES``."""
+    return next(name for name, palette in THEMES.items() if palette == theme)
+
 # Function to get current theme
 def get_current_theme():
     # Initialize theme in session state if not exists
@@ -65,67 +118,61 @@ def get_current_theme():
 
 # Set current theme
 APP_THEME = get_current_theme()
+APP_THEME_NAME = theme_name(APP_THEME)
+
+# Variáveis CSS de cor e a chave de cada uma nos dicionários de tema
+THEME_CSS_VARIABLES = {
+    "primary-color": "primary", "secondary-color": "secondary", "danger-color": "danger",
+    "warning-color": "warning", "success-color": "success", "info-color": "info",
+    "background-color": "background", "widget-background-color": "widget_background",
+    "secondary-background": "secondary_background", "text-color": "text", "text-secondary": "text_secondary",
+    "subtle-text-color": "subtle_text", "grid-color": "grid", "accent-color": "accent", "highlight-color": "highlight",
+}
 
-# CSS Personalizado que utiliza as variáveis do tema
-st.markdown(f"""
-<style>
+# Folha de estilo fixa: as cores vêm só das variáveis acima, então ela é a mesma em todos os temas
+APP_STYLESHEET = """
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
     
-    :root {{
-        --primary-color: {APP_THEME['primary']};
-        --secondary-color: {APP_THEME['secondary']};
-        --danger-color: {APP_THEME['danger']};
-        --warning-color: {APP_THEME['warning']};
-        --success-color: {APP_THEME['success']};
-        --info-color: {APP_THEME['info']};
-        --background-color: {APP_THEME['background']};
-        --widget-background-color: {APP_THEME['widget_background']};
-        --secondary-background: {APP_THEME['secondary_background']};
-        --text-color: {APP_THEME['text']};
-        --text-secondary: {APP_THEME['text_secondary']};
-        --subtle-text-color: {APP_THEME['subtle_text']};
-        --grid-color: {APP_THEME['grid']};
-        --accent-color: {APP_THEME['accent']};
-        --highlight-color: {APP_THEME['highlight']};
+    :root {
         --font-family: 'Inter', 'Segoe UI', 'Roboto', 'Helvetica', 'Arial', sans-serif;
-    }}
+    }
     
-    .stApp {{
+    .stApp {
         background-color: var(--background-color);
-    }}
+    }
     
-    .main {{
+    .main {
         padding: 1.5rem 1rem;
-    }}
+    }
     
-    h1, h2, h3, h4, h5, h6 {{
+    h1, h2, h3, h4, h5, h6 {
         font-family: var(--font-family);
         font-weight: 600;
         color: var(--text-color);
-    }}
+    }
     
-    h1 {{
+    h1 {
         color: var(--primary-color);
         font-size: 2.5rem;
         margin-bottom: 0.5rem;
-    }}
+    }
     
-    .widget-container {{
+    .widget-container {
         padding: 1.5rem;
         border-radius: 8px;
         background-color: var(--widget-background-color);
         border: 1px solid var(--grid-color);
         margin-bottom: 1rem;
         box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }}
+    }
     
-    .stTabs [data-baseweb="tab-list"] {{
+    .stTabs [data-baseweb="tab-list"] {
         gap: 24px;
         border-bottom: 2px solid var(--grid-color);
         padding: 0 1rem;
-    }}
+    }
     
-    .stTabs [data-baseweb="tab"] {{
+    .stTabs [data-baseweb="tab"] {
         height: 50px;
         background-color: transparent;
         border-radius: 4px 4px 0px 0px;
@@ -133,19 +180,19 @@ st.markdown(f"""
         font-weight: 500;
         transition: all 0.3s ease;
         color: var(--text-secondary);
-    }}
+    }
     
-    .stTabs [aria-selected="true"] {{
+    .stTabs [aria-selected="true"] {
         background-color: var(--primary-color);
         color: white;
         font-weight: 600;
-    }}
+    }
     
-    .stTabs [aria-selected="false"]:hover {{
+    .stTabs [aria-selected="false"]:hover {
         background-color: var(--secondary-background);
-    }}
+    }
     
-    .user-card {{
+    .user-card {
         border-left: 4px solid var(--subtle-text-color);
         padding: 1rem;
         margin-bottom: 0.8rem;
@@ -153,172 +200,344 @@ st.markdown(f"""
         border-radius: 6px;
         border: 1px solid var(--grid-color);
         transition: all 0.3s ease;
-    }}
+    }
     
-    .user-card:hover {{
+    .user-card:hover {
         transform: translateX(3px);
         box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-    }}
+    }
     
-    .user-card.high-risk {{
+    .user-card.high-risk {
         border-left-color: var(--danger-color);
         background-color: rgba(211,47,47,0.05);
-    }}
+    }
     
-    .user-card.medium-risk {{
+    .user-card.medium-risk {
         border-left-color: var(--warning-color);
         background-color: rgba(255,152,0,0.05);
-    }}
+    }
     
-    .user-card.selected {{
+    .user-card.selected {
         border-left-color: var(--primary-color);
         background-color: rgba(25,118,210,0.05);
         box-shadow: 0 0 10px rgba(25,118,210,0.3);
-    }}
+    }
     
-    .stButton > button {{
+    .stButton > button {
         border: none;
         border-radius: 6px;
         font-weight: 500;
         padding: 0.5rem 1rem;
         transition: all 0.2s ease;
-    }}
+    }
     
-    .stButton > button:hover {{
+    .stButton > button:hover {
         transform: translateY(-1px);
         box-shadow: 0 4px 8px rgba(0,0,0,0.15);
-    }}
+    }
     
-    .stButton > button[kind="primary"] {{
+    .stButton > button[kind="primary"] {
         background-color: var(--primary-color);
         color: white;
-    }}
+    }
     
-    .stButton > button[kind="secondary"] {{
+    .stButton > button[kind="secondary"] {
         background-color: var(--secondary-background);
         color: var(--text-color);
         border: 1px solid var(--grid-color);
-    }}
+    }
     
-    .status-indicator {{
+    .status-indicator {
         display: inline-block;
         width: 10px;
         height: 10px;
         border-radius: 50%;
         margin-right: 6px;
         animation: pulse 2s infinite;
-    }}
+    }
     
-    .status-online {{
+    .status-online {
         background-color: var(--success-color);
-    }}
+    }
     
-    .status-warning {{
+    .status-warning {
         background-color: var(--warning-color);
-    }}
+    }
     
-    .status-critical {{
+    .status-critical {
         background-color: var(--danger-color);
-    }}
+    }
     
-    @keyframes pulse {{
-        0% {{ opacity: 1; }}
-        50% {{ opacity: 0.6; }}
-        100% {{ opacity: 1; }}
-    }}
+    @keyframes pulse {
+        0% { opacity: 1; }
+        50% { opacity: 0.6; }
+        100% { opacity: 1; }
+    }
     
-    .stExpander > details > summary {{
+    .stExpander > details > summary {
         background-color: var(--secondary-background);
         border: 1px solid var(--grid-color);
         border-radius: 6px;
         padding: 0.8rem;
         font-weight: 500;
-    }}
+    }
     
-    .stProgress > div > div {{
+    .stProgress > div > div {
         background-color: var(--primary-color);
         border-radius: 4px;
-    }}
+    }
     
-    hr {{
+    hr {
         border: none;
         height: 1px;
         background-color: var(--grid-color);
         margin: 1.5rem 0;
-    }}
+    }
     
     /* Limpar alguns estilos indesejados */
-    .stSelectbox > div > div {{
+    .stSelectbox > div > div {
         background-color: var(--widget-background-color);
         border: 1px solid var(--grid-color);
         border-radius: 4px;
-    }}
+    }
     
-    .stSlider > div > div {{
+    .stSlider > div > div {
         background-color: var(--grid-color);
-    }}
+    }
     
-    .stSlider > div > div > div {{
+    .stSlider > div > div > div {
         background-color: var(--primary-color);
-    }}
+    }
     
     /* Dark mode improvements */
-    .stMarkdown, .stMarkdown p {{
+    .stMarkdown, .stMarkdown p {
         color: var(--text-color) !important;
-    }}
+    }
     
-    .stDataFrame {{
+    .stDataFrame {
         background-color: var(--widget-background-color) !important;
         color: var(--text-color) !important;
-    }}
+    }
     
-    .stSidebar {{
+    .stSidebar {
         background-color: var(--secondary-background) !important;
-    }}
+    }
     
     /* Theme toggle button styling */
-    .stButton > button[key="theme_toggle"] {{
+    .stButton > button[key="theme_toggle"] {
         background: linear-gradient(135deg, var(--primary-color), var(--accent-color));
         color: white;
         border: none;
         font-weight: 600;
         box-shadow: 0 2px 10px rgba(0,0,0,0.2);
-    }}
+    }
     
-    .stButton > button[key="theme_toggle"]:hover {{
+    .stButton > button[key="theme_toggle"]:hover {
         box-shadow: 0 4px 15px rgba(0,0,0,0.3);
         transform: translateY(-2px);
-    }}
+    }
     
     /* Smooth transitions for theme changes */
-    * {{
+    * {
         transition: background-color 0.3s ease, color 0.3s ease, border-color 0.3s ease;
-    }}
-</style>
-""", unsafe_allow_html=True)
+    }
+"""
+
+@st.cache_resource
+def theme_stylesheet(name):
+    """CSS completo do tema ``name`` (variáveis de cor + folha fixa), montado uma vez por processo."""
+    variables = "\n".join(f"        --{variable}: {THEMES[name][key]};" for variable, key in THEME_CSS_VARIABLES.items())
+    return f"<style>{APP_STYLESHEET}\n    :root {{\n{variables}\n    }}\n</style>\n"
+
+st.markdown(theme_stylesheet(APP_THEME_NAME), unsafe_allow_html=True)
+RERUN_PROFILE.lap("Configuração e tema")
 
 
 # ==============================================================================
 # --- GERAÇÃO DE DADOS MOCK ---
 # ==============================================================================
 
-@st.cache_data
-def generate_br_mock_data():
-    np.random.seed(42)
-    now = datetime.now()
-    users_data = []
-    shared_device = "dev_shared_SP_A7B8"
-    for i in range(8): users_data.append({"user_id": f"multi_acct_sp_{i+1}", "risk_score": 920 + i*5, "main_risk_factor": "Anel de Fraude (Multi-Conta)", "device_id": shared_device, "payment_method_id": f"pix_key_{i}", "payment_type": "PIX", "ip_asn": "AS28573 (Vivo/Telefonica)", "registration_time": now - timedelta(hours=2, minutes=i*7), "state": "SP", "lat": -23.5505, "lon": -46.6333, "status": "active", "total_deposited": 250, "avg_bet_value": 75.50, "session_time_sec": 45, "peer_group": "Apostador Casual"})
-    users_data.append({"user_id": "cpf_fraud_rj_01", "risk_score": 980, "main_risk_factor": "Fraude de Identidade (CPF)", "device_id": "dev_vm_cloud_01", "payment_method_id": "card_hash_...1122", "payment_type": "Cartão de Crédito", "ip_asn": "AS262372 (Amazon AWS)", "registration_time": now - timedelta(days=2), "state": "RJ", "lat": -22.9068, "lon": -43.1729, "status": "active", "total_deposited": 5000, "avg_bet_value": 500.00, "session_time_sec": 120, "peer_group": "High Roller"})
-    users_data.append({"user_id": "bonus_hunter_ba", "risk_score": 710, "main_risk_factor": "Abuso de Bônus", "device_id": "dev_mobile_proxy_01", "payment_method_id": "boleto_...3344", "payment_type": "Boleto", "ip_asn": "AS_Proxy_Network", "registration_time": now - timedelta(hours=3), "state": "BA", "lat": -12.9777, "lon": -38.5016, "status": "active", "total_deposited": 50, "avg_bet_value": 10.00, "session_time_sec": 30, "peer_group": "Caçador de Bônus"})
-    users_data.append({"user_id": "pix_chargeback_mg", "risk_score": 850, "main_risk_factor": "Chargeback Fraudulento", "device_id": "dev_mobile_mg_99", "payment_method_id": "pix_key_disposable", "payment_type": "PIX", "ip_asn": "AS28573 (Claro)", "registration_time": now - timedelta(days=10), "state": "MG", "lat": -19.9167, "lon": -43.9345, "status": "active", "total_deposited": 1500, "avg_bet_value": 150.00, "session_time_sec": 85, "peer_group": "Apostador Casual"})
-    df_users = pd.DataFrame(users_data)
-    
-    bets_data = [{'odd': np.random.uniform(1.1, 5.0), 'value': np.random.uniform(5, 100), 'type': 'Padrão'} for _ in range(400)]
-    bets_data.extend([{'odd': np.random.uniform(8.0, 25.0), 'value': np.random.uniform(200, 500), 'type': 'Anômala'} for _ in range(20)])
-    df_bets = pd.DataFrame(bets_data)
+# Perfil de dados sintéticos ("demo" ou "carga"); os tamanhos podem ser sobrescritos por
+# variáveis de ambiente para testes de carga, ex.: GUARDIAN_N_USERS=10000000
+SYNTHETIC_DATA_PARAMS = dict(DATA_PROFILES[os.environ.get("GUARDIAN_DATA_PROFILE", "demo")])
+for _param, _env_var in (("n_users", "GUARDIAN_N_USERS"), ("n_bets", "GUARDIAN_N_BETS"), ("n_rings", "GUARDIAN_N_RINGS"),
+                         ("n_transactions", "GUARDIAN_N_TRANSACTIONS")):
+    if os.environ.get(_env_var):
+        SYNTHETIC_DATA_PARAMS[_param] = int(os.environ[_env_var])
+
+# Fonte de transações da ingestão em tempo real: unix:<socket>, tail:<arquivo.jsonl>,
+# replay:<arquivo.jsonl> ou "sintetico" (transações geradas a partir de uma amostra das contas)
+INGEST_SOURCE = os.environ.get("GUARDIAN_INGEST_SOURCE", "sintetico")
+INGEST_SYNTHETIC_RATE = float(os.environ.get("GUARDIAN_INGEST_RATE", "2.5"))
+INGEST_SAMPLE_USERS = 10_000
+
+# Reruns por modo de navegação considerados na mediana de latência
+RERUN_TIMING_WINDOW = 50
+
+# Tamanho máximo (JSON) do gráfico de padrões de apostas, qualquer que seja o número de apostas
+BET_CHART_BYTE_BUDGET = 256 * 1024
+
+# Células exibidas no mapa de calor ao detalhar um estado
+GEO_DRILL_CELLS = 15
+
+# Largura (pontos de score) de cada barra da distribuição de risk scores
+RISK_HISTOGRAM_BIN_WIDTH = 20
+
+# Limites do cache de figuras (entradas e bytes de JSON)
+FIGURE_CACHE_MAX_ENTRIES = 256
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Diagnóstico: intervalo mínimo entre medidas da memória de cada sessão (percorrer o estado custa)
+SESSION_STATE_SAMPLE_SECONDS = 10
+RERUN_MODE_LABELS = {"ato": "ato ativo", "todos": "todos os atos", "tema": "troca de tema"}
+
+# Tarefas em segundo plano: threads do executor, intervalo de polling das sessões e validade
+# do relatório executivo em cache
+JOB_WORKERS = 2
+JOB_POLL_SECONDS = 1.0
+REPORT_CACHE_SECONDS = 300
+
+# Análises do Ato II: tipologia e grupo de pares do abuso de bônus e limiar padrão do radar
+BONUS_ABUSE_TYPOLOGY = "Abuso de Bônus"
+BONUS_PEER_GROUP = "Caçador de Bônus"
+RADAR_THRESHOLD = 0.7
+
+# Modelos do painel de ML e versão em produção. Enquanto não há uma fonte de rótulos
+# (chargebacks confirmados), o histórico rotulado de transações é reproduzido aos poucos:
+# cada modelo pontua o lote somando ao score base o seu sinal (velocity, geo, device)
+ML_MODELS = {"Fraud Detection": "V3", "Account Takeover": "V2", "Bonus Abuse": "V1", "Velocity Check": "V4"}
+ML_MODEL_SIGNALS = {"Fraud Detection": None, "Account Takeover": "device_flag", "Bonus Abuse": "geo_flag",
+                    "Velocity Check": "velocity_flag"}
+ML_SIGNAL_WEIGHT = 0.15
+# Rótulos das cabeças de risco da predição em lote (guardian/inference.py)
+ML_HEAD_LABELS = {"fraud_probability": "Fraude", "chargeback_risk": "Chargeback", "account_takeover_risk": "ATO"}
+# Modelo treinável (regressão logística no histórico rotulado); após o deploy, a versão
+# em produção no registro substitui a heurística acima na pontuação e no painel
+TRAINED_MODEL = "Fraud Detection"
+LABEL_BACKFILL_ROWS = 50_000
+LABEL_ROWS_PER_TICK = 25_000
+LABEL_TICK_SECONDS = 5.0
+
+# Botões que otimizam as regras automáticas e widgets do Centro de Comando ligados a cada regra
+RULE_OPTIMIZATION_SLOTS = ("optimize_rules_btn", "optimize_thresholds")
+RULE_WIDGETS = {'auto_block_threshold': "emergency_threshold_slider", 'auto_monitoring_threshold': "monitoring_threshold_slider",
+                'velocity_check_enabled': "velocity_check_box", 'device_fingerprint_enabled': "device_fingerprint_check",
+                'geo_anomaly_enabled': "geo_anomaly_check"}
+
+# Métricas de valor instantâneo (as demais são contadores somados por balde)
+GAUGE_METRICS = {name: "last" for name in ("ml_accuracy", "anomalies_per_hour", "detection_accuracy", "bonus_abuse_rate", "bonus_savings")}
+
+@st.cache_resource
+def load_shared_dataset():
+    """Conjunto de dados único do processo, mapeado do disco e compartilhado por todas as sessões.
+
+    Os dados só são gerados se ainda não existirem em GUARDIAN_DATA_DIR para estes parâmetros;
+    nas demais inicializações (e nos demais workers) os arquivos são apenas mapeados.
+    """
+    return SharedDataset(ensure_synthetic_dataset(DEFAULT_DATA_DIR, **SYNTHETIC_DATA_PARAMS), background_typology=LEGIT_TYPOLOGY)
+
+@st.cache_resource
+def get_overlay_registry():
+    return OverlayRegistry()
 
-    return df_users, df_bets
+@st.cache_resource
+def get_metrics_store():
+    """Séries de métricas do processo (1 s / 1 min / 1 h), compartilhadas por todas as sessões."""
+    return MetricsStore(series=GAUGE_METRICS)
+
+@st.cache_resource
+def get_ingestion_service():
+    """Serviço de ingestão do processo (fonte em GUARDIAN_INGEST_SOURCE; padrão: gerador sintético)."""
+    shared = load_shared_dataset()
+    n_users = shared.user_index.n_rows
+    sample = np.random.default_rng(0).choice(n_users, size=min(INGEST_SAMPLE_USERS, n_users), replace=False)
+    accounts = shared.take('users', np.sort(sample), ['user_id', 'risk_score'])
+    source = parse_source(INGEST_SOURCE, user_ids=accounts['user_id'], risk_scores=accounts['risk_score'], rate=INGEST_SYNTHETIC_RATE)
+    return IngestionService(source, metrics=get_metrics_store()).start()
+
+@st.cache_resource
+def get_model_registry():
+    """Registro local de modelos (versões com pesos mapeados do disco), compartilhado por todas as sessões."""
+    return ModelRegistry()
+
+@st.cache_resource
+def get_model_trainer():
+    """Treinador do modelo de fraude; os pedaços do treino rodam num processo à parte, criado no primeiro treino."""
+    return ModelTrainer(get_model_registry(), load_shared_dataset().store.root)
+
+def ml_model_version(model):
+    """Versão de ``model`` em produção: a do registro, se já houve deploy, ou a da heurística."""
+    if model == TRAINED_MODEL:
+        return get_model_registry().production_version(model) or ML_MODELS[model]
+    return ML_MODELS[model]
+
+@st.cache_resource
+def get_model_evaluator():
+    """Avaliação contínua dos modelos (histogramas por modelo e versão), compartilhada por todas as sessões."""
+    return ModelEvaluator()
+
+def labelled_batch_scores(batch):
+    """Score (0–1) de cada modelo em produção para um lote do histórico rotulado."""
+    base = batch.column('risk_score').to_numpy().astype(np.float64) / 1000
+    scores = {}
+    production = get_model_registry().production(TRAINED_MODEL)
+    if production is not None:
+        version, weights, _ = production
+        scores[(TRAINED_MODEL, version)] = LogisticModel.from_arrays(weights).predict_proba(transaction_features(batch))
+    for model, version in ML_MODELS.items():
+        if production is not None and model == TRAINED_MODEL:
+            continue
+        signal = ML_MODEL_SIGNALS[model]
+        boost = 0.0 if signal is None else ML_SIGNAL_WEIGHT * (batch.column(signal).to_numpy(zero_copy_only=False) - 0.5)
+        scores[(model, version)] = np.clip(base + boost, 0, 1)
+    return scores
+
+@st.cache_resource
+def get_label_replay():
+    """Confirmações de rótulo do histórico chegando aos poucos ao avaliador (thread própria).
+
+    Só as transações reservadas à validação são reproduzidas: nenhum modelo treinado é
+    medido nas linhas em que aprendeu.
+    """
+    transactions = load_shared_dataset().table('transactions')
+    holdout = transactions.slice(holdout_start(transactions.num_rows))
+    return LabelReplay(get_model_evaluator(), holdout, labelled_batch_scores,
+                       rows_per_tick=LABEL_ROWS_PER_TICK, tick=LABEL_TICK_SECONDS, backfill=LABEL_BACKFILL_ROWS).start()
+
+@st.cache_resource
+def get_job_executor():
+    """Executor das tarefas longas (varreduras, lotes de ML, relatórios), compartilhado por todas as sessões."""
+    return JobExecutor(max_workers=JOB_WORKERS)
+
+@st.cache_resource(on_release=BatchInference.close)
+def get_batch_inference():
+    """Inferência das cabeças de risco (pool e matriz em memória compartilhada criados na primeira predição).
+
+    O segmento da matriz sobrevive ao processo se não for removido: ``close`` roda quando o
+    cache é limpo e, como o Streamlit não garante isso no encerramento, também no ``atexit``.
+    """
+    engine = BatchInference()
+    atexit.register(engine.close)
+    return engine
+
+@st.cache_resource
+def get_threshold_optimizer():
+    """Otimizador de limiares (pool de processos criado na primeira busca), compartilhado por todas as sessões."""
+    return ThresholdOptimizer()
+
+@st.cache_resource
+def get_diagnostics():
+    """Percentis de tempo dos builders, atos, fragmentos e reruns (com log rotativo), de todas as sessões."""
+    return Diagnostics()
+
+@st.cache_resource
+def get_figure_cache():
+    """Cache LRU das figuras dos gráficos, compartilhado por todas as sessões."""
+    return FigureCache(max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES)
+
+def current_users(*columns):
+    """Colunas pedidas (todas, se nenhuma) dos usuários vistos pela sessão atual: dados compartilhados + overlay."""
+    return st.session_state.overlay.users_view(load_shared_dataset(), *columns)
 
 # ==============================================================================
 # --- COMPONENTES DE UI ---
@@ -331,24 +550,408 @@ def widget_container():
     yield
     st.markdown('</div>', unsafe_allow_html=True)
 
+def format_bytes(n_bytes):
+    """Formata um tamanho em bytes com a unidade mais legível."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n_bytes) < 1024 or unit == "GB":
+            return f"{n_bytes:,.1f} {unit}" if unit != "B" else f"{n_bytes:,.0f} B"
+        n_bytes /= 1024
+
+@st.cache_resource
+def theme_templates():
+    """Template Plotly de cada tema (o padrão do Plotly com fundo transparente e as cores de texto do tema)."""
+    templates = {}
+    for name, palette in THEMES.items():
+        template = go.layout.Template(pio.templates[pio.templates.default])
+        template.layout.update(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                               font=dict(color=palette['text']), legend=dict(font=dict(color=palette['text'])))
+        templates[name] = template
+    return templates
+
 def apply_theme_to_fig(fig, theme):
     """Aplica o tema visual padrão a uma figura Plotly."""
     fig.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font_color=theme['text'],
-        legend_font_color=theme['text'],
+        template=theme_templates()[theme_name(theme)],
         margin=dict(l=10, r=10, t=40, b=10) # Ajuste de margem
     )
     return fig
 
+# Troca de cores da paleta base para cada tema (as cores da paleta base são todas distintas)
+THEME_COLOR_SWAPS = {name: {THEMES[BASE_THEME][key]: color for key, color in palette.items()} for name, palette in THEMES.items()}
+
+def _swap_colors(node, colors):
+    if isinstance(node, dict):
+        return {key: _swap_colors(value, colors) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_swap_colors(value, colors) for value in node]
+    return colors.get(node, node) if isinstance(node, str) else node
+
+def reskin_figure(fig, name):
+    """Cópia de uma figura da paleta base com as cores e o template do tema ``name`` (os dados não mudam)."""
+    spec = fig.to_dict()
+    spec['layout'].pop('template', None)
+    spec = _swap_colors(spec, THEME_COLOR_SWAPS[name])
+    spec['layout']['template'] = theme_templates()[name]
+    return go.Figure(spec)
+
+# Versão atual de cada fonte de dados dos gráficos. As métricas também mudam com o
+# relógio (a janela avança a cada minuto), e "relogio" serve aos gráficos com horários relativos.
+FIGURE_SOURCES = {
+    "users": lambda: load_shared_dataset().version,
+    "bets": lambda: load_shared_dataset().version,
+    "metrics": lambda: (get_metrics_store().version, int(time.time() // 60)),
+    "relogio": lambda: int(time.time() // 60),
+    "avaliacao": lambda: get_model_evaluator().version,
+    "producao": lambda: get_model_registry().production_version(TRAINED_MODEL),
+}
+
+def cached_figure(*sources, params=None):
+    """Memoiza um ``create_*(..., theme)`` por (função, tema, versão das ``sources``, parâmetros).
+
+    A figura é construída uma vez, na paleta ``BASE_THEME``; nos outros temas ela é
+    derivada dessa por ``reskin_figure`` (troca de cores e template), sem reconsultar os
+    dados. ``params`` converte os argumentos anteriores ao tema numa chave hashable
+    (padrão: os próprios argumentos). As figuras são compartilhadas entre sessões e não
+    devem ser alteradas.
+    """
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(*args):
+            *inputs, theme = args
+            name = theme_name(theme)
+            param_key = params(*inputs) if params else tuple(inputs)
+            version = tuple(FIGURE_SOURCES[source]() for source in sources)
+            cache = get_figure_cache()
+
+            started = time.perf_counter()
+
+            def base():
+                return cache.get_or_build((build.__name__, BASE_THEME, param_key), version,
+                                          lambda: build(*inputs, THEMES[BASE_THEME]), sources)
+            key = (build.__name__, name, param_key)
+            fig = base() if name == BASE_THEME else cache.get_or_build(key, version, lambda: reskin_figure(base(), name), sources)
+            get_diagnostics().record("figura", build.__name__, (time.perf_counter() - started) * 1e3,
+                                     cache.nbytes_of(key), current_session_id())
+            return fig
+        return wrapper
+    return decorator
+
+def in_fragment_rerun():
+    """Se o rerun atual é parcial (só fragmentos), e não o script inteiro."""
+    ctx = get_script_run_ctx()
+    return ctx is not None and bool(ctx.fragment_ids_this_run)
+
+def rerun_fragment():
+    """Reexecuta só o fragmento atual; num rerun completo, o app (única opção do Streamlit)."""
+    st.rerun(scope="fragment" if in_fragment_rerun() else "app")
+
+def timed_fragment(name):
+    """``st.fragment`` que registra a duração de cada rerun parcial do painel ``name`` na sessão."""
+    def decorator(render):
+        @functools.wraps(render)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return render(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1e3
+                partial = in_fragment_rerun()
+                get_diagnostics().record("fragmento", name if partial else f"{name} (rerun completo)", elapsed_ms,
+                                         session=current_session_id())
+                # Execuções dentro de um rerun completo já entram no tempo do rerun
+                if partial:
+                    timings = st.session_state.fragment_timings
+                    timings.setdefault(name, deque(maxlen=RERUN_TIMING_WINDOW)).append(elapsed_ms)
+        return st.fragment(timed)
+    return decorator
+
+# ==============================================================================
+# --- TAREFAS EM SEGUNDO PLANO ---
+# ==============================================================================
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+def submit_job(slot, name, work, *args, cache_key=None, **kwargs):
+    """Submete ``work(job, ...)`` ao executor e liga a tarefa ao ``slot`` (o botão) nesta sessão."""
+    job = get_job_executor().submit(name, work, *args, owner=current_session_id(), cache_key=cache_key, **kwargs)
+    st.session_state.jobs[slot] = job.id
+    return job
+
+def slot_job(slot):
+    job_id = st.session_state.jobs.get(slot)
+    return get_job_executor().get(job_id) if job_id is not None else None
+
+def show_job(slot, render_result):
+    """Progresso da tarefa do ``slot`` (acompanhado por polling) ou, já terminada, o resultado."""
+    job = slot_job(slot)
+    if job is None:
+        return
+    if not job.finished:
+        poll_job(slot)
+    elif job.status == DONE:
+        render_result(job.result)
+    elif job.status == CANCELLED:
+        st.warning(f"{job.name}: cancelada")
+    else:
+        st.error(f"{job.name} falhou: {job.error}")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def poll_job(slot):
+    """Consulta a tarefa a cada ``JOB_POLL_SECONDS``; ao terminar, um rerun completo mostra o resultado."""
+    job = slot_job(slot)
+    if job is None or job.finished:
+        st.rerun()
+    st.progress(job.progress, text=f"{job.name}: {job.stage or job.status} ({job.progress:.0%})")
+    if st.button("Cancelar", key=f"cancel_job_{slot}", disabled=job.cancel_requested):
+        get_job_executor().cancel(job.id)
+        rerun_fragment()
+
+def full_scan_job(job, shared, monitoring_threshold, block_threshold):
+    """Varredura da tabela de usuários, lote a lote: contas acima dos limiares e tipologia dominante."""
+    users = shared.table('users').select(['risk_score', 'main_risk_factor'])
+    scanned, suspicious, high_risk, typologies = 0, 0, 0, {}
+    for batch in users.to_batches():
+        job.raise_if_cancelled()
+        scores = batch.column(0).to_numpy()
+        flagged = scores >= monitoring_threshold
+        suspicious += int(flagged.sum())
+        high_risk += int((scores >= block_threshold).sum())
+        for typology, count in pd.Series(batch.column(1).to_pandas()[flagged]).value_counts().items():
+            typologies[typology] = typologies.get(typology, 0) + int(count)
+        scanned += batch.num_rows
+        job.report(scanned / max(users.num_rows, 1), f"{scanned:,} de {users.num_rows:,} contas analisadas")
+    return {"scanned": scanned, "suspicious": suspicious, "high_risk": high_risk,
+            "top_typology": max(typologies, key=typologies.get) if typologies else "—"}
+
+def bonus_analysis_job(job, shared):
+    """Abuso de bônus por grupo de pares, lote a lote: contas, taxa de abuso e depósito médio."""
+    users = shared.table('users').select(['peer_group', 'main_risk_factor', 'total_deposited'])
+    groups, scanned = {}, 0
+    for batch in users.to_batches():
+        job.raise_if_cancelled()
+        frame = batch.to_pandas()
+        frame['abuse'] = frame['main_risk_factor'] == BONUS_ABUSE_TYPOLOGY
+        for group, stats in frame.groupby('peer_group', observed=True).agg(
+                accounts=('abuse', 'size'), abuse=('abuse', 'sum'), deposited=('total_deposited', 'sum')).iterrows():
+            totals = groups.setdefault(group, {'accounts': 0, 'abuse': 0, 'deposited': 0.0})
+            for key in totals:
+                totals[key] += stats[key]
+        scanned += batch.num_rows
+        job.report(scanned / max(users.num_rows, 1), f"{scanned:,} de {users.num_rows:,} contas analisadas")
+    rates = {group: totals['abuse'] / totals['accounts'] for group, totals in groups.items()}
+    hunters = groups.get(BONUS_PEER_GROUP, {'accounts': 0, 'abuse': 0, 'deposited': 0.0})
+    return {"scanned": scanned, "groups": len(groups), "hunters": int(hunters['accounts']),
+            "hunter_abuse_rate": rates.get(BONUS_PEER_GROUP, 0.0),
+            "hunter_deposit_avg": hunters['deposited'] / hunters['accounts'] if hunters['accounts'] else 0.0,
+            "top_group": max(rates, key=rates.get) if rates else "—", "top_rate": max(rates.values(), default=0.0)}
+
+def behavioral_analysis_job(job, shared, threshold):
+    """Probabilidade de fraude (cabeça ``fraud_probability``) de cada conta, lote a lote, contra o limiar do radar."""
+    users = shared.table('users').select([*FEATURE_COLUMNS, 'main_risk_factor'])
+    device_accounts = shared.user_index.by['device_id'].group_sizes()
+    peers, now = peer_means(users), pd.Timestamp.now()
+    coefficients, intercept = head_weights('fraud_probability')
+    weights = np.asarray(coefficients, dtype=np.float32)
+    scanned, suspicious, score_sum, patterns = 0, 0, 0.0, set()
+    for batch in users.to_batches():
+        job.raise_if_cancelled()
+        features = user_features(batch, device_accounts[scanned:scanned + batch.num_rows], now, peers=peers)
+        probability = 1 / (1 + np.exp(-np.clip(features @ weights + intercept, -30, 30)))
+        flagged = probability >= threshold
+        suspicious += int(flagged.sum())
+        score_sum += float(probability[flagged].sum())
+        patterns.update(batch.column('main_risk_factor').to_pandas()[flagged].unique())
+        scanned += batch.num_rows
+        job.report(scanned / max(users.num_rows, 1), f"{scanned:,} de {users.num_rows:,} contas analisadas")
+    patterns.discard(LEGIT_TYPOLOGY)
+    return {"scanned": scanned, "suspicious_users": suspicious,
+            "anomaly_score_avg": score_sum / suspicious if suspicious else 0.0, "patterns_found": len(patterns)}
+
+def model_metrics(evaluator, threshold, confidence=None):
+    """Métricas de cada modelo em produção nos rótulos confirmados (modelos ainda sem rótulos ficam de fora)."""
+    results = {}
+    for model in ML_MODELS:
+        result = evaluator.evaluate(model, ml_model_version(model), threshold / 1000, confidence=confidence)
+        if result is not None:
+            results[model] = result
+    return results
+
+def ml_batch_job(job, evaluator, metrics, threshold):
+    """Avalia cada modelo em produção nos rótulos confirmados, no limiar de monitoramento, com IC 95%."""
+    results = {}
+    for done, model in enumerate(ML_MODELS):
+        job.raise_if_cancelled()
+        job.report(done / len(ML_MODELS), f"Avaliando {model} {ml_model_version(model)}...")
+        result = evaluator.evaluate(model, ml_model_version(model), threshold / 1000)
+        if result is not None:
+            results[model] = result
+    job.report(1.0, "Concluído")
+    fraud = results.get(TRAINED_MODEL)
+    if fraud is not None:
+        metrics.add('ml_accuracy', fraud['accuracy'] * 100)
+    return {"models": results, "version": ml_model_version(TRAINED_MODEL), "seconds": job.seconds}
+
+def executive_report_job(job, shared, evaluator, rules):
+    """Resumo gerencial medido: backtest das regras da sessão no histórico e métricas dos modelos nos rótulos."""
+    job.report(0.0, "Calculando perdas evitadas no histórico...")
+    backtest = shared.policy_backtest.evaluate(
+        rules['auto_block_threshold'], rules['auto_monitoring_threshold'],
+        VELOCITY_CHECK_MULT if rules['velocity_check_enabled'] else 1.0,
+        rules['geo_anomaly_enabled'], rules['device_fingerprint_enabled'])
+    job.raise_if_cancelled()
+    job.report(0.5, "Consolidando métricas dos modelos...")
+    models = model_metrics(evaluator, rules['auto_monitoring_threshold'])
+    job.report(1.0, "Concluído")
+    return {"backtest": backtest, "models": models, "version": ml_model_version(TRAINED_MODEL)}
+
+def rules_from_point(point):
+    """Regras automáticas correspondentes a um ponto da busca de limiares."""
+    return {'auto_block_threshold': point['block'], 'auto_monitoring_threshold': point['monitoring'],
+            'velocity_check_enabled': point['velocity'], 'device_fingerprint_enabled': point['device'],
+            'geo_anomaly_enabled': point['geo']}
+
+def optimize_rules_job(job, shared, optimizer, rules):
+    """Busca de limiares sobre as curvas de custo do histórico, comparada às regras atuais da sessão."""
+    job.report(0.0, "Montando curvas de custo do histórico...")
+    curves = shared.policy_backtest.curves()
+
+    def progress(done, total):
+        job.raise_if_cancelled()
+        job.report(done / max(total, 1), f"{done:,} de {total:,} combinações avaliadas")
+
+    result = optimizer.search(curves, progress=progress)
+    current = candidate_costs(curves, {
+        'block': np.array([rules['auto_block_threshold']]), 'monitoring': np.array([rules['auto_monitoring_threshold']]),
+        'velocity': np.array([rules['velocity_check_enabled']]), 'device': np.array([rules['device_fingerprint_enabled']]),
+        'geo': np.array([rules['geo_anomaly_enabled']])})
+    result['current'] = {key: values[0].item() for key, values in current.items()}
+    result['rules'] = rules_from_point(result['chosen'])
+    return result
+
+def apply_optimized_rules():
+    """Aplica o ponto escolhido por uma otimização recém-concluída às regras desta sessão.
+
+    As regras são trocadas de uma vez (um dict novo no lugar do antigo), junto com os
+    widgets do Centro de Comando, antes que eles sejam desenhados neste rerun.
+    """
+    for slot in RULE_OPTIMIZATION_SLOTS:
+        job = slot_job(slot)
+        if job is None or job.status != DONE or job.id in st.session_state.applied_rule_jobs:
+            continue
+        st.session_state.applied_rule_jobs.add(job.id)
+        set_rules(job.result['rules'])
+
+def set_rules(changes):
+    """Troca as regras da sessão (um dict novo) e os widgets do Centro de Comando que as editam.
+
+    Os widgets só podem ser alterados antes de desenhados: chame no início do rerun ou
+    num callback (``on_click``).
+    """
+    rules = {**st.session_state.automated_rules, **changes}
+    st.session_state.automated_rules = rules
+    for rule, widget in RULE_WIDGETS.items():
+        st.session_state[widget] = rules[rule]
+
+def submit_rule_optimization(slot):
+    """Busca de limiares a partir das regras atuais; sessões com as mesmas regras e dados compartilham a tarefa."""
+    shared, rules = load_shared_dataset(), st.session_state.automated_rules
+    job = submit_job(slot, "Otimização de regras", optimize_rules_job, shared, get_threshold_optimizer(), dict(rules),
+                     cache_key=("otimizacao", shared.version, tuple(sorted(rules.items()))))
+    st.session_state.applied_rule_jobs.discard(job.id)
+    if job.finished:  # resultado já em cache: as regras são aplicadas no topo do próximo rerun
+        st.rerun()
+
+def show_rule_optimization(result):
+    chosen, current = result['chosen'], result['current']
+    total = chosen['loss'] + chosen['workload']
+    saving = 1 - total / max(current['loss'] + current['workload'], 1e-9)
+    st.success(f"Regras otimizadas: {result['candidates']:,} combinações em {result['seconds']:.2f}s "
+               f"({result['workers']} processos)")
+    st.markdown(f"- Bloqueio ≥ {chosen['block']} · monitoramento ≥ {chosen['monitoring']}")
+    st.markdown("- Módulos: " + (", ".join(name for name, on in (("velocity", chosen['velocity']),
+                                                                  ("device", chosen['device']),
+                                                                  ("geo", chosen['geo'])) if on) or "nenhum"))
+    st.markdown(f"- Perdas: R$ {chosen['loss'] / 1e3:,.0f}K (atual R$ {current['loss'] / 1e3:,.0f}K)")
+    st.markdown(f"- Carga dos analistas: {chosen['reviews']:,} revisões (atual {current['reviews']:,})")
+    st.markdown(f"- Custo total: {-saving:+.1%} · fronteira de Pareto com {len(result['front'])} pontos")
+    st.info("Novas regras ativadas automaticamente")
+
+def train_model_job(job, trainer, mode):
+    """Nova versão do modelo de fraude (``completo``, ``incremental`` ou ``calibracao``), registrada sem deploy."""
+    def progress(fraction, stage):
+        job.raise_if_cancelled()
+        job.report(fraction, stage)
+    return trainer.train(TRAINED_MODEL, mode, progress)
+
+def submit_training(slot, mode):
+    """Treino fora do rerun; cliques sobre a mesma versão de partida compartilham a tarefa."""
+    latest = get_model_registry().latest_version(TRAINED_MODEL)
+    submit_job(slot, "Treinamento do modelo", train_model_job, get_model_trainer(), mode,
+               cache_key=("treino", mode, latest))
+
+def show_training(result):
+    validation = result['validation']
+    parent = f" a partir de {result['parent']}" if result['parent'] else ""
+    st.success(f"🧠 {TRAINED_MODEL} {result['version']} registrada ({result['mode']}{parent})")
+    st.caption(f"Validação em {validation['rows']:,} transações: PR-AUC {validation['pr_auc']:.3f} · "
+               f"precisão {validation['precision']:.1%} · recall {validation['recall']:.1%} · "
+               f"log-loss {validation['log_loss']:.4f} · {result['seconds']:.1f}s · use 💾 Fazer Deploy para publicar")
+
+def deploy_latest_model():
+    """Aponta a produção para a versão mais recente (troca atômica do ponteiro no registro).
+
+    O painel de performance já foi desenhado neste rerun com a versão anterior: o aviso
+    fica na sessão e a página é redesenhada com a nova versão.
+    """
+    registry = get_model_registry()
+    latest = registry.latest_version(TRAINED_MODEL)
+    if latest is None:
+        st.warning("Nenhuma versão treinada: use 🔄 Retreinar Modelos primeiro")
+        return
+    previous = registry.deploy(TRAINED_MODEL, latest)
+    st.session_state.deploy_notice = (f"🚀 {TRAINED_MODEL} {latest} em produção"
+                                      + (f" (antes: {previous})" if previous and previous != latest else ""))
+    st.rerun()
+
+def batch_prediction_job(job, shared, figure_cache, inference):
+    """Reescreve os scores de todas as contas e prevê as cabeças de risco (fraude, chargeback, ATO).
+
+    A reescrita dos scores não é interrompida no meio (a tabela é publicada inteira); a
+    predição das cabeças, depois dela, pode ser cancelada entre uma faixa e outra.
+    """
+    device_accounts = shared.user_index.by['device_id'].group_sizes()
+    result = score_users(shared.store, device_accounts, aggregates=(shared.score_histogram, shared.geo_cube),
+                         progress=lambda done, total: job.report(done / max(total, 1) / 2, f"{done:,} de {total:,} contas"))
+    shared.refresh('users')
+    figure_cache.invalidate('users')
+
+    def progress(fraction, stage):
+        job.raise_if_cancelled()
+        job.report(0.5 + fraction / 2, stage)
+
+    # As features não dependem dos scores: a matriz compartilhada só é remontada para outro SharedDataset
+    # ou num novo dia (a idade das contas é medida a partir do início do dia)
+    users = shared.table('users').select(list(FEATURE_COLUMNS))
+    today = pd.Timestamp.now().normalize()
+    heads = inference.predict((shared, today), users.num_rows,
+                              lambda out: user_features(users, device_accounts, today, out), progress)
+    columns = heads.pop('columns')
+    for head, values in columns.items():
+        heads['heads'][head].update(mean=float(values.mean()) if len(values) else 0.0,
+                                    high_risk=int(np.count_nonzero(values >= HIGH_RISK)))
+    write_predictions(shared.store, columns, {"workers": heads['workers']})
+    return {**result, "heads": heads}
+
 # ==============================================================================
 # --- FUNÇÕES DE GERAÇÃO DE GRÁFICOS ---
 # ==============================================================================
 
 # --- Funções do Ato I ---
+@cached_figure("users")
 def create_global_risk_score_gauge(theme):
-    avg_risk = st.session_state.df_users['risk_score'].mean()
+    avg_risk = current_users('risk_score')['risk_score'].mean()
     fig = go.Figure(go.Indicator(
         mode="gauge+number", value=avg_risk,
         title={'text': "Score de Risco Global", 'font': {'size': 20}},
@@ -356,27 +959,40 @@ def create_global_risk_score_gauge(theme):
                'threshold': {'line': {'color': theme['danger'], 'width': 4}, 'thickness': 0.9, 'value': 850}}))
     return apply_theme_to_fig(fig.update_layout(height=250), theme)
 
-def create_risk_map_br(theme):
-    df_map = st.session_state.df_users.copy()
-    df_map['size'] = df_map['risk_score'] / 40
-    fig = px.scatter_geo(df_map, lat='lat', lon='lon', color="main_risk_factor",
-                         hover_name="user_id", size="size", scope="south america",
-                         color_discrete_map={
-                             "Anel de Fraude (Multi-Conta)": theme['danger'], 
-                             "Fraude de Identidade (CPF)": theme['danger'],
-                             "Chargeback Fraudulento": theme['warning'], 
-                             "Abuso de Bônus": theme['warning']
-                         })
-    fig.update_layout(geo=dict(landcolor=theme['grid'], countrycolor=theme['subtle_text'], bgcolor='rgba(0,0,0,0)'), margin=dict(l=0, r=0, t=0, b=0))
+@cached_figure("users")
+def create_risk_map_br(state, theme):
+    # Uma bolha por célula da grade (cubo geográfico), cor pela tipologia dominante da célula
+    cells = load_shared_dataset().geo_cube.by_cell(state)
+    colors = {"Anel de Fraude (Multi-Conta)": theme['danger'], "Fraude de Identidade (CPF)": theme['danger'],
+              "Chargeback Fraudulento": theme['warning'], "Abuso de Bônus": theme['warning'], LEGIT_TYPOLOGY: theme['success']}
+    size = 6 + 24 * np.sqrt(cells['accounts'] / max(cells['accounts'].max(initial=0), 1))
+    fig = go.Figure()
+    for typology in np.unique(cells['top_typology']):
+        in_typology = cells['top_typology'] == typology
+        fig.add_trace(go.Scattergeo(
+            lat=cells['lat'][in_typology], lon=cells['lon'][in_typology], name=typology, mode='markers',
+            marker=dict(size=size[in_typology], color=colors.get(typology, theme['primary']), opacity=0.7),
+            customdata=np.stack([cells['accounts'][in_typology], cells['mean_risk'][in_typology], cells['alerts'][in_typology]], axis=1),
+            hovertemplate="%{customdata[0]:,} contas · score médio %{customdata[1]:.0f} · %{customdata[2]:,} com alerta<extra>%{fullData.name}</extra>"))
+    geo = dict(scope="south america", landcolor=theme['grid'], countrycolor=theme['subtle_text'], bgcolor='rgba(0,0,0,0)')
+    if state:
+        geo['fitbounds'] = "locations"
+    fig.update_layout(geo=geo, margin=dict(l=0, r=0, t=0, b=0))
     return apply_theme_to_fig(fig, theme)
 
+@cached_figure("users")
 def create_top_threats_chart(theme):
-    threats = st.session_state.df_users['main_risk_factor'].value_counts().reset_index()
-    fig = px.bar(threats, x='count', y='main_risk_factor', orientation='h', color='count',
-                 color_continuous_scale='Reds', labels={'count': 'Casos', 'main_risk_factor': 'Ameaça'})
+    threats = current_users('main_risk_factor')['main_risk_factor'].value_counts()
+    threats = threats[threats > 0]
+    # go.Bar em vez de px.bar: o Ato I (primeira renderização) não carrega o plotly.express
+    fig = go.Figure(go.Bar(x=threats.values, y=threats.index, orientation='h',
+                           marker=dict(color=threats.values, colorscale='Reds', colorbar=dict(title='Casos')),
+                           hovertemplate="Ameaça=%{y}<br>Casos=%{x}<extra></extra>"))
+    fig.update_layout(xaxis_title='Casos', yaxis_title='Ameaça')
     return apply_theme_to_fig(fig.update_layout(showlegend=False, yaxis={'categoryorder':'total ascending'}), theme)
 
 # --- Funções do Ato II ---
+@cached_figure()
 def create_laranjometro_gauge(theme):
     fig = go.Figure(go.Indicator(mode="gauge+number", value=82, title={'text': "Score 'Potencial Laranja'"},
         gauge={'axis': {'range': [None, 100]}, 'bar': {'color': theme['warning']},
@@ -384,12 +1000,38 @@ def create_laranjometro_gauge(theme):
                          {'range': [50, 80], 'color': 'rgba(240, 173, 78, 0.5)'}]}))
     return apply_theme_to_fig(fig.update_layout(height=200), theme)
 
-def create_bet_pattern_scatter(theme):
-    fig = px.scatter(st.session_state.df_bets, x="value", y="odd", color="type",
-                     labels={"value": "Valor da Aposta (R$)", "odd": "Odd da Aposta"},
-                     color_discrete_map={'Padrão': theme['primary'], 'Anômala': theme['danger']})
+@cached_figure("bets")
+def create_bet_pattern_scatter(value_range, odd_range, theme):
+    # Densidade de todas as apostas (grade agregada no servidor) + anômalas como pontos WebGL
+    view = load_shared_dataset().bet_density.view(value_range, odd_range, BET_CHART_BYTE_BUDGET)
+    counts = view['counts'].T.astype(np.float32)
+    density = np.log10(counts, where=counts > 0, out=np.full_like(counts, np.nan))
+    fig = go.Figure([
+        go.Heatmap(x=view['x_edges'], y=view['y_edges'], z=density, name='Padrão (densidade)',
+                   colorscale=[[0, theme['secondary_background']], [1, theme['primary']]],
+                   colorbar=dict(title='log10 apostas'), hovertemplate="Valor %{x:.2f} · Odd %{y:.2f}<extra>10^%{z:.1f} apostas</extra>"),
+        go.Scattergl(x=view['anomaly_value'], y=view['anomaly_odd'], mode='markers', name='Anômala',
+                     marker=dict(color=theme['danger'], size=5)),
+    ])
+    shown = f" ({view['anomalies_shown']:,} exibidas)" if view['anomalies_shown'] < view['anomalies'] else ""
+    fig.update_layout(title=f"{view['bets']:,} apostas · {view['anomalies']:,} anômalas{shown}",
+                      xaxis_title="Valor da Aposta (R$)", yaxis_title="Odd da Aposta", dragmode='select',
+                      legend=dict(orientation='h', y=-0.2))
     return apply_theme_to_fig(fig, theme)
 
+def apply_bet_zoom():
+    """Callback da seleção em caixa no gráfico de apostas: a caixa vira a nova janela de zoom."""
+    boxes = st.session_state.bet_pattern_chart.selection.get('box', [])
+    if boxes:
+        box = boxes[-1]
+        st.session_state.bet_zoom_value = tuple(sorted(float(v) for v in box['x']))
+        st.session_state.bet_zoom_odd = tuple(sorted(float(v) for v in box['y']))
+
+def reset_bet_zoom(density):
+    st.session_state.bet_zoom_value = density.x_extent
+    st.session_state.bet_zoom_odd = density.y_extent
+
+@cached_figure()
 def create_bonus_monitor_chart(theme):
     data = {'Campanha': ['Bônus Boas-Vindas', 'Recarga FDS', 'Free Bet Clássico'],
             'Conversão (%)': [85, 60, 45], 'Suspeita de Abuso (%)': [15, 8, 22]}
@@ -398,7 +1040,9 @@ def create_bonus_monitor_chart(theme):
     return apply_theme_to_fig(fig.update_layout(barmode='group', yaxis_title="%"), theme)
 
 # --- Funções do Ato III ---
+@cached_figure("relogio", params=lambda user_data: user_data['user_id'])
 def create_behavioral_timeline(user_data, theme):
+    px = lazy_import("plotly.express")
     events = [{'Action': 'Cadastro', 'Timestamp': user_data['registration_time']},
               {'Action': 'Login', 'Timestamp': datetime.now() - timedelta(hours=2)},
               {'Action': 'Depósito', 'Timestamp': datetime.now() - timedelta(hours=1, minutes=50)},
@@ -409,6 +1053,7 @@ def create_behavioral_timeline(user_data, theme):
     fig.update_traces(textposition="top center", marker=dict(color=theme['primary'], size=12))
     return apply_theme_to_fig(fig.update_layout(yaxis_title="", xaxis_title="Horário do Evento", yaxis_visible=False), theme)
 
+@cached_figure("users", params=lambda user: user['user_id'])
 def create_peer_comparison_chart(user, theme):
     peers = {'Apostador Casual': (50, 60), 'High Roller': (250, 180), 'Caçador de Bônus': (15, 25)}
     peer_avg_bet, peer_avg_session = peers[user['peer_group']]
@@ -416,58 +1061,111 @@ def create_peer_comparison_chart(user, theme):
                      go.Bar(name=f"Média ({user['peer_group']})", y=['Tempo Sessão (s)', 'Aposta Média (R$)'], x=[peer_avg_session, peer_avg_bet], orientation='h', marker_color=theme['primary'])])
     return apply_theme_to_fig(fig.update_layout(barmode='group', height=250, title="Comparativo (Usuário vs. Pares)"), theme)
 
-def create_investigation_graph(user_data, theme):
-    net = Network(height="400px", width="100%", bgcolor=theme['widget_background'], font_color=theme['text'], notebook=True, directed=True)
-    net.add_node(user_data['user_id'], label=user_data['user_id'], color=theme['danger'], size=25)
-    if "Anel de Fraude" in user_data['main_risk_factor']:
-        device_node = user_data['device_id']
-        net.add_node(device_node, label=f"Device: {device_node}", shape='box', color=theme['warning'], size=20)
-        for _, row in st.session_state.df_users[st.session_state.df_users['device_id'] == device_node].iterrows():
-            if row['user_id'] != user_data['user_id']: 
-                net.add_node(row['user_id'], label=row['user_id'], color=theme['primary'], size=15)
-            net.add_edge(row['user_id'], device_node)
-    else:
-        net.add_node(user_data['device_id'], label=f"Device: {user_data['device_id']}", shape='box', color=theme['warning'], size=20)
-        net.add_node(user_data['payment_type'], label=f"Pagamento: {user_data['payment_type']}", shape='diamond', color=theme['success'], size=20)
-        net.add_edge(user_data['user_id'], user_data['device_id'])
-        net.add_edge(user_data['user_id'], user_data['payment_type'])
-    net.set_options('{"physics": {"barnesHut": {"gravitationalConstant": -3000, "springConstant": 0.05, "springLength": 150}}}')
-    net.save_graph("fraud_network.html")
-    return open("fraud_network.html", 'r', encoding='utf-8').read()
+# Tamanho mínimo de um componente para ser tratado como anel de fraude
+RING_MIN_ACCOUNTS = 3
+
+# Rótulo e forma de cada tipo de chave no grafo de entidades
+ENTITY_NODE_STYLES = {
+    'device_id': ("Device", 'box', 'warning'),
+    'payment_method_id': ("Pagamento", 'diamond', 'success'),
+    'ip_asn': ("ASN", 'ellipse', 'text_secondary'),
+}
+
+# Contas exibidas no grafo antes do resumo (nível de detalhe); "Expandir" multiplica o limite
+# até GRAPH_NODE_LIMIT, acima do qual o pyvis/vis.js deixa de desenhar em menos de 1 s
+GRAPH_NODE_BUDGET = 150
+GRAPH_EXPAND_FACTOR = 4
+GRAPH_NODE_LIMIT = 2400
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_investigation_graph(user_id, theme, graph_version, max_users):
+    """HTML do grafo gerado em memória (sem arquivo), por (usuário, tema, versão do grafo, limite)."""
+    shared = load_shared_dataset()
+    resolver = shared.entity_resolver
+    # Vizinhança pela resolução de entidades: contas ligadas por device, chave PIX/cartão ou ASN
+    position = shared.user_index.position(user_id)
+    graph = resolver.level_of_detail(resolver.neighbourhood(position, hops=2, limit=max_users + 1), max_users)
+    user_ids = dict(zip(graph['users'], shared.take('users', graph['users'], ['user_id'])['user_id']))
+    net = lazy_import("pyvis.network").Network(height="400px", width="100%", bgcolor=theme['widget_background'], font_color=theme['text'],
+                  directed=True, cdn_resources='remote')
+    for member, member_id in user_ids.items():
+        is_case = member == position
+        net.add_node(member_id, label=member_id, color=theme['danger'] if is_case else theme['primary'], size=25 if is_case else 15)
+    for (column, code), (key, degree, hidden) in graph['keys'].items():
+        label, shape, color = ENTITY_NODE_STYLES[column]
+        caption = f"{label}: {key}" + (f" ({degree:,} contas)" if degree > 1 else "") + (f" +{hidden:,} ocultas" if hidden else "")
+        net.add_node(f"{column}:{key}", label=caption, shape=shape, color=theme[color], size=20)
+    for member, (column, code) in graph['edges']:
+        net.add_edge(user_ids[member], f"{column}:{graph['keys'][(column, code)][0]}")
+    # Grafos grandes: sem o layout inicial do vis.js (quadrático) e com estabilização curta
+    large = len(net.nodes) > 100
+    net.set_options(json.dumps({
+        "layout": {"improvedLayout": not large},
+        "physics": {"barnesHut": {"gravitationalConstant": -3000, "springConstant": 0.05, "springLength": 150},
+                    "stabilization": {"iterations": 100 if large else 1000}},
+    }))
+    return net.generate_html(notebook=False), len(user_ids), graph['truncated']
+
+def create_investigation_graph(user_data, theme, max_users=GRAPH_NODE_BUDGET):
+    shared = load_shared_dataset()
+    graph_version = (shared.user_index.version, shared.entity_resolver.version)
+    return render_investigation_graph(user_data['user_id'], theme, graph_version, max_users)
 
 # --- Funções do Ato IV ---
+@cached_figure()
 def create_fraud_heatmap(theme):
+    px = lazy_import("plotly.express")
     data = {'Multi-Conta (CPF)': [75000, 15000], 'Abuso de Bônus': [45000, 8000], 'Conluio': [150000, 35000], 'Chargeback PIX': [95000, 55000]}
     df = pd.DataFrame(data, index=['Perda Potencial (R$)', 'Perda Realizada (R$)'])
     fig = px.imshow(df, text_auto=True, aspect="auto", labels=dict(x="Tipologia de Fraude", y="Métrica", color="Valor (R$)"), color_continuous_scale='Reds')
     return apply_theme_to_fig(fig, theme)
 
+@cached_figure()
 def create_predictive_event_risk_chart(theme):
+    px = lazy_import("plotly.express")
     data = {'Evento': ['Brasileirão - Clássico', 'Final Copa do Brasil', 'Libertadores', 'eSports - Final CBLOL'], 'Risco Previsto (%)': [85, 92, 78, 65]}
     df_data = pd.DataFrame(data)
     fig = px.bar(df_data, x='Evento', y='Risco Previsto (%)', title='Análise Preditiva de Risco de Eventos', color='Risco Previsto (%)', color_continuous_scale='Reds')
     return apply_theme_to_fig(fig, theme)
 
 # --- Funções de Inteligência Avançada ---
-def create_ml_model_performance_chart(theme):
-    models = ['Fraud Detection V3', 'Account Takeover V2', 'Bonus Abuse V1', 'Velocity Check V4']
-    accuracy = [94.2, 89.7, 91.5, 96.1]
-    precision = [92.8, 87.3, 89.2, 94.7]
-    recall = [91.4, 88.9, 90.1, 95.3]
-    
+@cached_figure("avaliacao", "producao")
+def create_ml_model_performance_chart(threshold, theme):
+    # Métricas medidas nos rótulos já confirmados, no limiar de monitoramento, com IC 95% (bootstrap)
+    get_label_replay()
+    evaluator = get_model_evaluator()
+    models, results = [], []
+    for model in ML_MODELS:
+        version = ml_model_version(model)
+        result = evaluator.evaluate(model, version, threshold / 1000)
+        if result is not None:
+            models.append(f"{model} {version}")
+            results.append(result)
+
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=models, y=accuracy, mode='lines+markers', name='Accuracy', line=dict(color=theme['success'], width=3)))
-    fig.add_trace(go.Scatter(x=models, y=precision, mode='lines+markers', name='Precision', line=dict(color=theme['primary'], width=3)))
-    fig.add_trace(go.Scatter(x=models, y=recall, mode='lines+markers', name='Recall', line=dict(color=theme['warning'], width=3)))
-    
-    fig.update_layout(title="Performance dos Modelos ML", yaxis_title="Percentual (%)", xaxis_title="Modelos")
+    for metric, label, color in (('accuracy', 'Accuracy', theme['success']), ('precision', 'Precision', theme['primary']),
+                                 ('recall', 'Recall', theme['warning']), ('pr_auc', 'PR-AUC', theme['danger'])):
+        values = np.array([100 * result[metric] for result in results])
+        low = np.array([100 * result['ci'][metric][0] for result in results])
+        high = np.array([100 * result['ci'][metric][1] for result in results])
+        fig.add_trace(go.Scatter(
+            x=models, y=values, mode='lines+markers', name=label, line=dict(color=color, width=3),
+            error_y=dict(type='data', symmetric=False, array=np.maximum(high - values, 0), arrayminus=np.maximum(values - low, 0)),
+            customdata=[result['labels'] for result in results],
+            hovertemplate=f"{label}: %{{y:.1f}}%<br>%{{customdata:,}} rótulos<extra></extra>"))
+
+    fig.update_layout(title=f"Performance dos Modelos ML (score ≥ {threshold})", yaxis_title="Percentual (%)", xaxis_title="Modelos")
     return apply_theme_to_fig(fig, theme)
 
+@cached_figure("metrics")
 def create_real_time_transaction_flow(theme):
-    timestamps = [datetime.now() - timedelta(minutes=i) for i in range(30, 0, -1)]
-    transactions = np.random.poisson(150, 30)
-    fraud_detected = np.random.poisson(8, 30)
-    blocked = np.random.poisson(3, 30)
+    # Últimos 30 minutos da camada de 1 min (views dos buffers circulares, sem cópia)
+    get_ingestion_service()
+    metrics = get_metrics_store()
+    starts, transactions = metrics.window('transactions', '1m', 30)
+    _, fraud_detected = metrics.window('frauds', '1m', 30)
+    _, blocked = metrics.window('blocks', '1m', 30)
+    timestamps = [datetime.fromtimestamp(start) for start in starts]
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=timestamps, y=transactions, mode='lines', name='Transações Totais', 
@@ -480,22 +1178,28 @@ def create_real_time_transaction_flow(theme):
     fig.update_layout(title="Fluxo de Transações em Tempo Real", yaxis_title="Volume", xaxis_title="Timestamp")
     return apply_theme_to_fig(fig, theme)
 
+@cached_figure("users")
 def create_risk_score_distribution(theme):
-    scores = np.random.beta(2, 5, 1000) * 1000  # Distribuição beta para simular scores realistas
+    # Contagens por score mantidas pelo motor de scoring: custo e payload não dependem da população
+    histogram = load_shared_dataset().score_histogram
+    starts, counts = histogram.binned(RISK_HISTOGRAM_BIN_WIDTH)
+    total = max(histogram.total, 1)
     fig = go.Figure()
-    fig.add_trace(go.Histogram(x=scores, nbinsx=50, name='Distribuição de Scores',
-                              marker_color=theme['primary'], opacity=0.7))
+    fig.add_trace(go.Bar(x=starts + RISK_HISTOGRAM_BIN_WIDTH / 2, y=counts, width=RISK_HISTOGRAM_BIN_WIDTH,
+                         name='Distribuição de Scores', marker_color=theme['primary'], opacity=0.7))
     
-    # Adicionar linhas de threshold
+    # Linhas de threshold com a contagem exata acima de cada corte
+    monitoring, blocking = histogram.above(800), histogram.above(950)
     fig.add_vline(x=800, line_dash="dash", line_color=theme['warning'], 
-                  annotation_text="Threshold Monitoramento")
+                  annotation_text=f"Monitoramento: {monitoring:,} ({monitoring / total:.1%})")
     fig.add_vline(x=950, line_dash="dash", line_color=theme['danger'], 
-                  annotation_text="Threshold Bloqueio")
+                  annotation_text=f"Bloqueio: {blocking:,} ({blocking / total:.1%})")
     
     fig.update_layout(title="Distribuição de Risk Scores na População", 
-                      xaxis_title="Risk Score", yaxis_title="Frequência")
+                      xaxis_title="Risk Score", yaxis_title="Contas", bargap=0)
     return apply_theme_to_fig(fig, theme)
 
+@cached_figure()
 def create_automated_actions_timeline(theme):
     hours = list(range(24))
     auto_blocks = [2, 1, 0, 1, 3, 8, 12, 15, 18, 22, 25, 28, 30, 35, 32, 28, 30, 35, 40, 38, 25, 15, 8, 4]
@@ -512,22 +1216,35 @@ def create_automated_actions_timeline(theme):
                       barmode='stack')
     return apply_theme_to_fig(fig, theme)
 
-def create_geographic_risk_heatmap(theme):
-    # Simular dados de risco por estado brasileiro
-    states = ['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA', 'GO', 'PE', 'CE', 'PA', 'MA', 'PB', 'ES', 'PI']
-    risk_levels = np.random.uniform(0.1, 0.9, len(states))
+@cached_figure("users")
+def create_geographic_risk_heatmap(state, theme):
+    # Score médio por estado, ou pelas células mais arriscadas do estado escolhido (drill-down)
+    cube = load_shared_dataset().geo_cube
+    if state:
+        regions = cube.by_cell(state)
+        top = np.argsort(-regions['mean_risk'], kind='stable')[:GEO_DRILL_CELLS]
+        labels = [f"{lat:.1f}, {lon:.1f}" for lat, lon in zip(regions['lat'][top], regions['lon'][top])]
+        title, axis_title = f"Células de Maior Risco em {state}", "Célula (lat, lon)"
+    else:
+        regions = cube.by_state()
+        top = np.argsort(-regions['accounts'], kind='stable')
+        labels = list(regions['name'][top])
+        title, axis_title = "Mapa de Calor de Risco por Estado", "Estados"
+    risk_levels = regions['mean_risk'][top] / 1000
     
     fig = go.Figure(data=go.Bar(
-        x=states, y=risk_levels,
+        x=labels, y=risk_levels,
         marker=dict(color=risk_levels, colorscale='Reds', showscale=True),
         text=[f'{r:.1%}' for r in risk_levels],
         textposition='auto',
+        customdata=np.stack([regions['accounts'][top], regions['alerts'][top], regions['top_typology'][top]], axis=1),
+        hovertemplate="%{x}: %{customdata[0]:,} contas · %{customdata[1]:,} com alerta<br>%{customdata[2]}<extra></extra>",
     ))
     
-    fig.update_layout(title="Mapa de Calor de Risco por Estado", 
-                      xaxis_title="Estados", yaxis_title="Nível de Risco")
+    fig.update_layout(title=title, xaxis_title=axis_title, yaxis_title="Nível de Risco (score médio)")
     return apply_theme_to_fig(fig, theme)
 
+@cached_figure()
 def create_anomaly_detection_radar(theme):
     categories = ['Velocidade<br>Transações', 'Padrão<br>Geográfico', 'Comportamento<br>Apostas', 
                   'Uso de<br>Dispositivo', 'Horário<br>Atividade', 'Valor<br>Médio']
@@ -564,6 +1281,7 @@ def create_anomaly_detection_radar(theme):
     )
     return apply_theme_to_fig(fig, theme)
 
+@cached_figure()
 def create_intervention_effectiveness_chart(theme):
     interventions = ['Bloqueio<br>Automático', 'Revisão<br>Manual', 'Monitoramento<br>Intensivo', 'Limite<br>Reduzido']
     effectiveness = [95.2, 89.7, 78.3, 82.1]
@@ -584,17 +1302,18 @@ def create_intervention_effectiveness_chart(theme):
     return apply_theme_to_fig(fig, theme)
 
 
+# Casos por página da fila de investigação e termo de cada filtro de tipologia
+QUEUE_PAGE_SIZE = 10
+QUEUE_TYPOLOGY_TERMS = {"Todos": "", "Anel de Fraude": "Anel de Fraude", "CPF": "CPF", "Chargeback": "Chargeback", "Bônus": "Bônus"}
+
+
 # ==============================================================================
 # --- LAYOUT DA APLICAÇÃO ---
 # ==============================================================================
 
 # --- Inicialização do Estado da Sessão ---
-if 'df_users' not in st.session_state:
-    st.session_state.df_users, st.session_state.df_bets = generate_br_mock_data()
-if 'selected_case_id' not in st.session_state:
-    st.session_state.selected_case_id = None
-if 'real_time_alerts' not in st.session_state:
-    st.session_state.real_time_alerts = []
+if 'overlay' not in st.session_state:
+    st.session_state.overlay = get_overlay_registry().new_overlay()
 if 'automated_rules' not in st.session_state:
     st.session_state.automated_rules = {
         'auto_block_threshold': 950,
@@ -603,14 +1322,31 @@ if 'automated_rules' not in st.session_state:
         'device_fingerprint_enabled': True,
         'geo_anomaly_enabled': True
     }
-if 'ml_predictions' not in st.session_state:
-    st.session_state.ml_predictions = {
-        'fraud_probability': np.random.uniform(0.1, 0.9, 10),
-        'chargeback_risk': np.random.uniform(0.05, 0.8, 10),
-        'account_takeover_risk': np.random.uniform(0.02, 0.7, 10)
-    }
-if 'live_transactions' not in st.session_state:
-    st.session_state.live_transactions = []
+# Os widgets do Centro de Comando partem das regras (e voltam a elas se deixaram de ser desenhados)
+for rule, widget in RULE_WIDGETS.items():
+    if widget not in st.session_state:
+        st.session_state[widget] = st.session_state.automated_rules[rule]
+if 'graph_nodes' not in st.session_state:
+    st.session_state.graph_nodes = {}
+if 'queue_cursors' not in st.session_state:
+    st.session_state.queue_cursors = [None]
+    st.session_state.queue_filter = None
+if 'rerun_timings' not in st.session_state:
+    st.session_state.rerun_timings = {mode: deque(maxlen=RERUN_TIMING_WINDOW) for mode in ("ato", "todos", "tema")}
+    st.session_state.fragment_timings = {}
+    st.session_state.rerun_sections = {}
+if 'jobs' not in st.session_state:
+    st.session_state.jobs = {}  # botão -> id da última tarefa submetida por ele
+if 'applied_rule_jobs' not in st.session_state:
+    st.session_state.applied_rule_jobs = set()  # otimizações de regras já aplicadas nesta sessão
+apply_optimized_rules()
+
+RERUN_PROFILE.lap("Estado da sessão")
+
+def toggle_theme():
+    """Troca o tema antes do rerun do clique, que é medido à parte (só aplica as cores novas)."""
+    st.session_state.dark_mode = not st.session_state.dark_mode
+    st.session_state.theme_switched = True
 
 # --- Cabeçalho ---
 # Header with theme toggle
@@ -622,102 +1358,115 @@ with header_col1:
 with header_col2:
     # Theme toggle button
     theme_label = "🌙 Modo Escuro" if not st.session_state.dark_mode else "☀️ Modo Claro"
-    if st.button(theme_label, key="theme_toggle", use_container_width=True):
-        st.session_state.dark_mode = not st.session_state.dark_mode
-        st.rerun()
+    st.button(theme_label, key="theme_toggle", use_container_width=True, on_click=toggle_theme)
 
-# Adicionar estado para simular dados dinâmicos
-if 'system_stats' not in st.session_state:
-    st.session_state.system_stats = {
-        'active_users': 12847,
-        'transactions_per_min': 2456,
-        'blocked_today': 127,
-        'ml_accuracy': 94.7,
-        'fraud_detected_today': 45
-    }
+# Métricas do sistema: séries compartilhadas por todas as sessões (memória fixa)
+metrics = get_metrics_store()
 
 # Sistema de Alertas em Tempo Real
-alert_col1, alert_col2, alert_col3, alert_col4 = st.columns([1, 1, 1, 1])
-
-with alert_col1:
-    if st.button("ALERTA CRÍTICO", type="primary", use_container_width=True, key="critical_alert_btn"):
-        # Simular detecção de anel de fraude
-        new_fraud_ring = {
-            'timestamp': datetime.now(),
-            'level': 'CRÍTICO',
-            'message': 'Anel de fraude detectado - 12 contas conectadas',
-            'action_required': True,
-            'users_affected': ['multi_acct_sp_1', 'multi_acct_sp_2', 'multi_acct_sp_3']
-        }
-        st.session_state.real_time_alerts.append(new_fraud_ring)
-        
-        # Atualizar estatísticas do sistema
-        st.session_state.system_stats['fraud_detected_today'] += 12
-        st.session_state.system_stats['blocked_today'] += 8
-        
-        st.error("ALERTA CRÍTICO: Anel de fraude multi-conta detectado!")
-        st.markdown("**Ações Automáticas Executadas:**")
-        st.markdown("- 8 contas bloqueadas automaticamente")
-        st.markdown("- 4 contas movidas para monitoramento intensivo")
-        st.markdown("- Equipe de investigação notificada")
-        st.markdown("- Relatório preliminar gerado")
-
-with alert_col2:
-    if st.button("ALERTA MODERADO", use_container_width=True, key="moderate_alert_btn"):
-        # Simular pico de transações anômalas
-        anomaly_alert = {
-            'timestamp': datetime.now(),
-            'level': 'MODERADO',
-            'message': 'Pico de transações anômalas detectado',
-            'action_required': False
-        }
-        st.session_state.real_time_alerts.append(anomaly_alert)
-        
-        # Atualizar estatísticas
-        st.session_state.system_stats['transactions_per_min'] += 340
-        st.session_state.system_stats['fraud_detected_today'] += 3
-        
-        st.warning("ALERTA: Anomalia comportamental detectada")
-        st.markdown("**Detalhes do Evento:**")
-        st.markdown(f"- Aumento de {340} transações/min")
-        st.markdown("- 3 usuários flagrados para revisão")
-        st.markdown("- Thresholds de monitoramento ajustados")
-
-with alert_col3:
-    if st.button("EXECUTAR AUTOMAÇÃO", use_container_width=True, key="auto_action_btn"):
-        # Simular execução de ações automáticas
-        auto_blocks = np.random.randint(1, 6)
-        auto_monitors = np.random.randint(3, 12)
-        processed_transactions = np.random.randint(1200, 1500)
-        
-        st.session_state.system_stats['blocked_today'] += auto_blocks
-        st.session_state.system_stats['transactions_per_min'] = processed_transactions
-        
-        st.success(f"Sistema executou {auto_blocks} bloqueios automáticos")
-        st.info(f"Processadas {processed_transactions} transações via ML")
-        st.markdown("**Resultados da Automação:**")
-        st.markdown(f"- {auto_blocks} contas bloqueadas por score crítico")
-        st.markdown(f"- {auto_monitors} usuários em monitoramento")
-        st.markdown("- Modelos ML atualizados com novos dados")
-
-with alert_col4:
-    status_color = "status-online" if len(st.session_state.real_time_alerts) < 5 else "status-warning" if len(st.session_state.real_time_alerts) < 10 else "status-critical"
-    st.markdown(f'<span class="status-indicator {status_color}"></span><strong>SISTEMA ONLINE</strong>', unsafe_allow_html=True)
-    st.metric("Alertas Ativos", len(st.session_state.real_time_alerts), 
-              "↗ Crescendo" if len(st.session_state.real_time_alerts) > 3 else "Estável")
+@timed_fragment("Barra de Alertas")
+def render_alert_bar():
+    """Barra de alertas: seus botões reexecutam só este fragmento."""
+    alert_col1, alert_col2, alert_col3, alert_col4 = st.columns([1, 1, 1, 1])
+
+    with alert_col1:
+        if st.button("ALERTA CRÍTICO", type="primary", use_container_width=True, key="critical_alert_btn"):
+            # Anel real, vindo da resolução de entidades; cada alerta percorre o próximo maior anel
+            shared = load_shared_dataset()
+            roots, sizes = shared.entity_resolver.rings(min_size=RING_MIN_ACCOUNTS)
+            if len(roots):
+                cursor = st.session_state.get('ring_alert_cursor', 0) % len(roots)
+                st.session_state.ring_alert_cursor = cursor + 1
+                ring = shared.take('users', shared.entity_resolver.members(roots[cursor]), ['user_id', 'risk_score'])
+                to_block = ring['risk_score'] >= st.session_state.automated_rules['auto_block_threshold']
+                overlay = st.session_state.overlay
+                for user_id in ring.loc[to_block, 'user_id']:
+                    overlay.block(user_id)
+                for user_id in ring.loc[~to_block, 'user_id']:
+                    overlay.monitor(user_id)
+
+                new_fraud_ring = {
+                    'timestamp': datetime.now(),
+                    'level': 'CRÍTICO',
+                    'message': f'Anel de fraude detectado - {len(ring)} contas conectadas',
+                    'action_required': True,
+                    'users_affected': ring['user_id'].tolist()
+                }
+                metrics.log_event(new_fraud_ring)
+
+                # Atualizar estatísticas do sistema
+                metrics.add('frauds', len(ring))
+                metrics.add('blocks', int(to_block.sum()))
+
+                st.error(f"ALERTA CRÍTICO: {new_fraud_ring['message']}!")
+                st.markdown("**Ações Automáticas Executadas:**")
+                st.markdown(f"- {int(to_block.sum())} contas bloqueadas automaticamente")
+                st.markdown(f"- {int((~to_block).sum())} contas movidas para monitoramento intensivo")
+                st.markdown("- Equipe de investigação notificada")
+                st.markdown("- Relatório preliminar gerado")
+            else:
+                st.info("Nenhum anel de contas conectadas encontrado no conjunto atual.")
+
+    with alert_col2:
+        if st.button("ALERTA MODERADO", use_container_width=True, key="moderate_alert_btn"):
+            # Simular pico de transações anômalas
+            anomaly_alert = {
+                'timestamp': datetime.now(),
+                'level': 'MODERADO',
+                'message': 'Pico de transações anômalas detectado',
+                'action_required': False
+            }
+            metrics.log_event(anomaly_alert)
+
+            # Atualizar estatísticas
+            metrics.add('frauds', 3)
+
+            st.warning("ALERTA: Anomalia comportamental detectada")
+            st.markdown("**Detalhes do Evento:**")
+            st.markdown(f"- Aumento de {340} transações/min")
+            st.markdown("- 3 usuários flagrados para revisão")
+            st.markdown("- Thresholds de monitoramento ajustados")
+
+    with alert_col3:
+        if st.button("EXECUTAR AUTOMAÇÃO", use_container_width=True, key="auto_action_btn"):
+            # Simular execução de ações automáticas
+            auto_blocks = np.random.randint(1, 6)
+            auto_monitors = np.random.randint(3, 12)
+            processed_transactions = np.random.randint(1200, 1500)
+
+            metrics.add('blocks', auto_blocks)
+
+            st.success(f"Sistema executou {auto_blocks} bloqueios automáticos")
+            st.info(f"Processadas {processed_transactions} transações via ML")
+            st.markdown("**Resultados da Automação:**")
+            st.markdown(f"- {auto_blocks} contas bloqueadas por score crítico")
+            st.markdown(f"- {auto_monitors} usuários em monitoramento")
+            st.markdown("- Modelos ML atualizados com novos dados")
+
+    with alert_col4:
+        # Alertas da última hora (camada de 1 min) e da hora anterior, para a tendência
+        _, alerts_per_minute = metrics.window('alerts', '1m', 120)
+        active_alerts, previous_alerts = int(alerts_per_minute[-60:].sum()), int(alerts_per_minute[:-60].sum())
+        status_color = "status-online" if active_alerts < 5 else "status-warning" if active_alerts < 10 else "status-critical"
+        st.markdown(f'<span class="status-indicator {status_color}"></span><strong>SISTEMA ONLINE</strong>', unsafe_allow_html=True)
+        st.metric("Alertas Ativos", active_alerts, 
+                  "↗ Crescendo" if active_alerts > previous_alerts else "Estável")
+
+render_alert_bar()
+RERUN_PROFILE.lap("Cabeçalho e alertas")
 
 # Painel de Controle Rápido
-with st.expander("Centro de Comando e Controle", expanded=False):
+@timed_fragment("Centro de Comando")
+def render_command_center():
+    """Centro de Comando e Controle: sliders e botões reexecutam só este painel."""
     control_cols = st.columns([2, 2, 2, 2])
     
     with control_cols[0]:
         st.subheader("Controles de Bloqueio")
-        emergency_threshold = st.slider("Threshold de Emergência", 800, 1000, 
-                                       st.session_state.automated_rules['auto_block_threshold'], 10,
-                                       key="emergency_threshold_slider")
+        emergency_threshold = st.slider("Threshold de Emergência", 800, 1000, step=10,
+                                        key="emergency_threshold_slider")
         if st.button("PARAR TODAS TRANSAÇÕES", type="primary", key="emergency_stop_btn"):
             st.session_state.emergency_mode = True
-            st.session_state.system_stats['transactions_per_min'] = 0
             st.error("MODO EMERGÊNCIA ATIVADO")
             st.markdown("**Ações Executadas:**")
             st.markdown("- Todas as transações pausadas")
@@ -726,50 +1475,28 @@ with st.expander("Centro de Comando e Controle", expanded=False):
     
     with control_cols[1]:
         st.subheader("Monitoramento Avançado")
-        monitoring_threshold = st.slider("Threshold Monitoramento", 600, 900, 
-                                        st.session_state.automated_rules['auto_monitoring_threshold'], 10,
-                                        key="monitoring_threshold_slider")
+        monitoring_threshold = st.slider("Threshold Monitoramento", 600, 900, step=10,
+                                         key="monitoring_threshold_slider")
         if st.button("VARREDURA COMPLETA", key="full_scan_btn"):
-            st.info("Iniciando varredura completa da base de usuários...")
-            progress = st.progress(0)
-            
-            # Simular varredura realista
-            stages = [
-                "Carregando base de usuários...",
-                "Analisando padrões comportamentais...",
-                "Executando modelos de ML...",
-                "Correlacionando dados de risco...",
-                "Gerando relatório final..."
-            ]
-            
-            for i in range(100):
-                if i % 20 == 0 and i // 20 < len(stages):
-                    st.text(stages[i // 20])
-                progress.progress(i + 1)
-            
-            # Atualizar estatísticas baseadas na varredura
-            suspicious_found = np.random.randint(8, 25)
-            high_risk_found = np.random.randint(2, 8)
-            st.session_state.system_stats['fraud_detected_today'] += suspicious_found
-            
-            st.success(f"Varredura completa finalizada")
-            st.markdown(f"**Resultados:**")
-            st.markdown(f"- {suspicious_found} casos suspeitos identificados")
-            st.markdown(f"- {high_risk_found} usuários movidos para alto risco")
-            st.markdown(f"- {np.random.randint(50, 200)} perfis atualizados")
+            # Varredura real da tabela compartilhada; o resultado fica em cache enquanto dados e limiares não mudarem
+            shared = load_shared_dataset()
+            block_threshold = st.session_state.automated_rules['auto_block_threshold']
+            submit_job("full_scan_btn", "Varredura completa", full_scan_job, shared, monitoring_threshold, block_threshold,
+                       cache_key=("varredura", shared.version, monitoring_threshold, block_threshold))
+
+        def show_full_scan(result):
+            st.success("Varredura completa finalizada")
+            st.markdown("**Resultados:**")
+            st.markdown(f"- {result['suspicious']:,} casos suspeitos identificados")
+            st.markdown(f"- {result['high_risk']:,} usuários em alto risco")
+            st.markdown(f"- {result['scanned']:,} perfis analisados · tipologia dominante: {result['top_typology']}")
+        show_job("full_scan_btn", show_full_scan)
     
     with control_cols[2]:
         st.subheader("Automação e IA")
-        auto_mode = st.checkbox("Modo Automático", value=True, key="auto_mode_check")
-        velocity_check = st.checkbox("Velocity Check", 
-                                   value=st.session_state.automated_rules['velocity_check_enabled'],
-                                   key="velocity_check_box")
-        device_fingerprint = st.checkbox("Device Fingerprint", 
-                                       value=st.session_state.automated_rules['device_fingerprint_enabled'],
-                                       key="device_fingerprint_check")
-        geo_anomaly = st.checkbox("Anomalia Geográfica", 
-                                value=st.session_state.automated_rules['geo_anomaly_enabled'],
-                                key="geo_anomaly_check")
+        velocity_check = st.checkbox("Velocity Check", key="velocity_check_box")
+        device_fingerprint = st.checkbox("Device Fingerprint", key="device_fingerprint_check")
+        geo_anomaly = st.checkbox("Anomalia Geográfica", key="geo_anomaly_check")
         
         # Atualizar regras
         st.session_state.automated_rules.update({
@@ -787,17 +1514,27 @@ with st.expander("Centro de Comando e Controle", expanded=False):
     
     with control_cols[3]:
         st.subheader("Status do Sistema")
-        current_stats = st.session_state.system_stats
+        shared = load_shared_dataset()
+        # A fila já contém só as contas ativas; descontam-se os bloqueios feitos nesta sessão
+        queue = shared.investigation_queue
+        active_users = len(queue) - queue.count_open(st.session_state.overlay.blocked_positions(shared))
+        _, transactions_per_minute = metrics.window('transactions', '1m', 2)
         
         st.metric("Usuários Ativos", 
-                 f"{current_stats['active_users']:,}",
+                 f"{active_users:,}",
                  f"+{np.random.randint(150, 400)}")
         st.metric("Transações/min", 
-                 f"{current_stats['transactions_per_min']:,}",
+                 f"{int(transactions_per_minute[0]):,}",
                  f"{'PAUSADO' if st.session_state.get('emergency_mode') else 'Normal'}")
-        st.metric("Acurácia ML", 
-                 f"{current_stats['ml_accuracy']:.1f}%",
-                 f"+{np.random.uniform(0.1, 0.5):.1f}%")
+        # Medida ao vivo nos rótulos confirmados; a variação é em relação à última avaliação em lote
+        fraud_model = get_model_evaluator().evaluate(TRAINED_MODEL, ml_model_version(TRAINED_MODEL),
+                                                     st.session_state.automated_rules['auto_monitoring_threshold'] / 1000,
+                                                     confidence=None)
+        last_accuracy = metrics.latest('ml_accuracy', default=None)
+        st.metric("Acurácia ML",
+                 f"{fraud_model['accuracy']:.1%}" if fraud_model else "—",
+                 f"{fraud_model['accuracy'] * 100 - last_accuracy:+.2f} p.p." if fraud_model and last_accuracy is not None else None)
+        st.caption(f"Hoje: {metrics.since_midnight('frauds'):,.0f} fraudes detectadas · {metrics.since_midnight('blocks'):,.0f} bloqueios")
         
         if st.button("NOTIFICAR EQUIPE", key="notify_team_btn"):
             analysts_count = np.random.randint(5, 12)
@@ -807,11 +1544,15 @@ with st.expander("Centro de Comando e Controle", expanded=False):
             st.markdown("- Email: Todos")
             st.markdown("- SMS: Supervisores")
 
+with st.expander("Centro de Comando e Controle", expanded=False):
+    render_command_center()
+
 # Log de Alertas Recentes
-if st.session_state.real_time_alerts:
+recent_alerts = metrics.recent_events(5)
+if recent_alerts:
     with st.expander("Log de Alertas e Eventos", expanded=False):
         st.subheader("Últimos 5 Eventos do Sistema")
-        for alert in reversed(st.session_state.real_time_alerts[-5:]):
+        for alert in reversed(recent_alerts):
             level_color = "danger" if alert['level'] == 'CRÍTICO' else "warning" if alert['level'] == 'MODERADO' else "info"
             timestamp_str = alert['timestamp'].strftime('%H:%M:%S')
             
@@ -832,10 +1573,43 @@ with col_footer3:
     uptime_days = (datetime.now() - datetime.now().replace(day=1)).days
     st.caption(f"Uptime: {uptime_days} dias")
 
-# --- Abas Principais ---
-ato1, ato2, ato3, ato4 = st.tabs(["Ato I: Pulso da Operação", "Ato II: Vigília Constante", "Ato III: Sala de Investigação", "Ato IV: Inteligência Estratégica"])
+with st.expander("Relatório de Memória (Compartilhada vs. Sessão)", expanded=False):
+    memory = get_overlay_registry().memory_report(load_shared_dataset())
+    memory_cols = st.columns(5)
+    memory_cols[0].metric("Mapeado do Disco (Page Cache)", format_bytes(memory['mapped_bytes']))
+    memory_cols[1].metric("Projeções em Memória", format_bytes(memory['materialized_bytes']))
+    memory_cols[2].metric("Sessões Ativas", memory['sessions'])
+    memory_cols[3].metric("Overlay desta Sessão", format_bytes(st.session_state.overlay.nbytes()))
+    memory_cols[4].metric("Overlays (Todas as Sessões)", format_bytes(memory['session_bytes_total']))
+    figures = get_figure_cache().snapshot()
+    st.caption(f"Cache de figuras: {figures['entries']} figuras · {format_bytes(figures['bytes'])} · "
+               f"{figures['hits']:,} acertos / {figures['misses']:,} faltas ({figures['hit_rate']:.0%}) · "
+               f"{figures['evictions']:,} despejos · {figures['invalidations']:,} invalidadas")
 
-with ato1:
+with st.expander("Tarefas em Segundo Plano", expanded=False):
+    executor = get_job_executor()
+    session_jobs = executor.jobs(owner=current_session_id())
+    job_stats = executor.snapshot()
+    st.caption(f"Processo: {job_stats['active']} ativas · {job_stats['submitted']:,} submetidas · "
+               f"{job_stats['cache_hits']:,} resultados reaproveitados · {job_stats['done']:,} concluídas · "
+               f"{job_stats['cancelled']:,} canceladas · {job_stats['failed']:,} com falha")
+    if session_jobs:
+        st.dataframe(pd.DataFrame([{"Tarefa": job.name, "Estado": job.status, "Progresso": f"{job.progress:.0%}",
+                                    "Etapa": job.stage, "Duração (s)": round(job.seconds, 1)} for job in session_jobs]),
+                     hide_index=True, use_container_width=True)
+        for job in session_jobs:
+            if not job.finished and st.button(f"Cancelar: {job.name}", key=f"cancel_panel_job_{job.id}",
+                                              disabled=job.cancel_requested):
+                executor.cancel(job.id)
+    else:
+        st.info("Nenhuma tarefa submetida nesta sessão.")
+RERUN_PROFILE.lap("Comando, eventos e memória")
+
+# --- Atos Principais ---
+# Cada ato é uma função: só o ato ativo é executado a cada rerun (a navegação fica no fim do script)
+
+def render_act_pulse():
+    """Ato I: Pulso da Operação."""
     st.header("Visão Geral e Saúde da Plataforma")
     
     # Primeira linha - Métricas principais
@@ -852,7 +1626,12 @@ with ato1:
     with col2:
         with widget_container():
             st.subheader("Atividade e Risco Geográfico")
-            st.plotly_chart(create_risk_map_br(APP_THEME), use_container_width=True)
+            # Drill-down do Brasil para as células de um estado (mapa e mapa de calor abaixo)
+            states = load_shared_dataset().geo_cube.by_state()
+            geo_state = st.selectbox("Região", ["Brasil", *states['name'][np.argsort(-states['accounts'], kind='stable')]],
+                                     key="geo_state")
+            geo_state = None if geo_state == "Brasil" else geo_state
+            st.plotly_chart(create_risk_map_br(geo_state, APP_THEME), use_container_width=True)
     
     # Segunda linha - Gráficos avançados
     col3, col4 = st.columns(2)
@@ -871,10 +1650,14 @@ with ato1:
         with widget_container():
             st.subheader("Fluxo de Transações (Tempo Real)")
             st.plotly_chart(create_real_time_transaction_flow(APP_THEME), use_container_width=True)
+            ingest = get_ingestion_service().snapshot()
+            st.caption(f"Ingestão: {ingest['processed']:,} transações · {ingest['rate']:,.1f} tx/s · "
+                       f"fila {ingest['queue_fill']:.0%} · contrapressão {ingest['backpressure_waits']:,}x "
+                       f"({ingest['backpressure_seconds']:.1f}s)" + (f" · erro: {ingest['error']}" if ingest['error'] else ""))
     with col6:
         with widget_container():
             st.subheader("Mapa de Calor por Estado")
-            st.plotly_chart(create_geographic_risk_heatmap(APP_THEME), use_container_width=True)
+            st.plotly_chart(create_geographic_risk_heatmap(geo_state, APP_THEME), use_container_width=True)
     
     # Quarta linha - Inteligência operacional
     with widget_container():
@@ -887,11 +1670,8 @@ with ato1:
         quick_cols = st.columns(5)
         
         with quick_cols[0]:
-            if st.button("MODO ALTO RISCO", use_container_width=True, key="high_risk_mode_btn"):
-                # Simular ativação do modo alto risco
-                st.session_state.automated_rules['auto_block_threshold'] = 850
-                st.session_state.automated_rules['auto_monitoring_threshold'] = 700
-                
+            if st.button("MODO ALTO RISCO", use_container_width=True, key="high_risk_mode_btn", on_click=set_rules,
+                         args=({'auto_block_threshold': 850, 'auto_monitoring_threshold': 700},)):
                 st.warning("MODO ALTO RISCO ATIVADO")
                 st.markdown("**Configurações Aplicadas:**")
                 st.markdown("- Threshold de bloqueio: 950 → 850")
@@ -901,60 +1681,47 @@ with ato1:
         
         with quick_cols[1]:
             if st.button("EXECUTAR ML BATCH", use_container_width=True, key="ml_batch_btn"):
-                with st.spinner("Processando lote de análise..."):
-                    # Simular processamento ML realista
-                    progress_bar = st.progress(0)
-                    
-                    stages = [
-                        "Preparando dataset...",
-                        "Executando feature engineering...", 
-                        "Aplicando modelos de classificação...",
-                        "Calculando scores de risco...",
-                        "Atualizando base de dados..."
-                    ]
-                    
-                    for i in range(100):
-                        if i % 20 == 0 and i // 20 < len(stages):
-                            st.text(stages[i // 20])
-                        progress_bar.progress(i + 1)
-                    
-                    # Simular resultados
-                    users_processed = np.random.randint(2500, 3200)
-                    high_risk_found = np.random.randint(45, 89)
-                    model_accuracy = np.random.uniform(93.5, 96.2)
-                    
-                    st.session_state.system_stats['ml_accuracy'] = model_accuracy
-                    st.session_state.system_stats['fraud_detected_today'] += high_risk_found
-                    
-                    st.success("Processamento ML Finalizado")
-                    st.markdown("**Resultados:**")
-                    st.markdown(f"- {users_processed:,} usuários analisados")
-                    st.markdown(f"- {high_risk_found} casos de alto risco identificados")
-                    st.markdown(f"- Acurácia do modelo: {model_accuracy:.2f}%")
-                    st.markdown(f"- Tempo de processamento: {np.random.uniform(45, 120):.1f} segundos")
+                threshold = st.session_state.automated_rules['auto_monitoring_threshold']
+                submit_job("ml_batch_btn", "Processamento ML em lote", ml_batch_job, get_model_evaluator(), metrics, threshold,
+                           cache_key=("avaliacao_ml", get_model_evaluator().version, ml_model_version(TRAINED_MODEL), threshold))
+
+            def show_ml_batch(result):
+                if not result['models']:
+                    st.info("Nenhum rótulo confirmado ainda")
+                    return
+                st.success("Processamento ML Finalizado")
+                st.markdown("**Resultados (rótulos confirmados, IC 95%):**")
+                for model, measured in result['models'].items():
+                    low, high = measured['ci'].get('accuracy', (measured['accuracy'],) * 2)
+                    st.markdown(f"- {model} {ml_model_version(model)}: acurácia {measured['accuracy']:.2%} "
+                                f"({low:.2%}–{high:.2%}) · {measured['tp'] + measured['fp']:,.0f} alertas "
+                                f"em {measured['labels']:,} rótulos")
+            show_job("ml_batch_btn", show_ml_batch)
         
         with quick_cols[2]:
             if st.button("RELATÓRIO EXECUTIVO", use_container_width=True, key="exec_report_btn"):
-                # Simular geração de relatório executivo
-                with st.spinner("Compilando relatório executivo..."):
-                    progress = st.progress(0)
-                    for i in range(100):
-                        progress.progress(i + 1)
-                
-                report_data = {
-                    'total_fraud_prevented': f"R$ {np.random.randint(4500, 6200) * 1000:,}",
-                    'cases_resolved': np.random.randint(1200, 1800),
-                    'accuracy_improvement': np.random.uniform(2.1, 4.8),
-                    'cost_savings': f"R$ {np.random.randint(180, 340) * 1000:,}"
-                }
-                
+                # Sessões com as mesmas regras compartilham o relatório dentro da janela de REPORT_CACHE_SECONDS
+                shared, rules = load_shared_dataset(), dict(st.session_state.automated_rules)
+                submit_job("exec_report_btn", "Relatório executivo", executive_report_job, shared, get_model_evaluator(), rules,
+                           cache_key=("relatorio", shared.version, tuple(sorted(rules.items())),
+                                      int(time.time() // REPORT_CACHE_SECONDS)))
+
+            def show_executive_report(report_data):
+                backtest = report_data['backtest']
                 st.success("Relatório Executivo Gerado")
-                st.markdown("**Resumo Gerencial:**")
-                st.markdown(f"- Fraudes prevenidas: {report_data['total_fraud_prevented']}")
-                st.markdown(f"- Casos resolvidos: {report_data['cases_resolved']:,}")
-                st.markdown(f"- Melhoria na acurácia: +{report_data['accuracy_improvement']:.1f}%")
-                st.markdown(f"- Economia operacional: {report_data['cost_savings']}")
+                st.markdown("**Resumo Gerencial (regras atuais sobre o histórico):**")
+                st.markdown(f"- Fraudes prevenidas: R$ {backtest['fraud_caught_value']:,.0f} "
+                            f"({backtest['fraud_caught_pct']:.1f}% do valor fraudado)")
+                st.markdown(f"- Fraudes interceptadas: {backtest['fraud_blocked'] + backtest['fraud_reviewed']:,} "
+                            f"de {backtest['fraud']:,}")
+                st.markdown(f"- Custo operacional de revisão: R$ {backtest['operational_cost']:,.0f} "
+                            f"({backtest['reviews']:,} revisões)")
+                fraud_model = report_data['models'].get(TRAINED_MODEL)
+                if fraud_model is not None:
+                    st.markdown(f"- {TRAINED_MODEL} {report_data['version']}: precisão {fraud_model['precision']:.1%} · "
+                                f"recall {fraud_model['recall']:.1%}")
                 st.info("Relatório enviado para: C-Level, Diretoria de Risco, Gerentes")
+            show_job("exec_report_btn", show_executive_report)
         
         with quick_cols[3]:
             if st.button("VERIFICAR GEO-BLOCKS", use_container_width=True, key="geo_blocks_btn"):
@@ -967,7 +1734,7 @@ with ato1:
                 }
                 
                 total_blocked = sum(geo_blocks.values())
-                st.session_state.system_stats['blocked_today'] += total_blocked
+                metrics.add('blocks', total_blocked)
                 
                 st.success("Verificação de Geo-blocks Concluída")
                 st.markdown("**Países com Bloqueios Ativos:**")
@@ -982,39 +1749,104 @@ with ato1:
         
         with quick_cols[4]:
             if st.button("OTIMIZAR REGRAS IA", use_container_width=True, key="optimize_rules_btn"):
-                # Simular otimização de regras via IA
-                with st.spinner("Executando algoritmo de otimização..."):
-                    progress = st.progress(0)
-                    optimization_steps = [
-                        "Analisando performance histórica...",
-                        "Identificando gargalos...",
-                        "Calculando novos thresholds...",
-                        "Validando otimizações...",
-                        "Aplicando melhorias..."
-                    ]
-                    
-                    for i in range(100):
-                        if i % 20 == 0 and i // 20 < len(optimization_steps):
-                            st.text(optimization_steps[i // 20])
-                        progress.progress(i + 1)
-                
-                # Simular resultados da otimização
-                improvements = {
-                    'false_positive_reduction': np.random.uniform(12, 28),
-                    'detection_improvement': np.random.uniform(8, 18),
-                    'processing_speed': np.random.uniform(15, 35),
-                    'cost_efficiency': np.random.uniform(18, 32)
-                }
-                
-                st.success("Otimização IA Finalizada")
-                st.markdown("**Melhorias Implementadas:**")
-                st.markdown(f"- Redução de falsos positivos: -{improvements['false_positive_reduction']:.1f}%")
-                st.markdown(f"- Melhoria na detecção: +{improvements['detection_improvement']:.1f}%") 
-                st.markdown(f"- Aumento velocidade: +{improvements['processing_speed']:.1f}%")
-                st.markdown(f"- Eficiência de custo: +{improvements['cost_efficiency']:.1f}%")
-                st.info("Novas regras ativadas automaticamente")
-
-with ato2:
+                submit_rule_optimization("optimize_rules_btn")
+            show_job("optimize_rules_btn", show_rule_optimization)
+
+@timed_fragment("Fila de Investigação")
+def render_investigation_queue():
+    """Fila de investigação: paginação, filtros e ações reexecutam só a fila."""
+    st.subheader("🔍 Fila de Investigação Inteligente")
+
+    # Filtros avançados
+    with st.expander("🎯 Filtros Inteligentes", expanded=False):
+        risk_filter = st.selectbox("Filtrar por Risco", ["Todos", "Crítico (900+)", "Alto (800+)", "Médio (600+)"])
+        fraud_type_filter = st.selectbox("Tipo de Fraude", ["Todos", "Anel de Fraude", "CPF", "Chargeback", "Bônus"])
+
+    # Filtros aplicados no índice (tipologia, score) da fila: só a página atual é lida
+    shared = load_shared_dataset()
+    queue = shared.investigation_queue
+    min_score = int(risk_filter.split('(')[1].split('+')[0]) if risk_filter != "Todos" else 0
+    typology_codes = queue.typology_codes(QUEUE_TYPOLOGY_TERMS[fraud_type_filter])
+    queue_filter = (min_score, fraud_type_filter)
+    if st.session_state.queue_filter != queue_filter:
+        st.session_state.queue_filter = queue_filter
+        st.session_state.queue_cursors = [None]
+    overlay = st.session_state.overlay
+    positions, scores, next_cursor = queue.page(
+        QUEUE_PAGE_SIZE, min_score, typology_codes, after=st.session_state.queue_cursors[-1],
+        blocked=shared.user_index.blocked, excluded=overlay.blocked_positions(shared))
+    high_risk_cases = shared.take('users', positions, ['user_id', 'main_risk_factor'])
+    high_risk_cases['risk_score'] = scores
+
+    page_number = len(st.session_state.queue_cursors)
+    st.caption(f"Página {page_number} · {queue.count(min_score, typology_codes):,} casos no filtro")
+    nav_prev, nav_next = st.columns(2)
+    with nav_prev:
+        if st.button("◀ Anterior", key="queue_prev", disabled=page_number == 1, use_container_width=True):
+            st.session_state.queue_cursors.pop()
+            rerun_fragment()
+    with nav_next:
+        if st.button("Próxima ▶", key="queue_next", disabled=next_cursor is None, use_container_width=True):
+            st.session_state.queue_cursors.append(next_cursor)
+            rerun_fragment()
+
+    for _, row in high_risk_cases.iterrows():
+        risk_level = "high-risk" if row['risk_score'] > 800 else "medium-risk"
+        is_selected = row['user_id'] == st.session_state.overlay.selected_case_id
+        card_class = f"user-card {risk_level}{' selected' if is_selected else ''}"
+
+        st.markdown(f'<div class="{card_class}">', unsafe_allow_html=True)
+
+        # Cabeçalho do card mais detalhado
+        col_a, col_b = st.columns([2, 1])
+        with col_a:
+            st.markdown(f"**Usuário:** `{row['user_id']}` | **Score:** {row['risk_score']}")
+            st.markdown(f"<small style='color:var(--subtle-text-color)'>Fator de Risco: {row['main_risk_factor']}</small>", unsafe_allow_html=True)
+        with col_b:
+            urgency_class = "status-critical" if row['risk_score'] > 900 else "status-warning" if row['risk_score'] > 800 else "status-online"
+            urgency_text = "CRÍTICO" if row['risk_score'] > 900 else "ALTO" if row['risk_score'] > 800 else "MODERADO"
+            st.markdown(f'<div style="text-align: center;"><span class="status-indicator {urgency_class}"></span><strong>{urgency_text}</strong></div>', unsafe_allow_html=True)
+
+        # Botões de ação
+        action_cols = st.columns(3)
+        with action_cols[0]:
+            if st.button("INVESTIGAR", key=f"investigate_{row['user_id']}", type="primary", use_container_width=True):
+                st.session_state.overlay.selected_case_id = row['user_id']
+                # Com todos os atos na tela, o Ato III também precisa do caso novo
+                if st.session_state.get('render_all_acts'):
+                    st.rerun()
+                rerun_fragment()
+        with action_cols[1]:
+            if st.button("BLOQUEAR", key=f"quick_block_{row['user_id']}", use_container_width=True):
+                # Bloqueio registrado no overlay da sessão (o caso sai da fila no próximo rerun)
+                st.session_state.overlay.block(row['user_id'])
+                metrics.add('blocks')
+                block_time = datetime.now().strftime('%H:%M:%S')
+
+                st.error(f"USUÁRIO {row['user_id']} BLOQUEADO")
+                st.markdown("**Ações Executadas:**")
+                st.markdown(f"- Conta suspensa às {block_time}")
+                st.markdown("- Transações pendentes canceladas")
+                st.markdown("- Saldo bloqueado para análise")
+                st.markdown("- Notificação enviada ao usuário")
+
+        with action_cols[2]:
+            if st.button("MONITORAR", key=f"quick_monitor_{row['user_id']}", use_container_width=True):
+                # Simular ativação de monitoramento
+                monitoring_level = "INTENSIVO" if row['risk_score'] > 900 else "MODERADO"
+
+                st.warning(f"MONITORAMENTO {monitoring_level} ATIVADO")
+                st.markdown("**Configurações de Monitoramento:**")
+                st.markdown(f"- Nível: {monitoring_level}")
+                st.markdown("- Alertas automáticos: Habilitados")
+                st.markdown("- Frequency: Tempo real")
+                st.markdown("- Duração: 48h (renovável)")
+
+        st.markdown('</div>', unsafe_allow_html=True)
+
+
+def render_act_vigil():
+    """Ato II: Vigília Constante."""
     st.header("Monitoramento em Tempo Real e Alertas")
     
     # Painel de controle superior
@@ -1031,10 +1863,9 @@ with ato2:
         
         with alert_cols[1]:
             if st.button("🤖 Treinar Modelo", use_container_width=True):
-                progress_bar = st.progress(0)
-                for i in range(100):
-                    progress_bar.progress(i + 1)
-                st.success("🧠 Modelo ML retreinado com novos dados")
+                # Atualização incremental (warm start) da última versão com os rótulos seguintes
+                submit_training("train_model", "incremental")
+            show_job("train_model", show_training)
         
         with alert_cols[2]:
             if st.button("📡 Sincronizar Sistemas", use_container_width=True):
@@ -1047,71 +1878,7 @@ with ato2:
     
     col1, col2 = st.columns([1.5, 2])
     with col1:
-        st.subheader("🔍 Fila de Investigação Inteligente")
-        
-        # Filtros avançados
-        with st.expander("🎯 Filtros Inteligentes", expanded=False):
-            risk_filter = st.selectbox("Filtrar por Risco", ["Todos", "Crítico (900+)", "Alto (800+)", "Médio (600+)"])
-            fraud_type_filter = st.selectbox("Tipo de Fraude", ["Todos", "Anel de Fraude", "CPF", "Chargeback", "Bônus"])
-            auto_action = st.checkbox("Ação Automática Habilitada")
-        
-        # Aplicar filtros
-        filtered_cases = st.session_state.df_users[st.session_state.df_users['status'] == 'active']
-        if risk_filter != "Todos":
-            threshold = int(risk_filter.split('(')[1].split('+')[0])
-            filtered_cases = filtered_cases[filtered_cases['risk_score'] >= threshold]
-        
-        high_risk_cases = filtered_cases.sort_values("risk_score", ascending=False)
-        
-        for _, row in high_risk_cases.iterrows():
-            risk_level = "high-risk" if row['risk_score'] > 800 else "medium-risk"
-            is_selected = row['user_id'] == st.session_state.selected_case_id
-            card_class = f"user-card {risk_level}{' selected' if is_selected else ''}"
-            
-            st.markdown(f'<div class="{card_class}">', unsafe_allow_html=True)
-            
-            # Cabeçalho do card mais detalhado
-            col_a, col_b = st.columns([2, 1])
-            with col_a:
-                st.markdown(f"**Usuário:** `{row['user_id']}` | **Score:** {row['risk_score']}")
-                st.markdown(f"<small style='color:var(--subtle-text-color)'>Fator de Risco: {row['main_risk_factor']}</small>", unsafe_allow_html=True)
-            with col_b:
-                urgency_class = "status-critical" if row['risk_score'] > 900 else "status-warning" if row['risk_score'] > 800 else "status-online"
-                urgency_text = "CRÍTICO" if row['risk_score'] > 900 else "ALTO" if row['risk_score'] > 800 else "MODERADO"
-                st.markdown(f'<div style="text-align: center;"><span class="status-indicator {urgency_class}"></span><strong>{urgency_text}</strong></div>', unsafe_allow_html=True)
-            
-            # Botões de ação
-            action_cols = st.columns(3)
-            with action_cols[0]:
-                if st.button("INVESTIGAR", key=f"investigate_{row['user_id']}", type="primary", use_container_width=True):
-                    st.session_state.selected_case_id = row['user_id']
-                    st.rerun()
-            with action_cols[1]:
-                if st.button("BLOQUEAR", key=f"quick_block_{row['user_id']}", use_container_width=True):
-                    # Simular bloqueio com detalhes realistas
-                    st.session_state.system_stats['blocked_today'] += 1
-                    block_time = datetime.now().strftime('%H:%M:%S')
-                    
-                    st.error(f"USUÁRIO {row['user_id']} BLOQUEADO")
-                    st.markdown("**Ações Executadas:**")
-                    st.markdown(f"- Conta suspensa às {block_time}")
-                    st.markdown("- Transações pendentes canceladas")
-                    st.markdown("- Saldo bloqueado para análise")
-                    st.markdown("- Notificação enviada ao usuário")
-                    
-            with action_cols[2]:
-                if st.button("MONITORAR", key=f"quick_monitor_{row['user_id']}", use_container_width=True):
-                    # Simular ativação de monitoramento
-                    monitoring_level = "INTENSIVO" if row['risk_score'] > 900 else "MODERADO"
-                    
-                    st.warning(f"MONITORAMENTO {monitoring_level} ATIVADO")
-                    st.markdown("**Configurações de Monitoramento:**")
-                    st.markdown(f"- Nível: {monitoring_level}")
-                    st.markdown("- Alertas automáticos: Habilitados")
-                    st.markdown("- Frequency: Tempo real")
-                    st.markdown("- Duração: 48h (renovável)")
-            
-            st.markdown('</div>', unsafe_allow_html=True)
+        render_investigation_queue()
 
     with col2:
         st.subheader("Painéis de Análise em Tempo Real")
@@ -1135,18 +1902,8 @@ with ato2:
                         st.markdown(f"- Conversão: {conversion_rate:.1f}%")
                         
                     if st.button("CALIBRAR MODELO", key="calibrate_laranja_btn"):
-                        # Simular recalibração do modelo
-                        with st.spinner("Recalibrando modelo..."):
-                            progress = st.progress(0)
-                            for i in range(100):
-                                progress.progress(i + 1)
-                        
-                        accuracy_improvement = np.random.uniform(2.3, 5.8)
-                        st.info("Modelo recalibrado com sucesso")
-                        st.markdown(f"**Melhorias:**")
-                        st.markdown(f"- Acurácia: +{accuracy_improvement:.1f}%")
-                        st.markdown("- Novos padrões integrados")
-                        st.markdown("- Thresholds otimizados")
+                        submit_training("calibrate_laranja_btn", "calibracao")
+                    show_job("calibrate_laranja_btn", show_training)
                 
                 metrics_cols = st.columns(3)
                 metrics_cols[0].metric("Velocidade de Criação (hora)", "210 contas", "+45%")
@@ -1155,7 +1912,17 @@ with ato2:
         
         with st.expander("Detector de Padrões de Apostas Anômalas", expanded=True):
             with widget_container():
-                st.plotly_chart(create_bet_pattern_scatter(APP_THEME), use_container_width=True)
+                # Zoom pela seleção em caixa no gráfico ou pelos intervalos abaixo; a grade se refina na janela
+                density = load_shared_dataset().bet_density
+                zoom_cols = st.columns([2, 2, 1])
+                value_range = zoom_cols[0].slider("Valor (R$)", density.x_extent[0], density.x_extent[1],
+                                                  density.x_extent, format="%.2f", key="bet_zoom_value")
+                odd_range = zoom_cols[1].slider("Odd", density.y_extent[0], density.y_extent[1],
+                                                density.y_extent, format="%.2f", key="bet_zoom_odd")
+                zoom_cols[2].button("Zoom total", key="bet_zoom_reset", on_click=reset_bet_zoom, args=(density,),
+                                    use_container_width=True)
+                st.plotly_chart(create_bet_pattern_scatter(value_range, odd_range, APP_THEME), use_container_width=True,
+                                key="bet_pattern_chart", on_select=apply_bet_zoom, selection_mode="box")
                 
                 anomaly_cols = st.columns(4)
                 with anomaly_cols[0]:
@@ -1185,10 +1952,10 @@ with ato2:
                         st.markdown(f"- Falsos positivos: {'+' if false_positive_change > 0 else ''}{false_positive_change:.1f}%")
                         
                 with anomaly_cols[2]:
-                    current_anomalies = st.session_state.system_stats.get('anomalies_per_hour', 8.3)
+                    current_anomalies = metrics.latest('anomalies_per_hour', default=8.3)
                     st.metric("Apostas Anômalas/h", f"{current_anomalies}", "+15%")
                 with anomaly_cols[3]:
-                    detection_rate = st.session_state.system_stats.get('detection_accuracy', 94.2)
+                    detection_rate = metrics.latest('detection_accuracy', default=94.2)
                     st.metric("Taxa de Acerto", f"{detection_rate:.1f}%", "ALTA")
         
         with st.expander("Monitor Inteligente de Bônus e Promoções", expanded=True):
@@ -1210,28 +1977,27 @@ with ato2:
                         st.markdown("- Cobertura: Todas as campanhas")
                         
                 with bonus_controls[1]:
-                    if st.button("ANÁLISE CONVERSÃO", key="conversion_analysis_btn"):
-                        # Simular análise de conversão
-                        with st.spinner("Analisando campanhas de bônus..."):
-                            progress = st.progress(0)
-                            for i in range(100):
-                                progress.progress(i + 1)
-                        
-                        campaigns_analyzed = np.random.randint(8, 15)
-                        conversion_avg = np.random.uniform(45, 75)
-                        best_campaign = np.random.choice(['Boas-Vindas', 'Recarga FDS', 'Free Bet'])
-                        
-                        st.info("Análise de conversão finalizada")
+                    if st.button("ANÁLISE DE ABUSO", key="conversion_analysis_btn"):
+                        # O histórico não tem campanhas: a análise é por grupo de pares, na tabela compartilhada
+                        shared = load_shared_dataset()
+                        submit_job("conversion_analysis_btn", "Análise de abuso de bônus", bonus_analysis_job, shared,
+                                   cache_key=("bonus", shared.version))
+
+                    def show_conversion_analysis(result):
+                        st.info("Análise de abuso de bônus finalizada")
                         st.markdown("**Resultados:**")
-                        st.markdown(f"- Campanhas analisadas: {campaigns_analyzed}")
-                        st.markdown(f"- Conversão média: {conversion_avg:.1f}%")
-                        st.markdown(f"- Melhor performance: {best_campaign}")
+                        st.markdown(f"- Contas analisadas: {result['scanned']:,} em {result['groups']} grupos de pares")
+                        st.markdown(f"- {BONUS_PEER_GROUP}: {result['hunters']:,} contas, "
+                                    f"{result['hunter_abuse_rate']:.1%} com abuso · depósito médio "
+                                    f"R$ {result['hunter_deposit_avg']:,.2f}")
+                        st.markdown(f"- Maior taxa de abuso: {result['top_group']} ({result['top_rate']:.1%})")
+                    show_job("conversion_analysis_btn", show_conversion_analysis)
                         
                 with bonus_controls[2]:
-                    abuse_rate = st.session_state.system_stats.get('bonus_abuse_rate', 5.2)
+                    abuse_rate = metrics.latest('bonus_abuse_rate', default=5.2)
                     st.metric("Abuso Detectado", f"{abuse_rate:.1f}%", "-2%")
                 with bonus_controls[3]:
-                    savings = st.session_state.system_stats.get('bonus_savings', 23400)
+                    savings = metrics.latest('bonus_savings', default=23400)
                     st.metric("Economia Estimada", f"R$ {savings/1000:.1f}K", "ALTA")
         
         with st.expander("Radar de Detecção de Anomalias (ML)", expanded=True):
@@ -1241,35 +2007,23 @@ with ato2:
                 radar_controls = st.columns(3)
                 with radar_controls[0]:
                     if st.button("ANÁLISE COMPLETA", key="full_analysis_radar_btn"):
-                        # Simular análise ML completa
-                        with st.spinner("Executando análise comportamental..."):
-                            progress = st.progress(0)
-                            analysis_steps = [
-                                "Coletando dados comportamentais...",
-                                "Aplicando algoritmos de ML...",
-                                "Identificando padrões anômalos...",
-                                "Correlacionando variáveis...",
-                                "Gerando relatório de anomalias..."
-                            ]
-                            
-                            for i in range(100):
-                                if i % 20 == 0 and i // 20 < len(analysis_steps):
-                                    st.text(analysis_steps[i // 20])
-                                progress.progress(i + 1)
-                        
-                        suspicious_users = np.random.randint(8, 18)
-                        anomaly_score_avg = np.random.uniform(0.75, 0.92)
-                        patterns_found = np.random.randint(4, 9)
-                        
+                        # O slider do limiar fica na coluna ao lado, desenhada depois deste botão
+                        shared = load_shared_dataset()
+                        threshold = st.session_state.get("radar_threshold_slider", RADAR_THRESHOLD)
+                        submit_job("full_analysis_radar_btn", "Análise comportamental", behavioral_analysis_job, shared,
+                                   threshold, cache_key=("comportamento", shared.version, threshold))
+
+                    def show_behavioral_analysis(result):
                         st.success("Análise comportamental finalizada")
                         st.markdown("**Resultados da Análise:**")
-                        st.markdown(f"- Usuários suspeitos: {suspicious_users}")
-                        st.markdown(f"- Score médio de anomalia: {anomaly_score_avg:.2f}")
-                        st.markdown(f"- Padrões identificados: {patterns_found}")
+                        st.markdown(f"- Usuários suspeitos: {result['suspicious_users']:,} de {result['scanned']:,}")
+                        st.markdown(f"- Score médio de anomalia: {result['anomaly_score_avg']:.2f}")
+                        st.markdown(f"- Padrões identificados: {result['patterns_found']}")
                         st.markdown("- Recomendação: Investigação manual")
+                    show_job("full_analysis_radar_btn", show_behavioral_analysis)
                         
                 with radar_controls[1]:
-                    threshold_radar = st.slider("Threshold de Anomalia", 0.1, 1.0, 0.7, 0.1, key="radar_threshold_slider")
+                    threshold_radar = st.slider("Threshold de Anomalia", 0.1, 1.0, RADAR_THRESHOLD, 0.1, key="radar_threshold_slider")
                     
                     # Mostrar impacto do threshold
                     sensitivity_level = "ALTA" if threshold_radar < 0.5 else "MÉDIA" if threshold_radar < 0.8 else "BAIXA"
@@ -1293,11 +2047,19 @@ with ato2:
                         st.markdown(f"- Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
                         st.markdown("- Status: Ativo em produção")
 
-with ato3:
-    if not st.session_state.selected_case_id:
+def render_act_investigation():
+    """Ato III: Sala de Investigação."""
+    overlay = st.session_state.overlay
+    shared = load_shared_dataset()
+    user_data = overlay.user_record(shared, overlay.selected_case_id) if overlay.selected_case_id else None
+    if overlay.selected_case_id and user_data is None:
+        # Ex.: dados regenerados para outro perfil enquanto a sessão continuava aberta
+        st.warning(f"O caso {overlay.selected_case_id} não existe no conjunto de dados atual.")
+        overlay.selected_case_id = None
+    if not overlay.selected_case_id:
         st.info("Selecione um caso na 'Fila de Investigação' (Ato II) para iniciar a análise profunda.")
     else:
-        user_data = st.session_state.df_users[st.session_state.df_users['user_id'] == st.session_state.selected_case_id].iloc[0].to_dict()
+        connected_accounts = shared.entity_resolver.size(shared.user_index.position(user_data['user_id']))
         st.header(f"Análise Profunda do Caso: {user_data['user_id']}")
         with widget_container():
             c1, c2 = st.columns(2)
@@ -1308,6 +2070,7 @@ with ato3:
                 - **Fator Principal:** {user_data['main_risk_factor']}<br>
                 - **Localização:** {user_data['state']}, Brasil | **ASN:** {user_data['ip_asn']}<br>
                 - **Device ID:** `{user_data['device_id']}`<br>
+                - **Rede:** {connected_accounts} contas conectadas<br>
                 - **Total Depositado:** R$ {user_data['total_deposited']:.2f}
                 """, unsafe_allow_html=True)
             with c2:
@@ -1319,7 +2082,14 @@ with ato3:
             c3, c4 = st.columns(2)
             with c3:
                 st.subheader("Grafo de Conexões")
-                components.html(create_investigation_graph(user_data, APP_THEME), height=410)
+                graph_nodes = st.session_state.graph_nodes.get(user_data['user_id'], GRAPH_NODE_BUDGET)
+                graph_html, shown_accounts, truncated = create_investigation_graph(user_data, APP_THEME, graph_nodes)
+                components.html(graph_html, height=410)
+                if truncated:
+                    st.caption(f"Mostrando {shown_accounts:,} de {connected_accounts:,} contas conectadas")
+                    if graph_nodes < GRAPH_NODE_LIMIT and st.button("🔎 Expandir grafo", key=f"expand_graph_{user_data['user_id']}"):
+                        st.session_state.graph_nodes[user_data['user_id']] = min(graph_nodes * GRAPH_EXPAND_FACTOR, GRAPH_NODE_LIMIT)
+                        st.rerun()
             with c4:
                 st.subheader("Linha do Tempo Comportamental")
                 st.plotly_chart(create_behavioral_timeline(user_data, APP_THEME), use_container_width=True)
@@ -1328,35 +2098,28 @@ with ato3:
             
             st.subheader("Painel de Ação e Gerenciamento do Caso")
             
-            # Inicializar estados de sessão para as ações
-            if f"account_blocked_{user_data['user_id']}" not in st.session_state:
-                st.session_state[f"account_blocked_{user_data['user_id']}"] = False
-            if f"is_monitoring_{user_data['user_id']}" not in st.session_state:
-                st.session_state[f"is_monitoring_{user_data['user_id']}"] = False
-            if f"report_generated_{user_data['user_id']}" not in st.session_state:
-                st.session_state[f"report_generated_{user_data['user_id']}"] = False
-            
+            # As ações do caso ficam no overlay da sessão, não nos dados compartilhados
             def close_case():
-                st.session_state.selected_case_id = None
+                overlay.selected_case_id = None
                 st.success("✅ Investigação encerrada com sucesso!")
             
             def block_account():
-                st.session_state[f"account_blocked_{user_data['user_id']}"] = True
+                overlay.block(user_data['user_id'])
                 st.error("🚫 Conta bloqueada! Todas as operações foram suspensas.")
                 st.balloons()
             
             def start_monitoring():
-                st.session_state[f"is_monitoring_{user_data['user_id']}"] = True
+                overlay.monitor(user_data['user_id'])
                 st.warning("👁️ Monitoramento ativo! Alertas automáticos configurados.")
             
             def generate_report():
-                st.session_state[f"report_generated_{user_data['user_id']}"] = True
+                overlay.generate_report(user_data['user_id'])
                 st.success("📋 Relatório gerado! Dados bancários e comportamentais compilados.")
             
             act_cols = st.columns([1.5, 1.5, 1.5, 2])
             
             # Botão Bloquear Conta
-            is_blocked = st.session_state[f"account_blocked_{user_data['user_id']}"]
+            is_blocked = user_data['user_id'] in overlay.blocked
             block_label = "🚫 Conta Bloqueada" if is_blocked else "Bloquear Conta"
             if act_cols[0].button(block_label, key=f"block_{user_data['user_id']}", 
                                   type="secondary" if is_blocked else "primary", 
@@ -1364,14 +2127,14 @@ with ato3:
                 block_account()
             
             # Botão Monitorar
-            is_monitoring = st.session_state[f"is_monitoring_{user_data['user_id']}"]
+            is_monitoring = user_data['user_id'] in overlay.monitoring
             monitor_label = "👁️ Monitorando" if is_monitoring else "Monitorar"
             if act_cols[1].button(monitor_label, key=f"monitor_{user_data['user_id']}", 
                                   use_container_width=True, disabled=is_monitoring):
                 start_monitoring()
             
             # Botão Gerar Relatório
-            report_generated = st.session_state[f"report_generated_{user_data['user_id']}"]
+            report_generated = user_data['user_id'] in overlay.reports
             if act_cols[2].button("Gerar Relatório", key=f"report_{user_data['user_id']}", 
                                   use_container_width=True):
                 generate_report()
@@ -1429,8 +2192,8 @@ with ato3:
                             alerts.append("👁️ Monitoramento ativo configurado")
                         if user_data['risk_score'] > 900:
                             alerts.append("🔴 Score de risco crítico")
-                        if "Anel de Fraude" in user_data['main_risk_factor']:
-                            alerts.append("🔗 Possível conexão com rede fraudulenta")
+                        if connected_accounts >= RING_MIN_ACCOUNTS:
+                            alerts.append(f"🔗 Conectada a um anel de {connected_accounts} contas")
                         
                         for alert in alerts:
                             st.markdown(f"- {alert}")
@@ -1465,7 +2228,45 @@ with ato3:
                     else:
                         st.info("📋 Sem Relatório")
 
-with ato4:
+@timed_fragment("Simulador de Políticas")
+def render_policy_simulator():
+    """Simulador de políticas: arrastar um slider reavalia a política contra o histórico rotulado."""
+    with widget_container():
+        st.subheader("🎛️ Simulador Avançado de Políticas de Risco")
+
+        # Simulador com múltiplos parâmetros
+        sim_cols = st.columns(2)
+        with sim_cols[0]:
+            threshold_block = st.slider("Score Bloqueio Automático", 700, 1000, 950, 10)
+            threshold_review = st.slider("Score Revisão Manual", 600, 900, 800, 10)
+            velocity_mult = st.slider("Multiplicador Velocity", 0.5, 3.0, 1.0, 0.1)
+        with sim_cols[1]:
+            geo_enabled = st.checkbox("Geo-blocking Ativo", True)
+            device_enabled = st.checkbox("Device Fingerprint", True)
+            peak_hours_mult = st.slider("Multiplicador Horário Pico", 1.0, 2.0, 1.3, 0.1)
+
+        # Replay da política sobre o histórico de transações pontuadas (somas acumuladas por score)
+        backtest = load_shared_dataset().policy_backtest.evaluate(
+            threshold_block, threshold_review, velocity_mult, geo_enabled, device_enabled, peak_hours_mult)
+
+        sim_results = st.columns(3)
+        sim_results[0].metric("🛡️ Redução de Fraude", f"{backtest['fraud_caught_pct']:.1f}%",
+                              f"R$ {backtest['fraud_caught_value'] / 1e3:,.0f}K evitados", delta_color="off")
+        sim_results[1].metric("⚠️ Falsos Positivos", f"{backtest['false_positive_pct']:.2f}%",
+                              f"{backtest['legit_blocked']:,} bloqueios indevidos", delta_color="inverse")
+        sim_results[2].metric("💰 Custo Operacional", f"R$ {backtest['operational_cost'] / 1e3:,.1f}K",
+                              f"{backtest['reviews']:,} revisões", delta_color="off")
+        st.caption(f"Backtest sobre {backtest['transactions']:,} transações rotuladas "
+                   f"({backtest['fraud']:,} fraudes) · {backtest['fraud_blocked']:,} fraudes bloqueadas e "
+                   f"{backtest['fraud_reviewed']:,} em revisão · avaliado em {backtest['evaluation_us']:,.0f} µs")
+
+        if st.button("✅ Aplicar Configuração", type="primary", use_container_width=True):
+            st.success("✅ Nova configuração aplicada em produção!")
+            st.balloons()
+
+
+def render_act_intelligence():
+    """Ato IV: Inteligência Estratégica."""
     st.header("Inteligência Estratégica e Análise Preditiva")
     
     # Painel de inteligência estratégica
@@ -1475,15 +2276,25 @@ with ato4:
         
         with intelligence_cols[0]:
             if st.button("🚀 Executar Predição Batch", use_container_width=True):
-                progress = st.progress(0)
-                for i in range(100):
-                    progress.progress(i + 1)
-                st.success("🚀 Predições para 50K usuários concluídas")
+                # Scores recalculados das features, partição a partição, e gravados no store; cliques
+                # simultâneos (de qualquer sessão) sobre a mesma versão dos dados compartilham a tarefa
+                shared = load_shared_dataset()
+                submit_job("batch_prediction", "Predição em lote", batch_prediction_job, shared, get_figure_cache(),
+                           get_batch_inference(), cache_key=("predicao", shared.version))
+
+            def show_batch_prediction(result):
+                st.success(f"🚀 Predições para {result['rows']:,} usuários concluídas")
+                st.caption(f"{result['seconds']:.2f}s · {result['rows_per_sec']:,.0f} linhas/s · modelo {result['model']}")
+                heads = result['heads']
+                st.caption(f"Cabeças de risco ({heads['model']}, {heads['workers']} processos): " + " · ".join(
+                    f"{ML_HEAD_LABELS[head]} {stats['rows_per_sec']:,.0f} linhas/s, média {stats['mean']:.1%}, "
+                    f"{stats['high_risk']:,} ≥ {HIGH_RISK:.0%}" for head, stats in heads['heads'].items()))
+            show_job("batch_prediction", show_batch_prediction)
         
         with intelligence_cols[1]:
             if st.button("🎯 Otimizar Thresholds", use_container_width=True):
-                st.info("🎯 Thresholds otimizados via algoritmo genético")
-                st.success("✅ Redução de 15% nos falsos positivos")
+                submit_rule_optimization("optimize_thresholds")
+            show_job("optimize_thresholds", show_rule_optimization)
         
         with intelligence_cols[2]:
             if st.button("📈 Análise de Tendências", use_container_width=True):
@@ -1503,47 +2314,28 @@ with ato4:
         
         with widget_container():
             st.subheader("🎯 Performance dos Modelos de ML")
-            st.plotly_chart(create_ml_model_performance_chart(APP_THEME), use_container_width=True)
+            st.plotly_chart(create_ml_model_performance_chart(st.session_state.automated_rules['auto_monitoring_threshold'],
+                                                              APP_THEME), use_container_width=True)
+            replay = get_label_replay().snapshot()
+            st.caption(f"{replay['confirmed']:,} de {replay['total']:,} rótulos confirmados (transações fora do treino) · "
+                       f"IC 95% por bootstrap · atualiza a cada {LABEL_TICK_SECONDS:.0f}s enquanto chegam rótulos")
             
             ml_controls = st.columns(3)
             with ml_controls[0]:
                 if st.button("🔄 Retreinar Modelos"):
-                    st.success("🤖 Retreinamento agendado para 02:00")
+                    submit_training("retrain_models", "completo")
+                show_job("retrain_models", show_training)
             with ml_controls[1]:
                 if st.button("📊 A/B Test Novos Modelos"):
                     st.info("🧪 Teste A/B iniciado - 10% do tráfego")
             with ml_controls[2]:
                 if st.button("💾 Fazer Deploy"):
-                    st.success("🚀 Deploy realizado em produção")
+                    deploy_latest_model()
+                if 'deploy_notice' in st.session_state:
+                    st.success(st.session_state.pop('deploy_notice'))
     
     with col2:
-        with widget_container():
-            st.subheader("🎛️ Simulador Avançado de Políticas de Risco")
-            
-            # Simulador com múltiplos parâmetros
-            sim_cols = st.columns(2)
-            with sim_cols[0]:
-                threshold_block = st.slider("Score Bloqueio Automático", 700, 1000, 950, 10)
-                threshold_review = st.slider("Score Revisão Manual", 600, 900, 800, 10)
-                velocity_mult = st.slider("Multiplicador Velocity", 0.5, 3.0, 1.0, 0.1)
-            with sim_cols[1]:
-                geo_enabled = st.checkbox("Geo-blocking Ativo", True)
-                device_enabled = st.checkbox("Device Fingerprint", True)
-                peak_hours_mult = st.slider("Multiplicador Horário Pico", 1.0, 2.0, 1.3, 0.1)
-            
-            # Cálculos do simulador
-            fraud_reduction = (1000 - threshold_block) / 4 + velocity_mult * 5 + (15 if geo_enabled else 0)
-            false_positives = (1000 - threshold_block) / 25 + velocity_mult * 2
-            operational_cost = threshold_review * 0.1 + (10 if device_enabled else 5)
-            
-            sim_results = st.columns(3)
-            sim_results[0].metric("🛡️ Redução de Fraude", f"{fraud_reduction:.1f}%", "↗️")
-            sim_results[1].metric("⚠️ Falsos Positivos", f"{false_positives:.1f}%", "inverse")
-            sim_results[2].metric("💰 Custo Operacional", f"R$ {operational_cost:.0f}K/mês", "neutral")
-            
-            if st.button("✅ Aplicar Configuração", type="primary", use_container_width=True):
-                st.success("✅ Nova configuração aplicada em produção!")
-                st.balloons()
+        render_policy_simulator()
         
         with widget_container():
             st.subheader("⚡ Efetividade das Intervenções")
@@ -1655,3 +2447,132 @@ with ato4:
         benchmark_cols[3].metric("💎 Satisfação Cliente", "4.8/5", "⭐")
         benchmark_cols[4].metric("🔄 Uptime Sistema", "99.97%", "🟢")
         benchmark_cols[5].metric("🚀 Inovação Score", "9.2/10", "🏆")
+
+
+# ==============================================================================
+# --- NAVEGAÇÃO ENTRE ATOS ---
+# ==============================================================================
+
+ACTS = {
+    "Ato I: Pulso da Operação": render_act_pulse,
+    "Ato II: Vigília Constante": render_act_vigil,
+    "Ato III: Sala de Investigação": render_act_investigation,
+    "Ato IV: Inteligência Estratégica": render_act_intelligence,
+}
+
+nav_col, mode_col = st.columns([4, 1])
+with mode_col:
+    render_all_acts = st.toggle("Todos os atos (abas)", key='render_all_acts',
+                                help="Executa os quatro atos a cada rerun, como as abas antigas, para comparar a latência")
+with nav_col:
+    # Ato ativo guardado na sessão; os gráficos dos demais atos seguem no cache de figuras
+    active_act = st.radio("Ato", list(ACTS), key='active_act', horizontal=True,
+                          label_visibility="collapsed", disabled=render_all_acts)
+latency_slot = st.container()
+RERUN_PROFILE.lap("Navegação")
+
+def run_act(name):
+    """Renderiza o ato ``name`` e registra a duração no diagnóstico."""
+    started = time.perf_counter()
+    ACTS[name]()
+    get_diagnostics().record("ato", name, (time.perf_counter() - started) * 1e3, session=current_session_id())
+
+if render_all_acts:
+    for act_tab, act_name in zip(st.tabs(list(ACTS)), ACTS):
+        with act_tab:
+            run_act(act_name)
+else:
+    run_act(active_act)
+RERUN_PROFILE.lap("Todos os atos" if render_all_acts else "Ato ativo")
+
+# Warm-up do processo em segundo plano, só depois da primeira renderização (que não espera por ele)
+@st.cache_resource
+def start_warm_up():
+    """Carrega os módulos sob demanda e as estruturas preguiçosas dos dados compartilhados."""
+    shared = load_shared_dataset()
+    profile = get_startup_profile()
+    steps = {module: functools.partial(profile.import_module, module) for module in LAZY_MODULES}
+    steps.update({
+        "Índice de usuários": lambda: shared.user_index,
+        "Resolução de entidades": lambda: shared.entity_resolver,
+        "Fila de investigação": lambda: shared.investigation_queue,
+        "Densidade de apostas": lambda: shared.bet_density,
+        "Backtest de políticas": lambda: shared.policy_backtest,
+    })
+    return profile.start_warm_up(steps)
+
+get_startup_profile().record_first_render(RERUN_PROFILE.total_ms)
+start_warm_up()
+
+rerun_ms = (time.perf_counter() - RERUN_STARTED) * 1e3
+rerun_timings = st.session_state.rerun_timings
+theme_switched = st.session_state.pop('theme_switched', False)
+rerun_mode = "tema" if theme_switched else "todos" if render_all_acts else "ato"
+rerun_timings[rerun_mode].append(rerun_ms)
+# Diagnóstico: tempo do rerun por modo e, no máximo a cada SESSION_STATE_SAMPLE_SECONDS, a memória da sessão
+diagnostics = get_diagnostics()
+diagnostics.record("rerun", RERUN_MODE_LABELS[rerun_mode], rerun_ms, session=current_session_id())
+state_due = time.time() - st.session_state.get('state_sampled_at', 0.0) >= SESSION_STATE_SAMPLE_SECONDS
+if state_due:
+    st.session_state.state_sampled_at = time.time()
+diagnostics.record_session(current_session_id(), st.session_state.to_dict() if state_due else None)
+if rerun_timings["ato"] and rerun_timings["todos"]:
+    lazy_ms, full_ms = np.median(rerun_timings["ato"]), np.median(rerun_timings["todos"])
+    latency_slot.caption(f"⏱️ Rerun: {rerun_ms:,.0f} ms · mediana só do ato ativo: {lazy_ms:,.0f} ms vs. todos os atos: "
+                         f"{full_ms:,.0f} ms ({1 - lazy_ms / full_ms:.0%} menos)")
+else:
+    latency_slot.caption(f"⏱️ Rerun: {rerun_ms:,.0f} ms (ative \"Todos os atos\" para comparar com a renderização completa)")
+# Trocas de tema: figuras vindas do cache (ou recoloridas), comparadas ao rerun completo
+if rerun_timings["tema"]:
+    theme_ms = np.median(rerun_timings["tema"])
+    full_ms = np.median(rerun_timings["todos"] or rerun_timings["ato"] or [theme_ms])
+    latency_slot.caption(f"🎨 Troca de tema: {theme_ms:,.0f} ms (mediana de {len(rerun_timings['tema'])}) · "
+                         f"{theme_ms / full_ms:.0%} de um rerun {'com todos os atos' if rerun_timings['todos'] else 'do ato ativo'}")
+# Reruns parciais (fragmentos) desde o último rerun completo entram na próxima exibição
+fragment_timings = st.session_state.fragment_timings
+if fragment_timings:
+    full_ms = np.median(rerun_timings["todos" if render_all_acts else "ato"])
+    latency_slot.caption(" · ".join([f"⏱️ Rerun completo: {full_ms:,.0f} ms (mediana)"] + [
+        f"{name}: {np.median(samples):,.1f} ms ({len(samples)}x)" for name, samples in fragment_timings.items()]))
+
+# Perfil de inicialização do processo e das seções dos reruns desta sessão
+rerun_sections = st.session_state.rerun_sections
+for section, elapsed_ms in RERUN_PROFILE.sections.items():
+    rerun_sections.setdefault(section, deque(maxlen=RERUN_TIMING_WINDOW)).append(elapsed_ms)
+with st.expander("Perfil de Inicialização e Rerun", expanded=False):
+    startup = get_startup_profile().snapshot()
+    profile_cols = st.columns(3)
+    profile_cols[0].metric("Importações do Script (1º rerun)", f"{startup['script_imports_ms']:,.0f} ms")
+    profile_cols[1].metric("Primeira Renderização", f"{startup['first_render_ms']:,.0f} ms")
+    profile_cols[2].metric("Warm-up em Segundo Plano", f"{sum(startup['warmup'].values()):,.0f} ms",
+                           ("concluído com erros" if startup['warmup_errors'] else "concluído") if startup['warmup_done']
+                           else "em andamento", delta_color="off")
+    lazy_imports = " · ".join(f"{module}: {elapsed:,.0f} ms" for module, elapsed in startup['imports'].items())
+    st.caption(f"Importações sob demanda: {lazy_imports or 'nenhuma ainda'} · warm-up: " +
+               (" · ".join(f"{step}: {elapsed:,.0f} ms" for step, elapsed in startup['warmup'].items()) or "—"))
+    for step, error in startup['warmup_errors'].items():
+        st.warning(f"Warm-up — {step}: {error}")
+    st.dataframe(pd.DataFrame({
+        "Seção": list(rerun_sections),
+        "Este Rerun (ms)": [RERUN_PROFILE.sections.get(section, 0.0) for section in rerun_sections],
+        "Mediana (ms)": [np.median(samples) for samples in rerun_sections.values()],
+        "Máximo (ms)": [max(samples) for samples in rerun_sections.values()],
+        "Reruns": [len(samples) for samples in rerun_sections.values()],
+    }).round(1), hide_index=True, use_container_width=True)
+
+with st.expander("Diagnóstico", expanded=False):
+    summary_rows = diagnostics.summary()
+    summary = pd.DataFrame(summary_rows)
+    if not summary.empty:
+        summary = summary.rename(columns={"kind": "Tipo", "name": "Nome", "count": "Execuções", "p50": "p50 (ms)",
+                                          "p95": "p95 (ms)", "p99": "p99 (ms)", "max": "Máx. (ms)", "nbytes": "JSON (KB)"})
+        summary["JSON (KB)"] = summary["JSON (KB)"] / 1024
+        st.dataframe(summary.round(2), hide_index=True, use_container_width=True)
+    sessions = pd.DataFrame([{"Sessão": session[:8] if session else "—", "Reruns": entry["reruns"],
+                              "session_state": format_bytes(entry["state_bytes"]) if entry["state_bytes"] is not None else "—",
+                              "Último rerun": datetime.fromtimestamp(entry["last_seen"]).strftime('%H:%M:%S')}
+                             for session, entry in list(diagnostics.sessions.items())])
+    st.dataframe(sessions, hide_index=True, use_container_width=True)
+    total_reruns = sum(row["count"] for row in summary_rows if row["kind"] == "rerun")
+    st.caption(f"Custo da instrumentação: {diagnostics.overhead_ms:,.1f} ms em {total_reruns:,} reruns "
+               f"({diagnostics.overhead_ms / max(total_reruns, 1):,.2f} ms/rerun) · log: {diagnostics.log_path}")
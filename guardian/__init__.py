@@ -0,0 +1 @@
+"""Motores de dados e análise da plataforma GuardianAI (independentes do Streamlit)."""
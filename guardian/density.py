@@ -0,0 +1,136 @@
+"""Densidade (valor, odd) das apostas para o gráfico de padrões, com payload limitado.
+
+Em vez de mandar cada aposta ao navegador, as apostas viram uma grade 2D de contagens
+(calculada no servidor com ``np.bincount``) e só as anômalas são desenhadas como pontos
+(WebGL). Uma grade base fina (``BASE_BINS`` x ``BASE_BINS``) é montada uma vez, numa
+passada pelas partições da tabela; cada janela de zoom é uma fatia dessa grade somada
+em blocos até a resolução de exibição. Quando o zoom é mais fino que a grade base, a
+janela é recontada direto das apostas, na resolução pedida.
+
+O número de células e de pontos de cada vista sai de um orçamento de bytes fixo, então
+o tamanho do gráfico não depende do número de apostas.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+BASE_BINS = 1024
+MIN_VIEW_BINS = 16
+MAX_VIEW_BINS = 200
+DEFAULT_BYTE_BUDGET = 256 * 1024
+# Custo medido no JSON do Plotly (arrays NumPy viram base64, com "/" escapado): célula
+# float32 do heatmap e ponto (x, y) float32
+BYTES_PER_CELL = 8
+BYTES_PER_POINT = 14
+GRID_BUDGET_SHARE = 0.5
+ANOMALOUS_TYPE = "Anômala"
+
+
+def _anomalous_mask(column):
+    """Máscara das apostas anômalas num bloco da coluna ``type`` (dicionário Arrow ou texto)."""
+    if pa.types.is_dictionary(column.type):
+        categories = column.dictionary.to_pylist()
+        if ANOMALOUS_TYPE not in categories:
+            return np.zeros(len(column), dtype=bool)
+        return column.indices.to_numpy(zero_copy_only=False) == categories.index(ANOMALOUS_TYPE)
+    return np.asarray(column.to_numpy(zero_copy_only=False) == ANOMALOUS_TYPE)
+
+
+def _cells(values, start, stop, bins):
+    """Índice da célula de cada valor em ``[start, stop]`` dividido em ``bins`` (o topo fica na última)."""
+    scale = bins / (stop - start) if stop > start else 0.0
+    return np.minimum(((values - start) * scale).astype(np.int64), bins - 1)
+
+
+def _pool(counts, fx, fy):
+    """Soma blocos ``fx`` x ``fy`` da grade (bordas completadas com zeros)."""
+    nx, ny = -(-counts.shape[0] // fx), -(-counts.shape[1] // fy)
+    padded = np.zeros((nx * fx, ny * fy), dtype=counts.dtype)
+    padded[:counts.shape[0], :counts.shape[1]] = counts
+    return padded.reshape(nx, fx, ny, fy).sum(axis=(1, 3))
+
+
+class BetDensity:
+    """Grade base de contagens (valor x odd) e coordenadas das apostas anômalas."""
+
+    def __init__(self, table, base_bins=BASE_BINS):
+        self.table = table.select(["value", "odd", "type"])
+        self.n_bets = self.table.num_rows
+        self.base_bins = base_bins
+        self.x_extent, self.y_extent = (self._extent(column) for column in ("value", "odd"))
+        self.base = np.zeros((base_bins, base_bins), dtype=np.int64)
+        anomalies = []
+        for value, odd, anomalous in self._batches():
+            cells = _cells(value, *self.x_extent, base_bins) * base_bins + _cells(odd, *self.y_extent, base_bins)
+            self.base += np.bincount(cells, minlength=base_bins * base_bins).reshape(base_bins, base_bins)
+            anomalies.append(np.stack([value[anomalous], odd[anomalous]], axis=1))
+        anomalies = np.concatenate(anomalies) if anomalies else np.empty((0, 2), dtype=np.float32)
+        # Anômalas ordenadas por valor: a janela de zoom corta o eixo x por busca binária
+        anomalies = anomalies[np.argsort(anomalies[:, 0], kind="stable")]
+        self.anomaly_value, self.anomaly_odd = np.ascontiguousarray(anomalies[:, 0]), np.ascontiguousarray(anomalies[:, 1])
+
+    def _extent(self, column):
+        extent = pc.min_max(self.table.column(column))
+        low, high = extent["min"].as_py(), extent["max"].as_py()
+        return (0.0, 1.0) if low is None else (float(low), float(high))
+
+    def _batches(self):
+        for batch in self.table.to_batches():
+            yield (batch.column(0).to_numpy(zero_copy_only=False), batch.column(1).to_numpy(zero_copy_only=False),
+                   _anomalous_mask(batch.column(2)))
+
+    def _edges(self, extent, start, stop):
+        step = (extent[1] - extent[0]) / self.base_bins
+        return extent[0] + np.arange(start, stop + 1) * step
+
+    def _base_window(self, extent, lo, hi):
+        """Células base ``[início, fim)`` que cobrem ``[lo, hi]``."""
+        step = (extent[1] - extent[0]) / self.base_bins or 1.0
+        start = int(np.clip(np.floor((lo - extent[0]) / step), 0, self.base_bins - 1))
+        stop = int(np.clip(np.ceil((hi - extent[0]) / step), start + 1, self.base_bins))
+        return start, stop
+
+    def _recount(self, x_range, y_range, bins):
+        """Contagens exatas da janela, lidas das apostas (zoom mais fino que a grade base)."""
+        counts = np.zeros(bins * bins, dtype=np.int64)
+        for value, odd, _ in self._batches():
+            inside = (value >= x_range[0]) & (value <= x_range[1]) & (odd >= y_range[0]) & (odd <= y_range[1])
+            cells = _cells(value[inside], *x_range, bins) * bins + _cells(odd[inside], *y_range, bins)
+            counts += np.bincount(cells, minlength=bins * bins)
+        return counts.reshape(bins, bins)
+
+    def view(self, x_range=None, y_range=None, byte_budget=DEFAULT_BYTE_BUDGET):
+        """Grade e pontos anômalos da janela ``x_range`` x ``y_range`` (tudo, se omitidas).
+
+        Devolve as bordas de cada eixo, ``counts`` (células x, y), as coordenadas das
+        anômalas exibidas (amostra uniforme, se não couberem no orçamento) e os totais.
+        """
+        x_range = tuple(float(v) for v in np.clip(x_range or self.x_extent, *self.x_extent))
+        y_range = tuple(float(v) for v in np.clip(y_range or self.y_extent, *self.y_extent))
+        # Grade do tamanho do orçamento, mas nunca com mais células que apostas
+        bins = int(min(MAX_VIEW_BINS, np.sqrt(byte_budget * GRID_BUDGET_SHARE / BYTES_PER_CELL),
+                       max(MIN_VIEW_BINS, np.sqrt(self.n_bets))))
+        (x0, x1), (y0, y1) = self._base_window(self.x_extent, *x_range), self._base_window(self.y_extent, *y_range)
+        if min(x1 - x0, y1 - y0) * 2 >= bins:
+            fx, fy = -(-(x1 - x0) // bins), -(-(y1 - y0) // bins)
+            counts = _pool(self.base[x0:x1, y0:y1], fx, fy)
+            x_edges = np.minimum(self._edges(self.x_extent, x0, x0 + counts.shape[0] * fx)[::fx], self.x_extent[1])
+            y_edges = np.minimum(self._edges(self.y_extent, y0, y0 + counts.shape[1] * fy)[::fy], self.y_extent[1])
+            exact = False
+        else:
+            counts = self._recount(x_range, y_range, bins)
+            x_edges, y_edges = np.linspace(*x_range, bins + 1), np.linspace(*y_range, bins + 1)
+            exact = True
+
+        lo = np.searchsorted(self.anomaly_value, x_range[0], side="left")
+        hi = np.searchsorted(self.anomaly_value, x_range[1], side="right")
+        value, odd = self.anomaly_value[lo:hi], self.anomaly_odd[lo:hi]
+        inside = np.flatnonzero((odd >= y_range[0]) & (odd <= y_range[1]))
+        max_points = max(0, int((byte_budget - counts.size * BYTES_PER_CELL) // BYTES_PER_POINT))
+        shown = inside if len(inside) <= max_points else inside[np.linspace(0, len(inside) - 1, max_points).astype(np.int64)]
+        return {
+            "x_edges": x_edges, "y_edges": y_edges, "counts": counts, "exact": exact,
+            "anomaly_value": value[shown], "anomaly_odd": odd[shown],
+            "bets": int(counts.sum()), "anomalies": len(inside), "anomalies_shown": len(shown),
+            "estimated_bytes": counts.size * BYTES_PER_CELL + len(shown) * BYTES_PER_POINT,
+        }
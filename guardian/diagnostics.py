@@ -0,0 +1,142 @@
+"""Instrumentação dos caminhos quentes: tempos, tamanhos de payload e memória por sessão.
+
+Cada medida é ``record(tipo, nome, ms, nbytes)``. Tipos usados pelo app: ``figura``,
+``ato``, ``fragmento`` e ``rerun``. As últimas ``window`` amostras de cada (tipo, nome)
+ficam num anel NumPy de tamanho fixo, do qual saem p50/p95/p99. Os contadores, por sua
+vez, somam todas as execuções desde o início do processo.
+
+Toda medida também vira uma linha JSON no log. A escrita no arquivo (com rotação por
+tamanho) é feita por uma thread própria, atrás de uma fila (``QueueHandler``), então o
+custo no rerun é o de enfileirar um registro. O tempo gasto dentro de ``record`` é
+somado em ``overhead_ms`` para que o custo da instrumentação também seja visível.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_WINDOW = 512
+DEFAULT_LOG_PATH = os.environ.get("GUARDIAN_DIAG_LOG", os.path.join(tempfile.gettempdir(), "guardian_diagnostico.log"))
+LOG_MAX_BYTES = 5 << 20
+LOG_BACKUPS = 3
+PERCENTILES = (50, 95, 99)
+DEFAULT_SESSION_TTL = 3600
+
+
+def deep_sizeof(obj, _seen=None):
+    """Bytes aproximados de ``obj`` e do que ele referencia (arrays e DataFrames pelo buffer)."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (obj.nbytes if obj.base is None else 0)
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):  # DataFrame
+        return int(obj.memory_usage(deep=True).sum())
+    if callable(getattr(obj, "nbytes", None)):  # overlays de sessão sabem o próprio tamanho
+        return int(obj.nbytes())
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)) or type(obj).__name__ == "deque":
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class _Series:
+    """Anel das últimas amostras de um (tipo, nome), com contagem total e último tamanho."""
+
+    __slots__ = ("samples", "next", "count", "nbytes")
+
+    def __init__(self, window):
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.next = 0
+        self.count = 0
+        self.nbytes = None
+
+
+class Diagnostics:
+    """Percentis de latência por (tipo, nome), memória por sessão e log rotativo."""
+
+    def __init__(self, window=DEFAULT_WINDOW, log_path=DEFAULT_LOG_PATH, session_ttl=DEFAULT_SESSION_TTL):
+        self.window = window
+        self.session_ttl = session_ttl
+        self.log_path = log_path
+        self._series = {}
+        self.sessions = {}  # sessão -> {"reruns", "state_bytes", "last_seen"}
+        self.overhead_ms = 0.0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._log, self._listener = self._open_log(log_path)
+
+    @staticmethod
+    def _open_log(path):
+        if not path:
+            return None, None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        records = queue.SimpleQueue()
+        log = logging.getLogger(f"guardian.diagnostics.{id(records)}")
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        log.addHandler(logging.handlers.QueueHandler(records))
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+        listener = logging.handlers.QueueListener(records, handler)
+        listener.start()
+        return log, listener
+
+    def record(self, kind, name, elapsed_ms, nbytes=None, session=None):
+        """Registra uma execução de ``name`` (``kind``) que levou ``elapsed_ms`` e gerou ``nbytes``."""
+        started = time.perf_counter()
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                series = self._series[(kind, name)] = _Series(self.window)
+            series.samples[series.next] = elapsed_ms
+            series.next = (series.next + 1) % self.window
+            series.count += 1
+            if nbytes is not None:
+                series.nbytes = nbytes
+        if self._log is not None:
+            self._log.info(json.dumps({"ts": round(time.time(), 3), "kind": kind, "name": name,
+                                       "ms": round(elapsed_ms, 3), "bytes": nbytes, "session": session}))
+        self.overhead_ms += (time.perf_counter() - started) * 1e3
+
+    def record_session(self, session, state=None):
+        """Conta um rerun de ``session``; com ``state``, mede também a memória do estado da sessão."""
+        started = time.perf_counter()
+        state_bytes = deep_sizeof(dict(state)) if state is not None else None
+        with self._lock:
+            entry = self.sessions.setdefault(session, {"reruns": 0, "state_bytes": None, "last_seen": None})
+            entry["reruns"] += 1
+            entry["last_seen"] = time.time()
+            if state_bytes is not None:
+                entry["state_bytes"] = state_bytes
+            # Sessões sem rerun há mais de ``session_ttl`` segundos já foram fechadas
+            for idle in [key for key, seen in self.sessions.items() if seen["last_seen"] < entry["last_seen"] - self.session_ttl]:
+                del self.sessions[idle]
+        self.overhead_ms += (time.perf_counter() - started) * 1e3
+
+    def summary(self):
+        """Uma linha por (tipo, nome): execuções, p50/p95/p99 e máximo (ms) e último tamanho."""
+        with self._lock:
+            items = [(key, series.samples[:min(series.count, self.window)].copy(), series.count, series.nbytes)
+                     for key, series in self._series.items()]
+        rows = []
+        for (kind, name), samples, count, nbytes in sorted(items, key=lambda item: item[0]):
+            p50, p95, p99 = np.percentile(samples, PERCENTILES)
+            rows.append({"kind": kind, "name": name, "count": count, "p50": p50, "p95": p95, "p99": p99,
+                         "max": samples.max(), "nbytes": nbytes})
+        return rows
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
@@ -0,0 +1,210 @@
+"""Resolução de entidades: agrupa contas ligadas por aparelho, chave de pagamento ou ASN.
+
+Duas contas ficam no mesmo componente (anel) quando compartilham, direta ou
+transitivamente, um ``device_id``, um ``payment_method_id`` ou um ``ip_asn``. Chaves
+compartilhadas por mais contas que o limite da coluna em ``max_key_degree`` (ex.: o ASN
+de uma operadora residencial) não identificam uma pessoa e não criam ligações —
+aparecem apenas como contexto no grafo.
+
+Os componentes iniciais são calculados em lote (rotulação vetorizada por NumPy sobre as
+arestas conta -> âncora da chave); contas novas entram depois por union-find
+incremental, sem recalcular o grafo inteiro.
+"""
+import threading
+
+import numpy as np
+
+LINK_COLUMNS = ("device_id", "payment_method_id", "ip_asn")
+# Máximo de contas por chave para que ela ligue contas, por coluna: um aparelho ou chave
+# PIX usado por milhares de contas é uma fazenda de contas; um ASN assim é só um provedor.
+DEFAULT_MAX_KEY_DEGREE = {"device_id": 10_000, "payment_method_id": 10_000, "ip_asn": 50}
+
+
+def connected_components(n_nodes, u, v):
+    """Rótulo de componente (menor posição do componente) de cada nó.
+
+    Cada rodada pendura a raiz maior de cada aresta na menor (``np.minimum.at``) e
+    comprime os caminhos por saltos de ponteiro, até nenhuma aresta ligar raízes
+    diferentes.
+    """
+    labels = np.arange(n_nodes, dtype=np.int64)
+    u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+    while len(u):
+        lu, lv = labels[u], labels[v]
+        crossing = lu != lv
+        if not crossing.any():
+            break
+        u, v, lu, lv = u[crossing], v[crossing], lu[crossing], lv[crossing]
+        np.minimum.at(labels, np.maximum(lu, lv), np.minimum(lu, lv))
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+class EntityResolver:
+    """Componentes de contas ligadas sobre o ``UserIndex`` do processo."""
+
+    def __init__(self, user_index, max_key_degree=None):
+        self.index = user_index
+        self.max_key_degree = {**DEFAULT_MAX_KEY_DEGREE, **(max_key_degree or {})}
+        n_rows = user_index.n_rows
+        sources, targets = [], []
+        for column in LINK_COLUMNS:
+            key_index = user_index.by[column]
+            codes = key_index.codes[:n_rows]
+            degrees = key_index.degrees()[codes]
+            rows = np.flatnonzero((degrees >= 2) & (degrees <= self.max_key_degree[column]))
+            anchors = key_index.first_rows()[codes[rows]]
+            linked = rows != anchors
+            sources.append(rows[linked])
+            targets.append(anchors[linked])
+        self.n_edges = int(sum(len(s) for s in sources))
+        labels = connected_components(n_rows, np.concatenate(sources), np.concatenate(targets))
+
+        # Membros de cada componente do lote em layout CSR (posições ordenadas por rótulo)
+        self._n_base = n_rows
+        self._base_order = np.argsort(labels, kind="stable").astype(np.int64)
+        self._base_offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=n_rows))))
+        self._parent = labels
+        self._size = np.bincount(labels, minlength=n_rows).astype(np.int64)
+        # Raiz -> raízes absorvidas depois do lote (componentes unidos incrementalmente)
+        self._absorbed = {}
+        self.version = 0
+        self._rings = None
+        self._lock = threading.Lock()
+
+    def links(self, column, degree):
+        """Se uma chave de ``column`` usada por ``degree`` contas liga essas contas."""
+        return 2 <= degree <= self.max_key_degree[column]
+
+    def find(self, position):
+        """Raiz do componente de ``position`` (com compressão de caminho por halving)."""
+        parent = self._parent
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = int(parent[position])
+        return int(position)
+
+    def _union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        root, child = min(root_a, root_b), max(root_a, root_b)
+        self._parent[child] = root
+        self._size[root] += self._size[child]
+        self._absorbed.setdefault(root, []).append(child)
+        return True
+
+    def add_users(self, positions):
+        """Liga contas recém-indexadas (``UserIndex.add_users``) aos componentes existentes."""
+        with self._lock:
+            n_rows = self.index.n_rows
+            if n_rows > len(self._parent):
+                capacity = max(n_rows, 2 * len(self._parent))
+                parent = np.arange(capacity, dtype=np.int64)
+                parent[:len(self._parent)] = self._parent
+                size = np.ones(capacity, dtype=np.int64)
+                size[:len(self._size)] = self._size
+                self._parent, self._size = parent, size
+            merged = False
+            for column in LINK_COLUMNS:
+                key_index = self.index.by[column]
+                for position, code in zip(positions, key_index.row_codes(positions)):
+                    if self.links(column, key_index.degree(code)):
+                        merged |= self._union(int(position), int(key_index.members(code)[0]))
+            if merged:
+                self.version += 1
+                self._rings = None
+
+    def size(self, position):
+        """Número de contas no componente de ``position``."""
+        return int(self._size[self.find(position)])
+
+    def _own_members(self, root):
+        if root < self._n_base:
+            return self._base_order[self._base_offsets[root]:self._base_offsets[root + 1]]
+        return np.array([root], dtype=np.int64)
+
+    def members(self, position):
+        """Posições de todas as contas do componente de ``position``."""
+        pending, groups = [self.find(position)], []
+        while pending:
+            root = pending.pop()
+            groups.append(self._own_members(root))
+            pending.extend(self._absorbed.get(root, ()))
+        return np.sort(np.concatenate(groups))
+
+    def rings(self, min_size=2, top=None):
+        """Raízes e tamanhos dos componentes com ``min_size`` contas ou mais, do maior ao menor."""
+        with self._lock:
+            if self._rings is None:
+                n_rows = self.index.n_rows
+                roots = np.flatnonzero(self._parent[:n_rows] == np.arange(n_rows))
+                sizes = self._size[roots]
+                order = np.argsort(-sizes, kind="stable")
+                self._rings = roots[order], sizes[order]
+            roots, sizes = self._rings
+        keep = sizes >= min_size
+        roots, sizes = roots[keep], sizes[keep]
+        return (roots[:top], sizes[:top]) if top else (roots, sizes)
+
+    def neighbourhood(self, position, hops=2, limit=None):
+        """Subgrafo conta-chave ao redor de ``position``, por busca em largura.
+
+        Cada salto vai de uma conta às suas chaves e delas às outras contas que as usam
+        (só por chaves ligantes). Retorna ``users`` (posição -> distância), ``keys``
+        ((coluna, código) -> (chave, nº de contas)) e ``edges`` (pares posição, (coluna, código)).
+        """
+        users, keys, edges = {position: 0}, {}, set()
+        frontier = [position]
+        for hop in range(1, hops + 1):
+            reached = []
+            for column in LINK_COLUMNS:
+                key_index = self.index.by[column]
+                for source, code in zip(frontier, key_index.row_codes(frontier)):
+                    node = (column, int(code))
+                    edges.add((source, node))
+                    if node in keys:
+                        continue
+                    degree = key_index.degree(code)
+                    keys[node] = (key_index.key(code), degree)
+                    if not self.links(column, degree):
+                        continue
+                    for member in key_index.members(code).tolist():
+                        edges.add((member, node))
+                        if member not in users and (limit is None or len(users) < limit):
+                            users[member] = hop
+                            reached.append(member)
+            frontier = reached
+            if not frontier:
+                break
+        edges = {(user, node) for user, node in edges if user in users}
+        return {"users": users, "keys": keys, "edges": sorted(edges)}
+
+    def level_of_detail(self, hood, max_users):
+        """Versão resumida de ``neighbourhood`` com no máximo ``max_users`` contas.
+
+        Ficam as contas mais próximas do caso; chaves com uma só conta visível (folhas, que
+        não ligam ninguém no desenho) são recolhidas quando a vizinhança passa do limite,
+        exceto as do próprio caso. Cada chave ligante informa quantas contas ficaram ocultas.
+        """
+        distance = hood["users"]
+        kept = sorted(distance, key=lambda position: (distance[position], position))[:max_users]
+        focus, kept_set = kept[0], set(kept)
+        collapse_leaves = len(distance) > max_users
+        edges = [(user, node) for user, node in hood["edges"] if user in kept_set]
+        shown = {}
+        for _, node in edges:
+            shown[node] = shown.get(node, 0) + 1
+        if collapse_leaves:
+            edges = [(user, node) for user, node in edges if user == focus or shown[node] > 1]
+            shown = {node: count for node, count in shown.items() if count > 1 or (focus, node) in edges}
+        keys = {}
+        for node, count in shown.items():
+            key, degree = hood["keys"][node]
+            hidden = degree - count if self.links(node[0], degree) else 0
+            keys[node] = (key, degree, hidden)
+        return {"users": kept, "keys": keys, "edges": edges, "truncated": collapse_leaves}
@@ -0,0 +1,199 @@
+"""Avaliação contínua dos modelos: matrizes de confusão e curvas PR a partir de histogramas.
+
+Para cada (modelo, versão) ficam dois histogramas de score (0–1 em ``bins`` faixas), um
+das transações confirmadas como fraude e outro das legítimas. Cada rótulo que chega
+(ex.: um chargeback confirmado) entra com ``observe``, por ``np.bincount``. As somas
+acumuladas "score >= limiar" dos dois histogramas dão a matriz de confusão em qualquer
+limiar: precisão, recall e PR-AUC (precisão média) saem em O(bins).
+
+Os intervalos de confiança são de um bootstrap de Poisson sobre os próprios
+histogramas: cada réplica reamostra as contagens de cada faixa, e todas as réplicas são
+avaliadas de uma vez, como uma matriz réplicas x faixas. Faixas com muitas contagens são
+reamostradas pela aproximação normal da Poisson, bem mais barata de sortear.
+
+``LabelReplay`` reproduz uma tabela rotulada como confirmações chegando aos poucos, para
+alimentar o avaliador enquanto não há uma fonte real de rótulos.
+"""
+import threading
+
+import numpy as np
+
+DEFAULT_BINS = 1000
+DEFAULT_BOOTSTRAP = 200
+DEFAULT_CONFIDENCE = 0.95
+# A partir desta contagem, Poisson(λ) é sorteada como Normal(λ, √λ)
+NORMAL_APPROX_MIN = 30
+METRICS = ("precision", "recall", "accuracy", "f1", "pr_auc")
+
+
+def _rates(negatives, positives, cut):
+    """Métricas no limiar ``cut`` (índice de faixa) para histogramas ``(..., bins)``."""
+    fp_tail = negatives[..., ::-1].cumsum(axis=-1)[..., ::-1]
+    tp_tail = positives[..., ::-1].cumsum(axis=-1)[..., ::-1]
+    n_neg, n_pos = fp_tail[..., 0], tp_tail[..., 0]
+    flagged = tp_tail + fp_tail
+    precision = np.divide(tp_tail, flagged, out=np.ones(flagged.shape), where=flagged > 0)
+    recall = np.divide(tp_tail, n_pos[..., None], out=np.zeros(tp_tail.shape), where=n_pos[..., None] > 0)
+    # Precisão média: soma dos ganhos de recall, do limiar mais alto ao mais baixo, vezes a precisão
+    gain = recall - np.concatenate([recall[..., 1:], np.zeros((*recall.shape[:-1], 1))], axis=-1)
+    tp = tp_tail[..., cut] if cut < tp_tail.shape[-1] else np.zeros_like(n_pos)
+    fp = fp_tail[..., cut] if cut < fp_tail.shape[-1] else np.zeros_like(n_neg)
+    fn, tn = n_pos - tp, n_neg - fp
+    total = np.maximum(n_pos + n_neg, 1)
+    at_precision = np.divide(tp, tp + fp, out=np.ones(tp.shape), where=tp + fp > 0)
+    at_recall = np.divide(tp, n_pos, out=np.zeros(tp.shape), where=n_pos > 0)
+    f1 = np.divide(2 * at_precision * at_recall, at_precision + at_recall,
+                   out=np.zeros(tp.shape), where=at_precision + at_recall > 0)
+    return {
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": at_precision, "recall": at_recall, "accuracy": (tp + tn) / total, "f1": f1,
+        "pr_auc": (gain * precision).sum(axis=-1),
+    }
+
+
+class ModelEvaluator:
+    """Histogramas de score por classe para cada (modelo, versão), alimentados aos poucos."""
+
+    def __init__(self, bins=DEFAULT_BINS, n_bootstrap=DEFAULT_BOOTSTRAP):
+        self.bins = bins
+        self.n_bootstrap = n_bootstrap
+        self._histograms = {}  # (modelo, versão) -> (2, bins): [legítimas, fraudes]
+        self._versions = {}  # modelo -> versões, na ordem em que apareceram
+        self.version = 0  # incrementado a cada lote de rótulos
+        self._lock = threading.Lock()
+
+    def observe(self, model, version, scores, labels):
+        """Soma rótulos confirmados (``labels`` verdadeiro = fraude) dos ``scores`` (0–1) do modelo."""
+        cells = np.clip((np.asarray(scores, dtype=np.float64) * self.bins).astype(np.int64), 0, self.bins - 1)
+        counts = np.bincount(np.asarray(labels, dtype=np.int64) * self.bins + cells, minlength=2 * self.bins)
+        with self._lock:
+            histogram = self._histograms.get((model, version))
+            if histogram is None:
+                histogram = self._histograms[(model, version)] = np.zeros((2, self.bins), dtype=np.int64)
+                self._versions.setdefault(model, []).append(version)
+            histogram += counts.reshape(2, self.bins)
+            self.version += 1
+
+    def models(self):
+        with self._lock:
+            return {model: list(versions) for model, versions in self._versions.items()}
+
+    def latest_version(self, model):
+        with self._lock:
+            versions = self._versions.get(model)
+            return versions[-1] if versions else None
+
+    def histogram(self, model, version=None):
+        """Cópia dos histogramas (legítimas, fraudes) da versão dada (ou da mais recente)."""
+        with self._lock:
+            version = version if version is not None else (self._versions.get(model) or [None])[-1]
+            histogram = self._histograms.get((model, version))
+            return None if histogram is None else histogram.copy()
+
+    def _replicas(self, histogram, seed):
+        """Réplicas do bootstrap de Poisson dos histogramas: ``(n_bootstrap, 2, bins)``."""
+        rng = np.random.default_rng(seed)
+        replicas = np.zeros((self.n_bootstrap, *histogram.shape), dtype=np.float32)
+        large = histogram >= NORMAL_APPROX_MIN
+        small = (histogram > 0) & ~large  # faixas vazias continuam vazias em toda réplica
+        mean = histogram[large].astype(np.float32)
+        noise = rng.standard_normal((self.n_bootstrap, len(mean)), dtype=np.float32)
+        replicas[:, large] = np.maximum(mean + np.sqrt(mean) * noise, 0)
+        replicas[:, small] = rng.poisson(histogram[small], size=(self.n_bootstrap, int(small.sum())))
+        return replicas
+
+    def evaluate(self, model, version=None, threshold=0.5, confidence=DEFAULT_CONFIDENCE, seed=0):
+        """Matriz de confusão e métricas no ``threshold``, com intervalos de confiança do bootstrap.
+
+        Devolve ``None`` se o modelo ainda não tem rótulos; senão, as contagens, as métricas
+        de ``METRICS`` e ``ci`` (métrica -> (inferior, superior)).
+        """
+        histogram = self.histogram(model, version)
+        if histogram is None:
+            return None
+        cut = min(int(np.ceil(threshold * self.bins - 1e-9)), self.bins)
+        result = {key: value.item() for key, value in _rates(histogram[0], histogram[1], cut).items()}
+        result["labels"] = int(histogram.sum())
+        result["ci"] = {}
+        if confidence and self.n_bootstrap:
+            sampled = _rates(*self._replicas(histogram, seed).transpose(1, 0, 2), cut)
+            tail = (1 - confidence) / 2 * 100
+            bounds = np.percentile(np.stack([sampled[metric] for metric in METRICS]), (tail, 100 - tail), axis=1)
+            result["ci"] = {metric: (bounds[0, i].item(), bounds[1, i].item()) for i, metric in enumerate(METRICS)}
+        return result
+
+
+class LabelReplay:
+    """Confirmações de rótulo chegando aos poucos, lidas em ordem de uma tabela rotulada.
+
+    A cada ``tick`` segundos, as próximas ``rows_per_tick`` linhas são pontuadas por
+    ``score(lote) -> {(modelo, versão): scores}`` e somadas ao avaliador com o rótulo da
+    coluna ``label``. As primeiras ``backfill`` linhas entram já em ``start``.
+
+    Um (modelo, versão) que aparece em ``score`` depois do início (ex.: um deploy) é
+    pontuado também nas linhas já confirmadas antes dele; a thread continua verificando
+    novas versões mesmo depois que a tabela termina. Cada linha entra no máximo uma vez
+    por (modelo, versão): os rótulos de uma versão nunca passam de ``confirmed``.
+    """
+
+    def __init__(self, evaluator, table, score, label="is_fraud", rows_per_tick=5000, tick=1.0, backfill=0):
+        self.evaluator = evaluator
+        self.table = table
+        self.score = score
+        self.label = label
+        self.rows_per_tick = rows_per_tick
+        self.tick = tick
+        self.backfill = backfill
+        self.confirmed = 0
+        self._seen = set()  # (modelo, versão) já somados ao avaliador
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _observe(self, batch, scores):
+        labels = batch.column(self.label).to_numpy(zero_copy_only=False)
+        for (model, version), values in scores.items():
+            self.evaluator.observe(model, version, values, labels)
+            self._seen.add((model, version))
+
+    def _feed(self, n_rows):
+        batch = self.table.slice(self.confirmed, n_rows)
+        scores = self.score(batch)
+        if self.confirmed:
+            # Versão que surgiu depois do último catch-up: o próximo soma todas as linhas dela de uma vez
+            scores = {key: values for key, values in scores.items() if key in self._seen}
+        self._observe(batch, scores)
+        self.confirmed += batch.num_rows
+
+    def _catch_up(self):
+        """Soma as linhas já confirmadas para cada (modelo, versão) que ainda não as recebeu."""
+        new = set(self.score(self.table.slice(0, 0))) - self._seen
+        if not new:
+            return
+        for start in range(0, self.confirmed, self.rows_per_tick):
+            batch = self.table.slice(start, min(self.rows_per_tick, self.confirmed - start))
+            scores = self.score(batch)
+            self._observe(batch, {key: scores[key] for key in new if key in scores})
+        self._seen |= new
+
+    def start(self):
+        if self.backfill:
+            self._feed(self.backfill)
+        self._thread = threading.Thread(target=self._run, name="guardian-labels", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            self._catch_up()
+            if self.confirmed < self.table.num_rows:
+                self._feed(self.rows_per_tick)
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self):
+        return {"confirmed": self.confirmed, "total": self.table.num_rows, "running": self.running}
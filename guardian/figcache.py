@@ -0,0 +1,99 @@
+"""Cache LRU de figuras Plotly, limitado por número de entradas e por bytes.
+
+Cada figura é guardada sob ``(função, tema, parâmetros)`` junto com a versão dos dados
+de que foi construída: uma consulta com a mesma chave e a mesma versão é um acerto;
+com versão diferente, a figura é reconstruída e substitui a antiga no mesmo lugar,
+então versões superadas não se acumulam. O tamanho de cada entrada é o do JSON que a
+figura gera (o que vai para o navegador), medido uma vez, na construção. Além da
+troca por versão, ``invalidate`` descarta explicitamente as figuras de uma fonte de
+dados (ex.: ``"users"`` após reescrever os scores).
+
+O cache é único por processo e pode ser compartilhado por todas as sessões, desde que
+as figuras devolvidas não sejam alteradas por quem as recebe.
+"""
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 64 << 20
+
+
+def figure_nbytes(figure):
+    """Bytes do JSON da figura (sem validação, como o Streamlit serializa)."""
+    return len(pio.to_json(figure, validate=False))
+
+
+class FigureCache:
+    """Figuras por (função, tema, parâmetros), válidas enquanto a versão dos dados não mudar."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, sizeof=figure_nbytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # chave -> (versão, figura, bytes, fontes)
+        self.nbytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+        self.by_function = {}  # função -> [acertos, faltas]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        _, _, nbytes, _ = self._entries.pop(key)
+        self.nbytes -= nbytes
+
+    def get_or_build(self, key, version, build, sources=()):
+        """Figura de ``key`` na ``version`` dos dados; chama ``build()`` só em caso de falta.
+
+        ``key[0]`` é o nome da função (usado nos contadores) e ``sources`` as fontes de
+        dados de que a figura depende, para ``invalidate``.
+        """
+        with self._lock:
+            counters = self.by_function.setdefault(key[0], [0, 0])
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                counters[0] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+            self.stats["stale"] += entry is not None
+            counters[1] += 1
+        figure = build()
+        nbytes = self.sizeof(figure)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if nbytes <= self.max_bytes:
+                self._entries[key] = (version, figure, nbytes, frozenset(sources))
+                self.nbytes += nbytes
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+        return figure
+
+    def nbytes_of(self, key):
+        """Bytes do JSON da figura guardada em ``key`` (``None`` se não estiver no cache)."""
+        entry = self._entries.get(key)
+        return entry[2] if entry is not None else None
+
+    def invalidate(self, *sources):
+        """Descarta as figuras que dependem de alguma das ``sources`` (todas, se nenhuma)."""
+        with self._lock:
+            stale = [key for key, (_, _, _, deps) in self._entries.items() if not sources or deps.intersection(sources)]
+            for key in stale:
+                self._drop(key)
+            self.stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def snapshot(self):
+        """Contadores, ocupação e taxa de acerto."""
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries), bytes=self.nbytes,
+                         by_function={name: tuple(counts) for name, counts in self.by_function.items()})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
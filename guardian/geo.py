@@ -0,0 +1,154 @@
+"""Cubo geográfico de risco: contas, risco médio e tipologia dominante por estado e célula.
+
+O território é dividido numa grade fixa de ``GRID_DEGREES`` graus; cada conta cai numa
+chave (estado, célula). O cubo guarda, por chave, a soma dos scores e a contagem de
+contas por tipologia, em vetores densos. Contas novas são somadas (``add``) e scores
+reescritos entram pela diferença (``score_delta``, aplicada com ``apply_deltas`` depois
+que a reescrita é publicada), sem reler a tabela de usuários.
+
+As consultas — totais por estado e células de um estado (drill-down) — só leem o cubo,
+então o tamanho dos gráficos é limitado pelo número de células, não pelo de contas.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Caixa que cobre o Brasil (lat, lon) e resolução da grade
+LAT_RANGE = (-34.0, 6.0)
+LON_RANGE = (-74.0, -34.0)
+GRID_DEGREES = 0.5
+N_LAT = int((LAT_RANGE[1] - LAT_RANGE[0]) / GRID_DEGREES)
+N_LON = int((LON_RANGE[1] - LON_RANGE[0]) / GRID_DEGREES)
+N_CELLS = N_LAT * N_LON
+
+GEO_COLUMNS = ("state", "lat", "lon", "risk_score", "main_risk_factor")
+
+
+def cell_ids(lat, lon):
+    """Célula da grade de cada coordenada (pontos fora da caixa vão para a borda)."""
+    row = np.clip(((np.asarray(lat, dtype=np.float64) - LAT_RANGE[0]) / GRID_DEGREES).astype(np.int64), 0, N_LAT - 1)
+    col = np.clip(((np.asarray(lon, dtype=np.float64) - LON_RANGE[0]) / GRID_DEGREES).astype(np.int64), 0, N_LON - 1)
+    return row * N_LON + col
+
+
+def cell_centers(cells):
+    """(lat, lon) do centro de cada célula."""
+    cells = np.asarray(cells)
+    return (LAT_RANGE[0] + (cells // N_LON + 0.5) * GRID_DEGREES,
+            LON_RANGE[0] + (cells % N_LON + 0.5) * GRID_DEGREES)
+
+
+def _labels(column):
+    """Rótulos por linha de uma coluna categórica (Arrow, pandas ou lista)."""
+    if isinstance(column, (pa.Array, pa.ChunkedArray)):
+        column = column.to_pandas()
+    return pd.Categorical(column)
+
+
+class GeoCube:
+    """Agregados por (estado, célula) mantidos incrementalmente.
+
+    ``background`` é a tipologia de contas sem alerta: ela conta nos totais, mas só é a
+    "tipologia dominante" de uma região se nenhuma outra aparecer lá.
+    """
+
+    def __init__(self, table=None, background=None):
+        self.background = background
+        self.states = []
+        self.typologies = []
+        self.counts = np.zeros((0, N_CELLS, 0), dtype=np.int64)  # estado x célula x tipologia
+        self.risk_sum = np.zeros((0, N_CELLS), dtype=np.float64)
+        self._lock = threading.Lock()
+        if table is not None:
+            for batch in table.select(list(GEO_COLUMNS)).to_batches():
+                self.add(pa.Table.from_batches([batch]))
+
+    def _codes(self, labels, names, axis):
+        """Códigos de ``labels`` em ``names``, acrescentando (e alargando o cubo) os nomes novos."""
+        categories = list(labels.categories)
+        for name in categories:
+            if name not in names:
+                names.append(name)
+                self.counts = np.concatenate([self.counts, np.zeros(
+                    tuple(1 if i == axis else n for i, n in enumerate(self.counts.shape)), dtype=np.int64)], axis=axis)
+                if axis == 0:
+                    self.risk_sum = np.concatenate([self.risk_sum, np.zeros((1, N_CELLS))])
+        lookup = np.array([names.index(name) for name in categories] or [0], dtype=np.int64)
+        return lookup[labels.codes]
+
+    def _keys(self, table):
+        with self._lock:
+            state = self._codes(_labels(table.column("state")), self.states, 0)
+            typology = self._codes(_labels(table.column("main_risk_factor")), self.typologies, 2)
+        cell = cell_ids(table.column("lat").to_numpy(), table.column("lon").to_numpy())
+        return state * N_CELLS + cell, typology
+
+    def add(self, table, sign=1):
+        """Soma (ou, com ``sign=-1``, retira) as contas de ``table`` (colunas ``GEO_COLUMNS``)."""
+        keys, typology = self._keys(table)
+        risk = table.column("risk_score").to_numpy().astype(np.float64)
+        n_keys = len(self.states) * N_CELLS
+        counts = np.bincount(keys * len(self.typologies) + typology, minlength=n_keys * len(self.typologies))
+        risk_sum = np.bincount(keys, weights=risk, minlength=n_keys)
+        with self._lock:
+            self.counts += sign * counts.reshape(self.counts.shape)
+            self.risk_sum += sign * risk_sum.reshape(self.risk_sum.shape)
+
+    def score_delta(self, partition, old_scores, new_scores):
+        """Variação da soma de scores por chave ao trocar os scores de uma partição (não aplicada)."""
+        keys, _ = self._keys(partition)
+        delta = np.asarray(new_scores, dtype=np.float64) - np.asarray(old_scores, dtype=np.float64)
+        return np.bincount(keys, weights=delta)
+
+    def apply_deltas(self, deltas):
+        """Aplica de uma vez as variações de ``score_delta`` (uma por partição)."""
+        with self._lock:
+            flat = self.risk_sum.reshape(-1)
+            for delta in deltas:
+                flat[:len(delta)] += delta
+
+    def _top_typology(self, counts):
+        """Tipologia dominante de cada linha de ``counts`` (regiões x tipologias)."""
+        if not self.typologies:
+            return np.full(len(counts), "", dtype=object)
+        ranked = counts.copy()
+        if self.background in self.typologies:
+            # O fundo só vence onde não há nenhuma conta com alerta
+            background = self.typologies.index(self.background)
+            alerts = counts.sum(axis=1) - counts[:, background]
+            ranked[:, background] = np.where(alerts > 0, -1, counts[:, background])
+        return np.array(self.typologies, dtype=object)[ranked.argmax(axis=1)]
+
+    def by_state(self):
+        """Por estado com contas: nome, contas, score médio, contas com alerta e tipologia dominante."""
+        with self._lock:
+            counts = self.counts.sum(axis=1)
+            risk_sum = self.risk_sum.sum(axis=1)
+        return self._summary(np.array(self.states, dtype=object), counts, risk_sum)
+
+    def by_cell(self, state=None):
+        """Por célula com contas (de ``state``, ou de todos os estados): centro, contas, score médio..."""
+        with self._lock:
+            if state is None:
+                counts, risk_sum = self.counts.sum(axis=0), self.risk_sum.sum(axis=0)
+            elif state in self.states:
+                index = self.states.index(state)
+                counts, risk_sum = self.counts[index].copy(), self.risk_sum[index].copy()
+            else:
+                counts, risk_sum = np.zeros((N_CELLS, len(self.typologies)), dtype=np.int64), np.zeros(N_CELLS)
+        summary = self._summary(np.arange(N_CELLS), counts, risk_sum)
+        summary["cell"] = summary.pop("name")
+        summary["lat"], summary["lon"] = cell_centers(summary["cell"])
+        return summary
+
+    def _summary(self, names, counts, risk_sum):
+        accounts = counts.sum(axis=1)
+        present = accounts > 0
+        alerts = accounts - (counts[:, self.typologies.index(self.background)] if self.background in self.typologies else 0)
+        return {
+            "name": names[present], "accounts": accounts[present],
+            "mean_risk": risk_sum[present] / accounts[present], "alerts": alerts[present],
+            "top_typology": self._top_typology(counts[present]),
+        }
@@ -0,0 +1,177 @@
+"""Índices hash sobre as chaves de usuário (user_id, device_id, payment_method_id, ip_asn).
+
+Cada ``KeyIndex`` guarda uma tabela hash chave -> código e um layout CSR (posições das
+linhas ordenadas por código + offsets), de modo que a busca por chave é O(1) e a lista
+de vizinhos que compartilham a chave sai em O(k), sem varrer a tabela. Linhas novas são
+acrescentadas incrementalmente, sem reconstruir o índice.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+INDEXED_COLUMNS = ("user_id", "device_id", "payment_method_id", "ip_asn")
+UNIQUE_COLUMNS = ("user_id",)
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class KeyIndex:
+    """Índice hash de uma coluna: chave -> posições das linhas com essa chave."""
+
+    def __init__(self, values, unique=False):
+        if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+            codes, keys = values.cat.codes.to_numpy(), pd.Index(values.cat.categories)
+        elif unique:
+            # Chave única (ex.: user_id): a própria tabela hash do Index já é o índice
+            codes, keys = np.arange(len(values)), pd.Index(values)
+        else:
+            codes, uniques = pd.factorize(values, use_na_sentinel=False)
+            keys = pd.Index(uniques)
+        self._keys = keys
+        if len(keys):
+            keys.get_loc(keys[0])  # constrói a tabela hash agora, não na primeira consulta
+        self._new_keys = {}
+        self.codes = codes.astype(np.int32)
+        self._counts = np.bincount(self.codes, minlength=len(self._keys))
+        self._offsets = np.concatenate(([0], np.cumsum(self._counts)))
+        self._order = np.argsort(self.codes, kind="stable").astype(np.int32)
+        # Posições acrescentadas depois da construção, por código
+        self._extra = {}
+        self._extra_codes = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys) + len(self._new_keys)
+
+    def code(self, key):
+        """Código interno da chave, ou ``None`` se ela nunca foi vista."""
+        code = self._new_keys.get(key)
+        if code is not None:
+            return code
+        try:
+            code = self._keys.get_loc(key)
+        except (KeyError, TypeError):
+            return None
+        return code if isinstance(code, (int, np.integer)) else None
+
+    def key(self, code):
+        """Chave correspondente a um código."""
+        if code < len(self._keys):
+            return self._keys[code]
+        return next(k for k, c in self._new_keys.items() if c == code)
+
+    def members(self, code):
+        """Posições das linhas com o código ``code``."""
+        base = self._order[self._offsets[code]:self._offsets[code + 1]] if code < len(self._counts) else _EMPTY
+        extra = self._extra.get(code)
+        return np.concatenate((base, extra)).astype(np.int64) if extra else base.astype(np.int64)
+
+    def degree(self, code):
+        """Número de linhas com o código ``code``."""
+        base = int(self._counts[code]) if code < len(self._counts) else 0
+        return base + len(self._extra.get(code, ()))
+
+    def degrees(self):
+        """Número de linhas por código, para todos os códigos."""
+        degrees = np.zeros(len(self), dtype=np.int64)
+        degrees[:len(self._counts)] = self._counts
+        for code, extra in self._extra.items():
+            degrees[code] += len(extra)
+        return degrees
+
+    def first_rows(self):
+        """Primeira posição de cada código da construção em lote (âncora de cada grupo)."""
+        return self._order[np.minimum(self._offsets[:-1], max(len(self._order) - 1, 0))].astype(np.int64)
+
+    def row_codes(self, positions):
+        """Códigos das linhas nas posições dadas (inclui linhas acrescentadas)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        codes = np.empty(len(positions), dtype=np.int64)
+        base = positions < len(self.codes)
+        codes[base] = self.codes[positions[base]]
+        if not base.all():
+            codes[~base] = np.asarray(self._extra_codes)[positions[~base] - len(self.codes)]
+        return codes
+
+    def positions(self, key):
+        """Posições de todas as linhas com a chave ``key`` (vazio se não existir)."""
+        code = self.code(key)
+        return _EMPTY if code is None else self.members(code)
+
+    def count(self, key):
+        code = self.code(key)
+        return 0 if code is None else self.degree(code)
+
+    def add(self, keys, start):
+        """Acrescenta ``keys`` como as linhas ``start, start + 1, ...``."""
+        with self._lock:
+            for offset, key in enumerate(keys):
+                code = self.code(key)
+                if code is None:
+                    code = len(self._keys) + len(self._new_keys)
+                    self._new_keys[key] = code
+                self._extra.setdefault(code, []).append(start + offset)
+                self._extra_codes.append(code)
+
+    def group_sizes(self):
+        """Para cada linha, quantas linhas compartilham a mesma chave (vetorizado)."""
+        codes = self.codes if not self._extra_codes else np.concatenate((self.codes, self._extra_codes))
+        return self.degrees()[codes]
+
+
+class UserIndex:
+    """Índices das colunas-chave de usuário, com bitmap de contas bloqueadas no processo.
+
+    O bitmap parte da coluna ``status`` e recebe os bloqueios globais (automáticos); os
+    bloqueios feitos por um analista ficam no overlay da sessão e entram via ``exclude``.
+    """
+
+    def __init__(self, frame):
+        self.by = {column: KeyIndex(frame[column], unique=column in UNIQUE_COLUMNS) for column in INDEXED_COLUMNS}
+        self.n_rows = len(frame)
+        self._blocked = np.zeros(max(self.n_rows, 1), dtype=bool)
+        if "status" in frame:
+            self._blocked[:self.n_rows] = (frame["status"] == "blocked").to_numpy()
+        self.version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def blocked(self):
+        return self._blocked[:self.n_rows]
+
+    def position(self, user_id):
+        """Posição da linha do usuário, ou ``None``."""
+        positions = self.by["user_id"].positions(user_id)
+        return int(positions[0]) if len(positions) else None
+
+    def neighbours(self, column, key, include_blocked=True, exclude=()):
+        """Posições dos usuários que compartilham ``key`` na coluna ``column``."""
+        positions = self.by[column].positions(key)
+        if not include_blocked:
+            positions = positions[~self._blocked[positions]]
+            if exclude:
+                positions = positions[~np.isin(positions, list(exclude))]
+        return positions
+
+    def add_users(self, frame):
+        """Indexa novas linhas de usuário, anexadas ao final da tabela."""
+        with self._lock:
+            start = self.n_rows
+            for column in INDEXED_COLUMNS:
+                self.by[column].add(frame[column], start)
+            self.n_rows += len(frame)
+            if self.n_rows > len(self._blocked):
+                grown = np.zeros(max(self.n_rows, 2 * len(self._blocked)), dtype=bool)
+                grown[:start] = self._blocked[:start]
+                self._blocked = grown
+            self.version += 1
+        return np.arange(start, self.n_rows)
+
+    def mark_blocked(self, user_id):
+        position = self.position(user_id)
+        if position is not None:
+            with self._lock:
+                self._blocked[position] = True
+                self.version += 1
+        return position
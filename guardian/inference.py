@@ -0,0 +1,234 @@
+"""Inferência em lote dos riscos por conta, num pool de processos sobre memória compartilhada.
+
+A matriz de features das contas (linhas x ``FEATURES``, float32) é montada uma vez por
+chave (dados e dia de referência) num segmento ``multiprocessing.shared_memory``; as saídas ficam noutro
+segmento, uma coluna contígua por cabeça (``HEADS``). Os processos do pool recebem só os
+nomes dos segmentos e a faixa de linhas, abrem os segmentos como arrays NumPy (uma vez
+por processo) e escrevem as probabilidades direto na coluna de saída: nenhum array é
+serializado, nem na ida nem na volta.
+
+Cada cabeça é um modelo logístico sobre as mesmas features, com pesos fixos como os do
+score de risco (``guardian.scoring``). As cabeças rodam uma depois da outra, com as
+linhas divididas entre todos os processos, então o tempo de cada uma dá a vazão
+(linhas/s) por modelo. As previsões são publicadas como a tabela colunar ``predictions``
+do ``DatasetStore``, alinhada linha a linha com ``users``.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from guardian.scoring import ASN_CLASSES, REFERENCE_DEPOSIT, REFERENCE_SESSION_SEC, asn_class, lookup, peer_means
+from guardian.synthetic import BLOCK_ROWS
+
+INFERENCE_MODEL = "risk_heads_v1"
+FEATURES = ("device_sharing", "datacenter", "proxy", "deposit", "session", "bet_vs_peer", "account_age",
+            "credit_card", "pix")
+FEATURE_COLUMNS = ("device_id", "ip_asn", "total_deposited", "session_time_sec", "avg_bet_value", "peer_group",
+                   "registration_time", "payment_type")
+
+# Pesos do logit de cada cabeça (features ausentes pesam 0); probabilidade = sigmoid(logit)
+HEADS = {
+    "fraud_probability": {"intercept": -2.5, "device_sharing": 1.0, "datacenter": 2.0, "proxy": 1.5, "deposit": 0.6,
+                          "session": 0.5, "bet_vs_peer": 0.7, "account_age": -0.4, "credit_card": 0.3},
+    "chargeback_risk": {"intercept": -3.0, "deposit": 1.0, "bet_vs_peer": 0.5, "account_age": -0.2,
+                        "credit_card": 1.5, "pix": 0.8},
+    "account_takeover_risk": {"intercept": -3.5, "device_sharing": 0.6, "datacenter": 1.5, "proxy": 2.0,
+                              "session": 0.8, "account_age": 0.3, "bet_vs_peer": 1.0},
+}
+# Probabilidade a partir da qual uma conta entra na contagem de "alto risco" da cabeça
+HIGH_RISK = 0.5
+# Linhas por multiplicação dentro de cada faixa (limita o temporário de cada processo)
+SCORE_BLOCK_ROWS = 1 << 16
+DEFAULT_WORKERS = os.cpu_count() or 1
+CHUNKS_PER_WORKER = 4
+# "spawn" não herda as threads do servidor (o que "fork" faria no meio de um rerun)
+MP_START_METHOD = "spawn"
+
+_attached = {}  # nome do segmento -> (SharedMemory, array), em cada processo do pool
+
+
+def head_weights(head):
+    """``(coeficientes por FEATURES, intercepto)`` de uma cabeça, como floats."""
+    weights = HEADS[head]
+    return tuple(float(weights.get(name, 0.0)) for name in FEATURES), float(weights["intercept"])
+
+
+def user_features(table, device_accounts, now, out=None, peers=None):
+    """Preenche ``out`` (linhas x ``FEATURES``, float32) com as features da tabela ``users``.
+
+    ``device_accounts`` (contas por aparelho, por linha) vem do ``UserIndex``; ``now`` é o
+    instante de referência da idade das contas. ``peers`` (aposta média por grupo, de
+    ``peer_means``) é medido em ``table`` se omitido; passe o da tabela inteira ao
+    processar um lote dela.
+    """
+    out = np.empty((table.num_rows, len(FEATURES)), dtype=np.float32) if out is None else out
+    column = dict(zip(FEATURES, out.T))
+    column["device_sharing"][:] = np.log2(np.maximum(device_accounts, 1))
+    for asn_kind in ("datacenter", "proxy"):
+        flags = {asn: float(asn_class(asn) == asn_kind) for asn in ASN_CLASSES}
+        column[asn_kind][:] = lookup(table.column("ip_asn"), flags, 0.0)
+    column["deposit"][:] = np.log10(np.maximum(table.column("total_deposited").to_numpy(), 1.0) / REFERENCE_DEPOSIT)
+    column["session"][:] = np.log(REFERENCE_SESSION_SEC / np.maximum(table.column("session_time_sec").to_numpy(), 5.0))
+    avg_bet = table.column("avg_bet_value").to_numpy().astype(np.float64)
+    peer_avg = lookup(table.column("peer_group"), peer_means(table) if peers is None else peers, np.nan)
+    peer_avg = np.where(np.isnan(peer_avg), avg_bet, peer_avg)
+    column["bet_vs_peer"][:] = np.log(np.maximum(avg_bet, 0.01) / np.maximum(peer_avg, 0.01))
+    registered = table.column("registration_time").to_numpy().astype("datetime64[ns]")
+    age_hours = (np.datetime64(pd.Timestamp(now), "ns") - registered) / np.timedelta64(1, "h")
+    column["account_age"][:] = np.log10(np.maximum(age_hours, 1.0))
+    column["credit_card"][:] = lookup(table.column("payment_type"), {"Cartão de Crédito": 1.0}, 0.0)
+    column["pix"][:] = lookup(table.column("payment_type"), {"PIX": 1.0}, 0.0)
+    return out
+
+
+def _attach(name, shape):
+    """Array float32 sobre o segmento ``name``, aberto uma vez por processo."""
+    entry = _attached.get(name)
+    if entry is None:
+        segment = shared_memory.SharedMemory(name=name)
+        entry = _attached[name] = (segment, np.ndarray(shape, dtype=np.float32, buffer=segment.buf))
+    return entry[1]
+
+
+def _detach_except(keep):
+    """Fecha os segmentos de execuções anteriores (o processo pai já os removeu)."""
+    for name in [name for name in _attached if name not in keep]:
+        segment, array = _attached.pop(name)
+        del array
+        segment.close()
+
+
+def attach_segment(segment):
+    """Abre ``segment`` (nome, forma) no processo; usado para aquecer o pool antes da medição."""
+    _attach(*segment)
+    return multiprocessing.current_process().pid
+
+
+def score_rows(features, outputs, head, coefficients, intercept, start, stop):
+    """Escreve as probabilidades da cabeça ``head`` nas linhas [start, stop) (roda nos workers)."""
+    _detach_except({features[0], outputs[0]})
+    matrix = _attach(*features)
+    column = _attach(*outputs)[head]
+    weights = np.asarray(coefficients, dtype=np.float32)
+    for lo in range(start, stop, SCORE_BLOCK_ROWS):
+        hi = min(lo + SCORE_BLOCK_ROWS, stop)
+        logit = matrix[lo:hi] @ weights
+        logit += intercept
+        np.clip(logit, -30, 30, out=logit)
+        np.negative(logit, out=logit)
+        np.exp(logit, out=logit)
+        logit += 1
+        np.reciprocal(logit, out=column[lo:hi])
+    return stop - start
+
+
+class BatchInference:
+    """Cabeças de risco sobre a matriz de features em memória compartilhada, num pool criado sob demanda."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, start_method=MP_START_METHOD):
+        self.max_workers = max_workers
+        self.start_method = start_method
+        self._pool = None
+        self._features = None  # (segmento, forma, chave)
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context(self.start_method))
+        return self._pool
+
+    def _layout(self, key, n_rows, fill):
+        """Monta a matriz de features no segmento compartilhado, se a chave mudou; devolve os segundos gastos."""
+        if self._features is not None and self._features[2] == key:
+            return 0.0
+        started = time.perf_counter()
+        shape = (n_rows, len(FEATURES))
+        segment = shared_memory.SharedMemory(create=True, size=max(n_rows * len(FEATURES) * 4, 1))
+        matrix = np.ndarray(shape, dtype=np.float32, buffer=segment.buf)
+        try:
+            fill(matrix)
+        except BaseException as error:
+            # Os frames do erro ainda seguram a matriz; sem soltá-la, close() falharia
+            traceback.clear_frames(error.__traceback__)
+            del matrix
+            segment.close()
+            segment.unlink()
+            raise
+        self._release()
+        self._features = (segment, shape, key)
+        return time.perf_counter() - started
+
+    def _release(self):
+        if self._features is not None:
+            segment = self._features[0]
+            self._features = None
+            segment.close()
+            segment.unlink()
+
+    def predict(self, key, n_rows, fill, progress=None):
+        """Probabilidades de todas as cabeças para ``n_rows`` linhas.
+
+        ``fill(matriz)`` preenche a matriz de features (linhas x ``FEATURES``) e só é
+        chamado quando ``key`` difere (``!=``) da execução anterior: a chave deve mudar
+        junto com tudo de que as features dependem (dados e dia de referência).
+        ``progress(fração, etapa)`` é chamado a cada faixa concluída; se levantar uma
+        exceção (ex.: cancelamento), as faixas ainda na fila são descartadas. Devolve as
+        colunas (cabeça -> array float32) e, por cabeça, segundos e linhas/s.
+        """
+        with self._lock:
+            layout_seconds = self._layout(key, n_rows, fill)
+            features = (self._features[0].name, self._features[1])
+            outputs = shared_memory.SharedMemory(create=True, size=max(len(HEADS) * n_rows * 4, 1))
+            try:
+                output = (outputs.name, (len(HEADS), n_rows))
+                pool = self._executor()
+                # Processos iniciados e segmentos abertos antes de medir
+                list(pool.map(attach_segment, [features] * self.max_workers))
+                bounds = np.linspace(0, n_rows, min(n_rows, self.max_workers * CHUNKS_PER_WORKER) + 1).astype(np.int64)
+                heads, done, total = {}, 0, max(len(HEADS) * n_rows, 1)
+                for index, head in enumerate(HEADS):
+                    started = time.perf_counter()
+                    futures = [pool.submit(score_rows, features, output, index, *head_weights(head), int(lo), int(hi))
+                               for lo, hi in zip(bounds[:-1], bounds[1:])]
+                    try:
+                        for future in as_completed(futures):
+                            done += future.result()
+                            if progress is not None:
+                                progress(done / total, f"{head}: {done - index * n_rows:,} de {n_rows:,} contas")
+                    finally:
+                        for future in futures:
+                            future.cancel()
+                    seconds = time.perf_counter() - started
+                    heads[head] = {"seconds": seconds, "rows_per_sec": n_rows / seconds if seconds else 0.0}
+                columns = np.ndarray(output[1], dtype=np.float32, buffer=outputs.buf).copy()
+            finally:
+                outputs.close()
+                outputs.unlink()
+        return {
+            "rows": n_rows, "workers": self.max_workers, "model": INFERENCE_MODEL, "layout_seconds": layout_seconds,
+            "columns": dict(zip(HEADS, columns)), "heads": heads,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+            self._release()
+
+
+def write_predictions(store, columns, metadata=None):
+    """Publica as colunas de previsão como a tabela ``predictions`` (mesma ordem de linhas de ``users``)."""
+    n_rows = len(next(iter(columns.values()), ()))
+    frames = (pd.DataFrame({head: values[lo:lo + BLOCK_ROWS] for head, values in columns.items()})
+              for lo in range(0, n_rows, BLOCK_ROWS))
+    return store.write_table("predictions", frames, metadata={"inference": {"model": INFERENCE_MODEL,
+                                                                            "predicted_at": time.time(),
+                                                                            **(metadata or {})}})
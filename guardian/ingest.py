@@ -0,0 +1,293 @@
+"""Ingestão de transações em tempo real (asyncio) com micro-lotes e contrapressão.
+
+Uma fonte (socket Unix, arquivo JSONL acompanhado como ``tail -f``, arquivo de replay
+ou gerador sintético) lê blocos de linhas JSON e os coloca numa fila limitada. Quando a
+fila enche, a fonte espera — o socket deixa de ser lido e o produtor é freado pelo
+próprio kernel —, e essas esperas são contadas. O consumidor junta blocos em
+micro-lotes, decodifica cada lote de uma vez e soma transações, fraudes detectadas
+(score >= limiar de monitoramento) e bloqueios automáticos (score >= limiar de
+bloqueio) nas séries ``transactions``, ``frauds`` e ``blocks`` do ``MetricsStore``.
+
+Formato de cada linha::
+
+    {"ts": 1760000000.0, "user_id": "usr_sp_42", "value": 50.0, "risk_score": 870}
+
+Uso em linha de comando (serviço avulso, com estatísticas a cada 5 s)::
+
+    python -m guardian.ingest unix:/tmp/guardian_tx.sock
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from guardian.metrics import MetricsStore
+
+READ_BYTES = 1 << 16
+DEFAULT_THRESHOLDS = (800, 950)
+# Transações aceitas: até 24 h de atraso (camada de 1 min) e 1 min de relógio adiantado
+MAX_LATENESS_SEC = 24 * 3600
+MAX_CLOCK_SKEW_SEC = 60
+
+
+def _split_lines(buffer, data):
+    """Acrescenta ``data`` ao resto anterior e devolve (linhas completas, novo resto)."""
+    lines = (buffer + data).split(b"\n")
+    return [line for line in lines[:-1] if line.strip()], lines[-1]
+
+
+class UnixSocketSource:
+    """Servidor em socket Unix; cada conexão envia linhas JSON."""
+
+    def __init__(self, path):
+        self.path = path
+
+    async def run(self, emit):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        async def handle(reader, writer):
+            rest = b""
+            try:
+                while data := await reader.read(READ_BYTES):
+                    lines, rest = _split_lines(rest, data)
+                    if lines:
+                        await emit(lines)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(handle, path=self.path, limit=READ_BYTES)
+        async with server:
+            await server.serve_forever()
+
+
+class TailSource:
+    """Acompanha um arquivo JSONL que cresce (como ``tail -f``), reabrindo-o se for truncado."""
+
+    def __init__(self, path, poll_interval=0.2, from_start=False):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.from_start = from_start
+
+    async def run(self, emit):
+        offset = None
+        rest = b""
+        while True:
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if offset is None:
+                offset = 0 if self.from_start else size
+            if size < offset:
+                offset, rest = 0, b""
+            if size == offset:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                while data := f.read(READ_BYTES):
+                    offset += len(data)
+                    lines, rest = _split_lines(rest, data)
+                    if lines:
+                        await emit(lines)
+
+
+class ReplaySource:
+    """Reproduz um arquivo JSONL a ``rate`` transações/s (o mais rápido possível, se ``None``)."""
+
+    def __init__(self, path, rate=None, loop=False):
+        self.path = path
+        self.rate = rate
+        self.loop = loop
+
+    async def run(self, emit):
+        started, sent = time.perf_counter(), 0
+        while True:
+            rest = b""
+            with open(self.path, "rb") as f:
+                while data := f.read(READ_BYTES):
+                    lines, rest = _split_lines(rest, data)
+                    if lines:
+                        await emit(lines)
+                        sent += len(lines)
+                    if self.rate:
+                        ahead = sent / self.rate - (time.perf_counter() - started)
+                        if ahead > 0:
+                            await asyncio.sleep(ahead)
+            if not self.loop:
+                return
+
+
+class SyntheticSource:
+    """Gera transações das contas do conjunto de dados, a ``rate`` transações/s."""
+
+    def __init__(self, user_ids, risk_scores, rate=2.5, tick=1.0, seed=None):
+        self.user_ids = np.asarray(user_ids, dtype=object)
+        self.risk_scores = np.asarray(risk_scores)
+        self.rate = rate
+        self.tick = tick
+        self.rng = np.random.default_rng(seed)
+
+    async def run(self, emit):
+        while True:
+            n = self.rng.poisson(self.rate * self.tick)
+            if n and len(self.user_ids):
+                picks = self.rng.integers(0, len(self.user_ids), n)
+                values = np.round(self.rng.lognormal(3.5, 1.0, n), 2)
+                now = time.time()
+                await emit([json.dumps({"ts": now, "user_id": user_id, "value": float(value), "risk_score": int(score)}).encode()
+                            for user_id, value, score in zip(self.user_ids[picks], values, self.risk_scores[picks])])
+            await asyncio.sleep(self.tick)
+
+
+def parse_source(spec, **synthetic):
+    """Fonte a partir de ``unix:<caminho>``, ``tail:<caminho>``, ``replay:<caminho>`` ou ``sintetico``."""
+    kind, _, path = spec.partition(":")
+    if kind == "unix":
+        return UnixSocketSource(path)
+    if kind == "tail":
+        return TailSource(path)
+    if kind == "replay":
+        return ReplaySource(path, rate=synthetic.get("rate"), loop=True)
+    if kind == "sintetico":
+        return SyntheticSource(**synthetic)
+    raise ValueError(f"Fonte de ingestão desconhecida: {spec!r}")
+
+
+class IngestionService:
+    """Serviço de ingestão rodando num event loop asyncio em thread própria."""
+
+    def __init__(self, source, metrics=None, thresholds=DEFAULT_THRESHOLDS, batch_size=8192,
+                 queue_chunks=256, recent=50):
+        self.source = source
+        self.metrics = metrics or MetricsStore()
+        self.monitor_threshold, self.block_threshold = thresholds
+        self.batch_size = batch_size
+        self.queue_chunks = queue_chunks
+        self.recent = deque(maxlen=recent)
+        self.stats = {"received": 0, "processed": 0, "invalid": 0, "late": 0, "batches": 0, "queue_depth": 0,
+                      "queue_capacity": queue_chunks, "backpressure_waits": 0, "backpressure_seconds": 0.0,
+                      "started_at": None, "error": None}
+        self._thread = None
+        self._loop = None
+        self._stopped = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name="guardian-ingest", daemon=True)
+            self._thread.start()
+        return self
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def _run_loop(self):
+        self.stats["started_at"] = time.time()
+        try:
+            asyncio.run(self._run())
+        except Exception as exc:  # a falha fica visível no painel em vez de derrubar o app
+            self.stats["error"] = repr(exc)
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        queue = asyncio.Queue(self.queue_chunks)
+
+        async def emit(lines):
+            self.stats["received"] += len(lines)
+            if queue.full():
+                self.stats["backpressure_waits"] += 1
+                waited = time.perf_counter()
+                await queue.put(lines)
+                self.stats["backpressure_seconds"] += time.perf_counter() - waited
+            else:
+                queue.put_nowait(lines)
+
+        tasks = [asyncio.create_task(self.source.run(emit)), asyncio.create_task(self._consume(queue))]
+        await self._stopped.wait()
+        for task in tasks:
+            task.cancel()
+
+    async def _consume(self, queue):
+        while True:
+            # Micro-lote: o primeiro bloco disponível mais o que já estiver na fila
+            batch = await queue.get()
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.extend(queue.get_nowait())
+            self.stats["queue_depth"] = queue.qsize()
+            self.process(batch)
+            await asyncio.sleep(0)
+
+    def _decode(self, lines):
+        try:
+            return json.loads(b"[" + b",".join(lines) + b"]")
+        except ValueError:
+            records = []
+            for line in lines:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    self.stats["invalid"] += 1
+            return records
+
+    def process(self, lines):
+        """Decodifica um micro-lote e soma suas transações nos agregados por minuto."""
+        records = self._decode(lines)
+        if not records:
+            return
+        ts = np.fromiter((r.get("ts", 0.0) for r in records), dtype=np.float64, count=len(records))
+        scores = np.fromiter((r.get("risk_score", 0) for r in records), dtype=np.int64, count=len(records))
+        now = time.time()
+        ts[ts <= 0] = now
+        accepted = (ts >= now - MAX_LATENESS_SEC) & (ts <= now + MAX_CLOCK_SKEW_SEC)
+        self.stats["late"] += int(len(ts) - accepted.sum())
+        ts, scores = ts[accepted], scores[accepted]
+        self.metrics.add_many("transactions", ts, np.ones(len(ts)))
+        self.metrics.add_many("frauds", ts[scores >= self.monitor_threshold], np.ones(int((scores >= self.monitor_threshold).sum())))
+        self.metrics.add_many("blocks", ts[scores >= self.block_threshold], np.ones(int((scores >= self.block_threshold).sum())))
+        self.recent.extend(records[-self.recent.maxlen:])
+        self.stats["processed"] += len(records)
+        self.stats["batches"] += 1
+
+    def snapshot(self):
+        """Cópia das estatísticas, com taxa média e utilização da fila."""
+        stats = dict(self.stats)
+        uptime = time.time() - stats["started_at"] if stats["started_at"] else 0.0
+        stats["rate"] = stats["processed"] / uptime if uptime else 0.0
+        stats["queue_fill"] = stats["queue_depth"] / stats["queue_capacity"]
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço de ingestão de transações (JSONL).")
+    parser.add_argument("fonte", help="unix:<caminho>, tail:<caminho> ou replay:<caminho>")
+    parser.add_argument("--taxa", type=float, help="transações/s no replay (padrão: máximo)")
+    args = parser.parse_args(argv)
+
+    kind, _, path = args.fonte.partition(":")
+    source = ReplaySource(path, rate=args.taxa) if kind == "replay" else parse_source(args.fonte)
+    service = IngestionService(source).start()
+    try:
+        while service.running:
+            time.sleep(5)
+            stats = service.snapshot()
+            print(f"{stats['processed']:,} processadas | {stats['rate']:,.0f} tx/s | fila {stats['queue_fill']:.0%} | "
+                  f"contrapressão {stats['backpressure_waits']:,}x ({stats['backpressure_seconds']:.1f}s)")
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
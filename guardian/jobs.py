@@ -0,0 +1,168 @@
+"""Executor de tarefas longas em segundo plano, compartilhado por todas as sessões.
+
+Cada tarefa é uma função ``work(job, *args, **kwargs)`` que roda num pool de threads e
+informa o próprio progresso com ``job.report(fração, etapa)``. O cancelamento é
+cooperativo: ``cancel`` só marca o pedido, e o trabalho chama ``job.raise_if_cancelled()``
+nos pontos em que pode parar sem deixar nada pela metade. Uma tarefa que ainda está na
+fila é cancelada na hora.
+
+O registro guarda as tarefas por id e as últimas ``keep`` concluídas. Tarefas submetidas
+com ``cache_key`` são deduplicadas: se já existe uma com a mesma chave rodando ou
+concluída com sucesso, ela é devolvida em vez de uma nova execução. A chave deve mudar
+junto com os dados de que o resultado depende (ex.: a versão do conjunto de dados).
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+DEFAULT_KEEP = 100
+
+PENDING = "na fila"
+RUNNING = "executando"
+DONE = "concluída"
+CANCELLED = "cancelada"
+FAILED = "falhou"
+FINISHED = (DONE, CANCELLED, FAILED)
+
+
+class JobCancelled(Exception):
+    """Levantada por ``Job.raise_if_cancelled`` quando o cancelamento foi pedido."""
+
+
+class Job:
+    """Uma tarefa: estado, progresso, etapa atual e resultado (ou erro)."""
+
+    def __init__(self, job_id, name, owner=None, cache_key=None):
+        self.id = job_id
+        self.name = name
+        self.owner = owner
+        self.cache_key = cache_key
+        self.status = PENDING
+        self.progress = 0.0
+        self.stage = ""
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def report(self, fraction, stage=None):
+        """Progresso (0–1) e, opcionalmente, a etapa atual, informados pelo próprio trabalho."""
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if stage is not None:
+            self.stage = stage
+
+    def raise_if_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def cancel(self):
+        """Pede o cancelamento; uma tarefa ainda na fila é cancelada imediatamente (devolve ``True``)."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self.status, self.finished_at = CANCELLED, time.time()
+            return True
+        return False
+
+    @property
+    def seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def snapshot(self):
+        return {"id": self.id, "name": self.name, "owner": self.owner, "status": self.status,
+                "progress": self.progress, "stage": self.stage, "seconds": self.seconds,
+                "submitted_at": self.submitted_at, "error": self.error}
+
+
+class JobExecutor:
+    """Pool de threads com registro de tarefas, cancelamento e cache de resultados."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, keep=DEFAULT_KEEP):
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="guardian-job")
+        self._jobs = OrderedDict()  # id -> Job
+        self._by_key = {}  # cache_key -> Job
+        self._ids = itertools.count(1)
+        self.stats = {"submitted": 0, "cache_hits": 0, "done": 0, "cancelled": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def submit(self, name, work, *args, owner=None, cache_key=None, **kwargs):
+        """Agenda ``work(job, *args, **kwargs)`` e devolve o ``Job`` (ou o já existente para ``cache_key``)."""
+        with self._lock:
+            cached = self._by_key.get(cache_key) if cache_key is not None else None
+            if cached is not None and cached.status in (PENDING, RUNNING, DONE):
+                self.stats["cache_hits"] += 1
+                return cached
+            job = Job(next(self._ids), name, owner, cache_key)
+            self._jobs[job.id] = job
+            if cache_key is not None:
+                self._by_key[cache_key] = job
+            self.stats["submitted"] += 1
+            self._trim()
+        job._future = self._pool.submit(self._run, job, work, args, kwargs)
+        return job
+
+    def _run(self, job, work, args, kwargs):
+        if job.cancel_requested:
+            status = CANCELLED
+        else:
+            job.status, job.started_at = RUNNING, time.time()
+            try:
+                job.result = work(job, *args, **kwargs)
+                job.progress, status = 1.0, DONE
+            except JobCancelled:
+                status = CANCELLED
+            except Exception as exc:  # a falha fica registrada na tarefa em vez de sumir no pool
+                job.error, status = repr(exc), FAILED
+        job.finished_at = time.time()
+        job.status = status
+        with self._lock:
+            self.stats[{DONE: "done", CANCELLED: "cancelled", FAILED: "failed"}[status]] += 1
+
+    def _trim(self):
+        """Esquece as tarefas terminadas mais antigas além de ``keep``."""
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.cache_key) is job:
+                del self._by_key[job.cache_key]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and job.cancel():
+            with self._lock:
+                self.stats["cancelled"] += 1
+        return job
+
+    def jobs(self, owner=None):
+        """Tarefas registradas (de ``owner``, se dado), da mais recente para a mais antiga."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in reversed(jobs) if owner is None or job.owner == owner]
+
+    def snapshot(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+            stats = dict(self.stats)
+        stats["active"] = sum(not job.finished for job in jobs)
+        stats["registered"] = len(jobs)
+        return stats
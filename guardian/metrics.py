@@ -0,0 +1,163 @@
+"""Séries temporais de métricas do sistema em buffers circulares de memória fixa.
+
+Cada série guarda três camadas — 1 s (última hora), 1 min (últimas 24 h) e 1 h (últimos
+30 dias) — e cada escrita cai em O(1) no balde corrente das três: as camadas grossas são
+o rebaixamento (soma ou último valor) das finas, sem passo de consolidação. Os vetores
+são espelhados (cada balde é gravado em ``i`` e ``i + slots``), então qualquer janela
+dos últimos ``n`` baldes é uma fatia contígua: a leitura devolve uma *view*, sem cópia.
+
+O ``MetricsStore`` é único por processo e compartilhado por todas as sessões; a memória
+não cresce com o tempo de atividade (o log de eventos também é limitado).
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Nome da camada -> (resolução em segundos, número de baldes)
+TIERS = {"1s": (1, 3600), "1m": (60, 1440), "1h": (3600, 720)}
+AGGREGATIONS = ("sum", "last")
+
+
+class _Tier:
+    __slots__ = ("resolution", "slots", "values", "head")
+
+    def __init__(self, resolution, slots):
+        self.resolution = resolution
+        self.slots = slots
+        self.values = np.zeros(2 * slots, dtype=np.float64)
+        self.head = None  # balde mais recente já aberto
+
+    def advance(self, bucket):
+        """Abre os baldes até ``bucket``, zerando os que ficaram para trás."""
+        if self.head is None:
+            self.head = bucket
+            return
+        gap = bucket - self.head
+        if gap <= 0:
+            return
+        stale = np.arange(self.head + 1, self.head + 1 + min(gap, self.slots)) % self.slots
+        self.values[stale] = 0.0
+        self.values[stale + self.slots] = 0.0
+        self.head = bucket
+
+    def write(self, bucket, value, aggregation):
+        if self.head is not None and bucket <= self.head - self.slots:
+            return  # mais antigo que a janela desta camada
+        self.advance(bucket)
+        slot = bucket % self.slots
+        if aggregation == "sum":
+            self.values[slot] += value
+            self.values[slot + self.slots] += value
+        else:
+            self.values[slot] = self.values[slot + self.slots] = value
+
+    def window(self, n):
+        """View dos últimos ``n`` baldes (o mais recente por último)."""
+        n = min(n, self.slots)
+        end = self.head % self.slots + 1
+        start = end - n
+        if start < 0:
+            start, end = start + self.slots, end + self.slots
+        view = self.values[start:end]
+        view.flags.writeable = False
+        return view
+
+
+class Series:
+    """Uma métrica em três resoluções."""
+
+    def __init__(self, aggregation="sum", tiers=TIERS):
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Agregação desconhecida: {aggregation!r} (use {AGGREGATIONS})")
+        self.aggregation = aggregation
+        self.tiers = {name: _Tier(resolution, slots) for name, (resolution, slots) in tiers.items()}
+
+    def write(self, value, ts):
+        for tier in self.tiers.values():
+            tier.write(int(ts // tier.resolution), value, self.aggregation)
+
+    def write_many(self, ts, values):
+        """Escrita em lote: agrupa por balde em cada camada antes de gravar."""
+        for tier in self.tiers.values():
+            buckets = (ts // tier.resolution).astype(np.int64)
+            unique, inverse = np.unique(buckets, return_inverse=True)
+            if self.aggregation == "sum":
+                totals = np.bincount(inverse, weights=values, minlength=len(unique))
+            else:
+                totals = np.zeros(len(unique))
+                totals[inverse] = values  # a última escrita de cada balde prevalece
+            for bucket, total in zip(unique.tolist(), totals.tolist()):
+                tier.write(bucket, total, self.aggregation)
+
+
+class MetricsStore:
+    """Séries nomeadas + log limitado de eventos, compartilhados pelo processo."""
+
+    def __init__(self, series=None, max_events=200):
+        self._series = {name: Series(aggregation) for name, aggregation in (series or {}).items()}
+        self.events = deque(maxlen=max_events)
+        self.version = 0  # incrementado a cada escrita (chave de caches de leitura)
+        self._lock = threading.Lock()
+
+    def _get(self, name):
+        series = self._series.get(name)
+        if series is None:
+            series = self._series.setdefault(name, Series())
+        return series
+
+    def add(self, name, value=1.0, ts=None):
+        """Soma ``value`` (ou grava, se a série for "last") no instante ``ts`` (agora, se omitido)."""
+        with self._lock:
+            self._get(name).write(float(value), time.time() if ts is None else ts)
+            self.version += 1
+
+    def add_many(self, name, ts, values):
+        """Escrita vetorizada de um micro-lote (``ts`` em segundos da época)."""
+        if len(ts):
+            with self._lock:
+                self._get(name).write_many(np.asarray(ts, dtype=np.float64), np.asarray(values, dtype=np.float64))
+                self.version += 1
+
+    def window(self, name, tier="1m", n=30, now=None):
+        """Últimos ``n`` baldes da camada: (início de cada balde em s da época, view dos valores)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            series = self._get(name).tiers[tier]
+            series.advance(int(now // series.resolution))
+            values = series.window(n)
+            starts = (series.head - len(values) + 1 + np.arange(len(values))) * series.resolution
+        return starts, values
+
+    def total(self, name, seconds, tier="1m", now=None):
+        """Soma dos últimos ``seconds`` segundos (em baldes da camada ``tier``)."""
+        resolution = TIERS[tier][0]
+        return float(self.window(name, tier, max(1, -(-int(seconds) // resolution)), now)[1].sum())
+
+    def latest(self, name, tier="1m", default=0.0, now=None):
+        """Último valor gravado de uma série "last" (o de uma janela de 24 h)."""
+        values = self.window(name, tier, TIERS[tier][1], now)[1]
+        nonzero = np.flatnonzero(values)
+        return float(values[nonzero[-1]]) if len(nonzero) else default
+
+    def since_midnight(self, name, now=None):
+        """Soma desde 00:00 (hora local) na camada de 1 min."""
+        now = time.time() if now is None else now
+        local = time.localtime(now)
+        elapsed = local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec
+        return self.total(name, elapsed + 1, "1m", now)
+
+    def log_event(self, event):
+        """Registra um evento (alerta) no log limitado e conta-o na série ``alerts``."""
+        with self._lock:
+            self.events.append(event)
+        self.add("alerts")
+
+    def recent_events(self, n=5):
+        with self._lock:
+            return list(self.events)[-n:]
+
+    def nbytes(self):
+        with self._lock:
+            return sum(tier.values.nbytes for series in self._series.values() for tier in series.tiers.values())
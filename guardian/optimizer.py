@@ -0,0 +1,136 @@
+"""Otimizador dos limiares das regras automáticas, avaliado num pool de processos.
+
+O espaço de busca é a grade de limiares de bloqueio e de monitoramento (a faixa de
+revisão manual) combinada com os três módulos (velocity, device fingerprint, anomalia
+geográfica) ligados ou desligados. Cada candidato é avaliado sobre as curvas de custo
+pré-calculadas do backtest (``PolicyBacktest.curves()``: somas "score >= nível" por
+classe e grupo de sinais), em duas dimensões:
+
+* perdas: valor das fraudes que passaram, mais ``FALSE_POSITIVE_COST`` por transação
+  legítima bloqueada;
+* carga dos analistas: revisões manuais vezes o custo de cada revisão.
+
+As curvas são pequenas (alguns KB por grupo de sinais) e vão junto com cada lote de
+candidatos para os processos do pool, que os avaliam de forma vetorizada. A busca
+devolve a fronteira de Pareto (perdas x carga) e o ponto de menor custo total, que
+sempre está na fronteira.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from guardian.backtest import DEFAULT_REVIEW_COST, policy_outcomes
+
+BLOCK_RANGE = (800, 1000)
+MONITORING_RANGE = (600, 900)
+# Mesmo passo dos sliders de limiar do app
+THRESHOLD_STEP = 10
+# Multiplicador aplicado ao score das transações com velocity quando o módulo está ligado
+VELOCITY_CHECK_MULT = 1.2
+# Custo (R$) atribuído a cada transação legítima bloqueada (atrito, suporte, churn)
+FALSE_POSITIVE_COST = 250.0
+DEFAULT_WORKERS = os.cpu_count() or 1
+CHUNKS_PER_WORKER = 4
+# "spawn" não herda as threads do servidor (o que "fork" faria no meio de um rerun)
+MP_START_METHOD = "spawn"
+CANDIDATE_FIELDS = ("block", "monitoring", "velocity", "device", "geo")
+
+
+def candidate_grid(step=THRESHOLD_STEP):
+    """Todas as combinações (monitoramento <= bloqueio) como arrays paralelos ``CANDIDATE_FIELDS``."""
+    block = np.arange(BLOCK_RANGE[0], BLOCK_RANGE[1] + 1, step)
+    monitoring = np.arange(MONITORING_RANGE[0], MONITORING_RANGE[1] + 1, step)
+    switches = np.arange(8)
+    b, m, s = (axis.ravel() for axis in np.meshgrid(block, monitoring, switches, indexing="ij"))
+    keep = m <= b
+    b, m, s = b[keep], m[keep], s[keep]
+    return {"block": b, "monitoring": m, "velocity": s & 1 > 0, "device": s & 2 > 0, "geo": s & 4 > 0}
+
+
+def candidate_costs(curves, candidates, review_cost=DEFAULT_REVIEW_COST,
+                    false_positive_cost=FALSE_POSITIVE_COST):
+    """Perdas e carga (R$) de cada candidato, com as contagens que as compõem (roda nos workers)."""
+    outcome = policy_outcomes(curves, candidates["block"], candidates["monitoring"],
+                              np.where(candidates["velocity"], VELOCITY_CHECK_MULT, 1.0),
+                              candidates["geo"], candidates["device"])
+    missed_fraud = outcome["total_value"][1] - outcome["flagged_value"][1]
+    legit_blocked = outcome["blocked"][0]
+    reviews = outcome["flagged"].sum(axis=0) - outcome["blocked"].sum(axis=0)
+    return {
+        "loss": missed_fraud + legit_blocked * false_positive_cost,
+        "workload": reviews * review_cost,
+        "missed_fraud": missed_fraud, "legit_blocked": legit_blocked, "reviews": reviews,
+    }
+
+
+def pareto_front(loss, workload):
+    """Índices dos pontos não dominados em (perdas, carga), do de menor perda ao de menor carga."""
+    order = np.lexsort((workload, loss))
+    best_before = np.minimum.accumulate(workload[order])
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = workload[order][1:] < best_before[:-1]
+    return order[keep]
+
+
+class ThresholdOptimizer:
+    """Busca em grade dos limiares, distribuída num pool de processos criado sob demanda."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, start_method=MP_START_METHOD):
+        self.max_workers = max_workers
+        self.start_method = start_method
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context(self.start_method))
+            return self._pool
+
+    def search(self, curves, step=THRESHOLD_STEP, review_cost=DEFAULT_REVIEW_COST,
+               false_positive_cost=FALSE_POSITIVE_COST, progress=None):
+        """Avalia a grade inteira e devolve a fronteira de Pareto e o ponto escolhido.
+
+        ``progress(avaliados, total)`` é chamado a cada lote concluído; se levantar uma
+        exceção (ex.: cancelamento), os lotes ainda na fila são descartados.
+        """
+        started = time.perf_counter()
+        candidates = candidate_grid(step)
+        total = len(candidates["block"])
+        bounds = np.linspace(0, total, min(total, self.max_workers * CHUNKS_PER_WORKER) + 1).astype(np.int64)
+        pool = self._executor()
+        futures = {pool.submit(candidate_costs, curves, {k: v[lo:hi] for k, v in candidates.items()},
+                               review_cost, false_positive_cost): lo for lo, hi in zip(bounds[:-1], bounds[1:])}
+        costs, evaluated = {}, 0
+        try:
+            for future in as_completed(futures):
+                chunk = future.result()
+                costs[futures[future]] = chunk
+                evaluated += len(chunk["loss"])
+                if progress is not None:
+                    progress(evaluated, total)
+        finally:
+            for future in futures:
+                future.cancel()
+        costs = {key: np.concatenate([costs[lo][key] for lo in sorted(costs)]) for key in costs[0]}
+        front = pareto_front(costs["loss"], costs["workload"])
+        chosen = int(np.argmin(costs["loss"] + costs["workload"]))
+
+        def point(i):
+            return {**{field: candidates[field][i].item() for field in CANDIDATE_FIELDS},
+                    **{key: costs[key][i].item() for key in costs}}
+
+        return {
+            "candidates": total, "workers": self.max_workers, "seconds": time.perf_counter() - started,
+            "front": [point(i) for i in front], "chosen": point(chosen),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,101 @@
+"""Perfil de inicialização do processo e de cada rerun, por seção.
+
+``StartupProfile`` é único por processo. Ele guarda:
+
+* o tempo das importações do script;
+* o da primeira importação de cada módulo carregado sob demanda (``import_module``);
+* a duração da primeira renderização;
+* as etapas do warm-up feito em segundo plano.
+
+``RerunProfile`` mede um rerun por voltas. Cada ``lap(nome)`` fecha a seção que começou na
+volta anterior, então as seções do script não precisam ser reindentadas num ``with``.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """Tempos de partida do processo (ms): importações, primeira renderização e warm-up."""
+
+    def __init__(self, script_imports_ms=0.0):
+        self.created = time.time()
+        self.script_imports_ms = script_imports_ms
+        self.imports = {}  # módulo carregado sob demanda -> ms da primeira importação
+        self.first_render_ms = None
+        self.warmup = {}  # etapa -> ms
+        self.warmup_errors = {}  # etapa que falhou -> mensagem do erro
+        self.warmup_done = False
+        self._lock = threading.Lock()
+
+    def import_module(self, name):
+        """``importlib.import_module`` que registra quanto custou a primeira importação de ``name``."""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        with self._lock:
+            self.imports.setdefault(name, (time.perf_counter() - started) * 1e3)
+        return module
+
+    def record_first_render(self, elapsed_ms):
+        """Guarda a duração do primeiro rerun do processo (as chamadas seguintes são ignoradas)."""
+        with self._lock:
+            if self.first_render_ms is None:
+                self.first_render_ms = elapsed_ms
+
+    def warm_up(self, steps):
+        """Executa ``steps`` (nome -> função) em sequência, registrando o tempo de cada um.
+
+        Uma etapa que falha é registrada (e logada) com o erro e as seguintes continuam;
+        ``warmup_done`` é marcado mesmo se algo escapar.
+        """
+        try:
+            for name, step in steps.items():
+                started = time.perf_counter()
+                try:
+                    step()
+                except Exception as error:
+                    log.exception("Falha na etapa de warm-up %r", name)
+                    with self._lock:
+                        self.warmup_errors[name] = f"{type(error).__name__}: {error}"
+                with self._lock:
+                    self.warmup[name] = (time.perf_counter() - started) * 1e3
+        finally:
+            self.warmup_done = True
+
+    def start_warm_up(self, steps):
+        """``warm_up`` numa thread própria; devolve a thread."""
+        thread = threading.Thread(target=self.warm_up, args=(steps,), name="guardian-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def snapshot(self):
+        with self._lock:
+            return {"script_imports_ms": self.script_imports_ms, "imports": dict(self.imports),
+                    "first_render_ms": self.first_render_ms, "warmup": dict(self.warmup),
+                    "warmup_errors": dict(self.warmup_errors), "warmup_done": self.warmup_done, "uptime_sec": time.time() - self.created}
+
+
+class RerunProfile:
+    """Duração (ms) de cada seção de um rerun, medida por voltas a partir de ``started``."""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self._last = self.started
+        self.sections = {}
+
+    def lap(self, name):
+        """Fecha a seção ``name`` (do fim da volta anterior até agora); repetir o nome soma."""
+        now = time.perf_counter()
+        self.sections[name] = self.sections.get(name, 0.0) + (now - self._last) * 1e3
+        self._last = now
+
+    @property
+    def total_ms(self):
+        return (self._last - self.started) * 1e3
@@ -0,0 +1,94 @@
+"""Fila de investigação: top-K por score com filtros por tipologia e faixa de risco.
+
+Cada conta recebe um posto ``(1000 - score) * n + posição`` e os postos ficam ordenados
+dentro de cada tipologia (layout CSR, construído uma vez por conjunto de dados). Um
+filtro de tipologia escolhe fatias, um piso de score corta cada fatia por busca binária
+e uma página é o top-K da união dessas fatias, obtido por seleção parcial
+(``np.argpartition``) sobre no máximo K candidatos por fatia. A paginação usa o posto
+do último caso da página como cursor, então o custo por página não depende nem do
+tamanho da fila nem da profundidade da página.
+"""
+import numpy as np
+
+MAX_SCORE = 1000
+
+
+class InvestigationQueue:
+    """Índice (tipologia, score) das contas abertas para investigação."""
+
+    def __init__(self, risk_score, typology, open_mask=None):
+        self.typologies = list(typology.cat.categories)
+        self.n_rows = len(risk_score)
+        codes = typology.cat.codes.to_numpy().astype(np.int64)
+        ranks = (MAX_SCORE - risk_score.to_numpy().astype(np.int64)) * self.n_rows + np.arange(self.n_rows)
+        self._open = None if open_mask is None else np.asarray(open_mask, dtype=bool)
+        if open_mask is not None:
+            codes, ranks = codes[self._open], ranks[self._open]
+        # Tipologia no prefixo: uma única ordenação deixa cada fatia já ordenada por posto
+        span = (MAX_SCORE + 1) * self.n_rows
+        self._ranks = np.sort(codes * span + ranks) % span
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(self.typologies)))))
+
+    def __len__(self):
+        return len(self._ranks)
+
+    def count_open(self, positions):
+        """Quantas das ``positions`` (linhas da tabela) estão na fila."""
+        positions = np.asarray(positions, dtype=np.int64)
+        return len(positions) if self._open is None else int(self._open[positions].sum())
+
+    def typology_codes(self, term):
+        """Códigos das tipologias cujo nome contém ``term`` (todas, se ``term`` for vazio)."""
+        return [code for code, name in enumerate(self.typologies) if not term or term in name]
+
+    def _runs(self, min_score, codes, after):
+        floor = (MAX_SCORE - min_score + 1) * self.n_rows
+        runs = []
+        for code in range(len(self.typologies)) if codes is None else codes:
+            lo, hi = self._offsets[code], self._offsets[code + 1]
+            ranks = self._ranks[lo:hi]
+            start = lo if after is None else lo + np.searchsorted(ranks, after, side="right")
+            stop = lo + np.searchsorted(ranks, floor, side="left")
+            if start < stop:
+                runs.append((int(start), int(stop)))
+        return runs
+
+    def count(self, min_score=0, codes=None):
+        """Número de contas no filtro (antes de descontar bloqueios)."""
+        return sum(stop - start for start, stop in self._runs(min_score, codes, None))
+
+    def page(self, size=10, min_score=0, codes=None, after=None, blocked=None, excluded=()):
+        """Uma página da fila: ``(posições, scores, cursor da próxima página ou None)``.
+
+        ``blocked`` é o bitmap de bloqueios do processo e ``excluded`` as posições que a
+        sessão já tirou da fila; ambos são descontados só nos candidatos lidos.
+        """
+        runs = self._runs(min_score, codes, after)
+        excluded = np.fromiter(excluded, dtype=np.int64) if len(excluded) else None
+        best = np.empty(0, dtype=np.int64)
+        while runs:
+            chunks = [best]
+            for i, (start, stop) in enumerate(runs):
+                taken = min(start + size, stop)
+                chunks.append(self._ranks[start:taken])
+                runs[i] = (taken, stop)
+            candidates = np.concatenate(chunks)
+            positions = candidates % self.n_rows
+            keep = np.ones(len(candidates), dtype=bool)
+            if blocked is not None:
+                keep &= ~blocked[positions]
+            if excluded is not None:
+                keep &= ~np.isin(positions, excluded)
+            candidates = candidates[keep]
+            if len(candidates) > size:
+                candidates = candidates[np.argpartition(candidates, size - 1)[:size]]
+            best = candidates
+            runs = [(start, stop) for start, stop in runs if start < stop]
+            # Página completa e nenhuma fatia restante pode superar o pior caso escolhido
+            if len(best) == size and all(self._ranks[start] > best.max() for start, _ in runs):
+                break
+        best = np.sort(best)
+        positions = best % self.n_rows
+        scores = MAX_SCORE - best // self.n_rows
+        has_more = len(best) == size and bool(self._runs(min_score, codes, int(best[-1])))
+        return positions, scores, int(best[-1]) if has_more else None
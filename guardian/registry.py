@@ -0,0 +1,125 @@
+"""Registro local de modelos: versões imutáveis com pesos mapeados em memória.
+
+Cada versão de um modelo é um diretório ``<raiz>/<modelo>/vN/`` com um ``.npy`` por
+array de pesos e um ``meta.json``. Como em ``DatasetStore``, a versão é escrita num
+diretório temporário e publicada com um ``os.replace``; depois disso nunca é alterada,
+então os pesos são abertos com ``np.load(mmap_mode="r")`` e as páginas ficam no page
+cache, compartilhadas por todos os processos.
+
+A versão em produção é o arquivo ``<raiz>/<modelo>/PRODUCTION``. O deploy grava o novo
+ponteiro num arquivo temporário e o troca com ``os.replace`` (atômico), então quem está
+pontuando continua com a versão antiga até a próxima consulta a ``production``, sem
+nenhuma pausa.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_MODELS_DIR = os.environ.get("GUARDIAN_MODELS_DIR", os.path.join(tempfile.gettempdir(), "guardian_models"))
+POINTER = "PRODUCTION"
+META = "meta.json"
+_VERSION_DIR = re.compile(r"^v(\d+)$")
+
+
+class ModelRegistry:
+    """Versões publicadas de cada modelo e o ponteiro da versão em produção."""
+
+    def __init__(self, root=DEFAULT_MODELS_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._loaded = {}  # (modelo, versão) -> (arrays mapeados, metadados)
+        self._pointers = {}  # modelo -> (mtime do ponteiro, versão)
+        self._lock = threading.Lock()
+
+    def _model_dir(self, model):
+        return os.path.join(self.root, model.replace(os.sep, "_"))
+
+    def versions(self, model):
+        """Versões publicadas de ``model``, da mais antiga para a mais recente."""
+        try:
+            names = os.listdir(self._model_dir(model))
+        except FileNotFoundError:
+            return []
+        numbers = sorted(int(match.group(1)) for match in map(_VERSION_DIR.match, names) if match)
+        return [f"v{number}" for number in numbers]
+
+    def latest_version(self, model):
+        versions = self.versions(model)
+        return versions[-1] if versions else None
+
+    def save(self, model, arrays, metadata=None):
+        """Publica ``arrays`` (nome -> array) como a próxima versão de ``model`` e devolve o nome dela."""
+        model_dir = self._model_dir(model)
+        os.makedirs(model_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=model_dir)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, f"{name}.npy"), np.asarray(array))
+            with self._lock:
+                existing = self.versions(model)
+                version = f"v{int(existing[-1][1:]) + 1 if existing else 1}"
+                with open(os.path.join(staging, META), "w", encoding="utf-8") as f:
+                    json.dump({**(metadata or {}), "model": model, "version": version, "created_at": time.time()}, f)
+                os.replace(staging, os.path.join(model_dir, version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return version
+
+    def load(self, model, version):
+        """``(arrays, metadados)`` de uma versão; os arrays são mapeados do disco (somente leitura)."""
+        key = (model, version)
+        loaded = self._loaded.get(key)
+        if loaded is None:
+            version_dir = os.path.join(self._model_dir(model), version)
+            with open(os.path.join(version_dir, META), encoding="utf-8") as f:
+                metadata = json.load(f)
+            arrays = {name[:-4]: np.load(os.path.join(version_dir, name), mmap_mode="r")
+                      for name in sorted(os.listdir(version_dir)) if name.endswith(".npy")}
+            with self._lock:
+                loaded = self._loaded.setdefault(key, (arrays, metadata))
+        return loaded
+
+    def metadata(self, model, version):
+        return self.load(model, version)[1]
+
+    def deploy(self, model, version=None):
+        """Aponta a produção de ``model`` para ``version`` (padrão: a mais recente); devolve a anterior."""
+        version = version or self.latest_version(model)
+        if version not in self.versions(model):
+            raise KeyError(f"Versão {version!r} de {model!r} não encontrada em {self.root}")
+        previous = self.production_version(model)
+        model_dir = self._model_dir(model)
+        fd, staging = tempfile.mkstemp(prefix=".pointer-", dir=model_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "deployed_at": time.time()}, f)
+        os.replace(staging, os.path.join(model_dir, POINTER))
+        return previous
+
+    def production_version(self, model):
+        """Versão em produção (relida só quando o ponteiro muda no disco), ou ``None``."""
+        path = os.path.join(self._model_dir(model), POINTER)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._pointers.get(model)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            version = json.load(f)["version"]
+        self._pointers[model] = (mtime, version)
+        return version
+
+    def production(self, model):
+        """``(versão, arrays, metadados)`` da versão em produção, ou ``None`` se não houver deploy."""
+        version = self.production_version(model)
+        if version is None:
+            return None
+        return (version, *self.load(model, version))
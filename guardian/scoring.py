@@ -0,0 +1,206 @@
+"""Pontuação de risco em lote: score 0–1000 calculado das features de cada conta.
+
+O modelo é logístico sobre cinco features: quantas contas usam o mesmo aparelho, a
+classe do ASN (residencial, datacenter, proxy), o valor depositado, o tempo de sessão
+e a aposta média em relação à média do grupo de pares. O cálculo é vetorizado em
+NumPy, uma partição (``BLOCK_ROWS`` linhas) por vez, e os scores são gravados de volta
+na tabela ``users`` do ``DatasetStore``. Agregados mantidos em memória (o ``ScoreHistogram``
+e o cubo geográfico) recebem a diferença entre scores antigos e novos, calculada
+partição a partição e aplicada só depois que a nova tabela é publicada.
+
+Uso em linha de comando::
+
+    python -m guardian.scoring --dados /tmp/guardian_carga
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from guardian.indexes import KeyIndex
+from guardian.queue import MAX_SCORE
+from guardian.storage import DEFAULT_DATA_DIR, DatasetStore
+
+SCORING_MODEL = "risk_v1"
+
+ASN_CLASSES = {
+    "AS262372 (Amazon AWS)": "datacenter",
+    "AS16509 (Amazon)": "datacenter",
+    "AS_Proxy_Network": "proxy",
+}
+DEFAULT_ASN_CLASS = "residencial"
+ASN_CLASS_WEIGHTS = {"residencial": 0.0, "datacenter": 2.5, "proxy": 2.0}
+
+# Pesos do logit; score = 1000 * sigmoid(logit)
+SCORE_WEIGHTS = {"intercept": -2.0, "device_sharing": 1.2, "deposit": 0.8, "session": 0.6, "bet_vs_peer": 0.8}
+REFERENCE_DEPOSIT = 300.0
+REFERENCE_SESSION_SEC = 600.0
+
+# Cortes com contagem "score >= corte" mantida a cada atualização (monitoramento e bloqueio)
+HISTOGRAM_CUTS = (800, 950)
+
+FEATURE_COLUMNS = ("device_id", "ip_asn", "total_deposited", "session_time_sec", "avg_bet_value", "peer_group")
+
+
+def asn_class(asn):
+    return ASN_CLASSES.get(asn, DEFAULT_ASN_CLASS)
+
+
+def _codes(column):
+    """Códigos por linha e categorias de uma coluna categórica (dicionário Arrow ou texto)."""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks() if column.num_chunks else pa.array([], type=column.type)
+    if pa.types.is_dictionary(column.type):
+        return column.indices.to_numpy(zero_copy_only=False), column.dictionary.to_pylist()
+    codes, categories = pd.factorize(column.to_numpy(zero_copy_only=False))
+    return codes, list(categories)
+
+
+def lookup(column, mapping, default):
+    """Aplica ``mapping`` a uma coluna categórica sem laço por linha."""
+    codes, categories = _codes(column)
+    table = np.array([mapping.get(value, default) for value in categories] or [default], dtype=np.float64)
+    return table[codes]
+
+
+def peer_means(table):
+    """Aposta média de cada grupo de pares em toda a tabela."""
+    codes, categories = _codes(table.column("peer_group"))
+    bets = table.column("avg_bet_value").to_numpy().astype(np.float64)
+    sums = np.bincount(codes, weights=bets, minlength=len(categories))
+    counts = np.bincount(codes, minlength=len(categories))
+    return {group: total / count for group, total, count in zip(categories, sums, counts) if count}
+
+
+def score_features(device_accounts, asn_weight, deposit, session_sec, avg_bet, peer_avg_bet):
+    """Scores (int16, 0–1000) a partir dos vetores de features."""
+    w = SCORE_WEIGHTS
+    logit = (w["intercept"]
+             + w["device_sharing"] * np.log2(np.maximum(device_accounts, 1))
+             + asn_weight
+             + w["deposit"] * np.log10(np.maximum(deposit, 1.0) / REFERENCE_DEPOSIT)
+             + w["session"] * np.log(REFERENCE_SESSION_SEC / np.maximum(session_sec, 5.0))
+             + w["bet_vs_peer"] * np.log(np.maximum(avg_bet, 0.01) / np.maximum(peer_avg_bet, 0.01)))
+    return np.rint(1000.0 / (1.0 + np.exp(-logit))).astype(np.int16)
+
+
+def score_table(table, device_accounts, peer_avg_bets):
+    """Scores de uma partição; ``device_accounts`` alinhado às linhas dela."""
+    asn_weight = lookup(table.column("ip_asn"), {a: ASN_CLASS_WEIGHTS[asn_class(a)] for a in ASN_CLASSES},
+                         ASN_CLASS_WEIGHTS[DEFAULT_ASN_CLASS])
+    peer_avg = lookup(table.column("peer_group"), peer_avg_bets, np.nan)
+    return score_features(
+        device_accounts, asn_weight,
+        table.column("total_deposited").to_numpy().astype(np.float64),
+        table.column("session_time_sec").to_numpy().astype(np.float64),
+        table.column("avg_bet_value").to_numpy().astype(np.float64),
+        np.where(np.isnan(peer_avg), table.column("avg_bet_value").to_numpy(), peer_avg))
+
+
+class ScoreHistogram:
+    """Contagem de contas por score (0–1000), atualizada incrementalmente.
+
+    Cada mudança de score tira a conta do balde antigo e a põe no novo; as contas acima
+    de cada corte de ``cuts`` são ajustadas no mesmo passo, então consultá-las é O(1).
+    """
+
+    def __init__(self, scores=(), cuts=HISTOGRAM_CUTS):
+        self.counts = np.zeros(MAX_SCORE + 1, dtype=np.int64)
+        self._above = dict.fromkeys(cuts, 0)
+        self._lock = threading.Lock()
+        self.update((), scores)
+
+    @property
+    def total(self):
+        with self._lock:
+            return int(self.counts.sum())
+
+    def update(self, old_scores, new_scores):
+        """Troca ``old_scores`` por ``new_scores`` (vetores; um deles pode ser vazio)."""
+        self.apply_deltas([self.score_delta(None, old_scores, new_scores)])
+
+    def score_delta(self, partition, old_scores, new_scores):
+        """Variação das contagens por score ao trocar os scores de uma partição (não aplicada)."""
+        old = np.asarray(old_scores, dtype=np.int64)
+        new = np.asarray(new_scores, dtype=np.int64)
+        return np.bincount(new, minlength=MAX_SCORE + 1) - np.bincount(old, minlength=MAX_SCORE + 1)
+
+    def apply_deltas(self, deltas):
+        """Aplica de uma vez as variações de ``score_delta`` (uma por partição)."""
+        delta = np.sum(deltas, axis=0) if len(deltas) else np.zeros(MAX_SCORE + 1, dtype=np.int64)
+        above = {cut: int(delta[cut:].sum()) for cut in self._above}
+        with self._lock:
+            self.counts += delta
+            for cut, change in above.items():
+                self._above[cut] += change
+
+    def above(self, cut):
+        """Contas com score >= ``cut`` (O(1) para os cortes mantidos)."""
+        with self._lock:
+            if cut in self._above:
+                return self._above[cut]
+            return int(self.counts[cut:].sum())
+
+    def binned(self, width=20):
+        """Início de cada faixa de ``width`` pontos e a contagem dela (1000 entra na última)."""
+        with self._lock:
+            counts = self.counts[:MAX_SCORE].reshape(-1, width).sum(axis=1)
+            counts[-1] += self.counts[MAX_SCORE]
+        return np.arange(0, MAX_SCORE, width), counts
+
+
+def score_users(store, device_accounts=None, progress=None, aggregates=()):
+    """Recalcula ``risk_score`` de todas as contas e grava a tabela ``users`` de volta.
+
+    ``device_accounts`` (contas por aparelho, por linha) pode vir do ``UserIndex`` já
+    construído; sem ele, é calculado aqui. ``progress(feitas, total)`` é chamado a cada
+    partição. Cada um dos ``aggregates`` calcula ``score_delta(partição, scores antigos, novos)``
+    durante a reescrita e recebe todas em ``apply_deltas`` só depois que a tabela é
+    publicada: se a reescrita falhar, os agregados continuam iguais à tabela em disco.
+    Retorna linhas, segundos e linhas/s (incluindo a gravação).
+    """
+    started = time.perf_counter()
+    features = store.read_table("users", list(FEATURE_COLUMNS)).unify_dictionaries()
+    n_rows = features.num_rows
+    if device_accounts is None:
+        device_accounts = KeyIndex(features.column("device_id").to_pandas()).group_sizes()
+    peer_avg_bets = peer_means(features)
+    done = 0
+    deltas = [[] for _ in aggregates]
+
+    def rescore(partition):
+        nonlocal done
+        scores = score_table(partition, device_accounts[done:done + partition.num_rows], peer_avg_bets)
+        column = partition.schema.get_field_index("risk_score")
+        for aggregate, pending in zip(aggregates, deltas):
+            pending.append(aggregate.score_delta(partition, partition.column(column).to_numpy(), scores))
+        partition = partition.set_column(column, partition.schema.field(column), pa.array(scores))
+        done += partition.num_rows
+        if progress:
+            progress(done, n_rows)
+        return partition
+
+    metadata = {"scoring": {"model": SCORING_MODEL, "scored_at": time.time()}}
+    store.rewrite_table("users", rescore, metadata)
+    for aggregate, pending in zip(aggregates, deltas):
+        aggregate.apply_deltas(pending)
+    seconds = time.perf_counter() - started
+    return {"rows": n_rows, "seconds": seconds, "rows_per_sec": n_rows / seconds if seconds else 0.0,
+            "model": SCORING_MODEL}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula os scores de risco da tabela de usuários.")
+    parser.add_argument("--dados", default=DEFAULT_DATA_DIR, help="diretório do DatasetStore")
+    args = parser.parse_args(argv)
+
+    result = score_users(DatasetStore(args.dados))
+    print(f"{result['rows']:,} usuários pontuados ({result['model']}) em {result['seconds']:.1f}s "
+          f"-> {result['rows_per_sec']:,.0f} linhas/s")
+
+
+if __name__ == "__main__":
+    main()
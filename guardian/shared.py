@@ -0,0 +1,268 @@
+"""Conjunto de dados compartilhado pelo processo e overlays copy-on-write por sessão.
+
+O ``SharedDataset`` é aberto uma única vez por processo sobre o ``DatasetStore`` (arquivos
+mapeados em memória) e nunca é alterado; cada sessão guarda apenas um ``SessionOverlay``
+com as próprias edições (bloqueios, monitoramentos, relatórios e caso selecionado). Quando uma sessão precisa de uma visão alterada da tabela
+de usuários, só a coluna afetada é copiada — as demais continuam apontando para os
+mesmos buffers compartilhados.
+"""
+import sys
+import threading
+import weakref
+
+import pyarrow as pa
+
+from guardian.backtest import PolicyBacktest
+from guardian.density import BetDensity
+from guardian.entity import EntityResolver
+from guardian.geo import GeoCube
+from guardian.indexes import INDEXED_COLUMNS, UserIndex
+from guardian.queue import InvestigationQueue
+from guardian.scoring import ScoreHistogram
+
+
+class SharedDataset:
+    """Tabelas de usuários, apostas e transações imutáveis, compartilhadas por todas as sessões.
+
+    As tabelas Arrow ficam mapeadas do disco; cada consumidor pede só as colunas que usa
+    e a projeção em pandas é convertida uma vez e reaproveitada.
+    """
+
+    TABLES = ("users", "bets", "transactions")
+
+    def __init__(self, store, background_typology=None):
+        self.store = store
+        self.background_typology = background_typology  # tipologia das contas sem alerta
+        self._tables = {name: store.read_table(name) for name in self.TABLES}
+        self._frames = {}
+        self._user_index = None
+        self._entity_resolver = None
+        self._investigation_queue = None
+        self._bet_density = None
+        self._score_histogram = None
+        self._geo_cube = None
+        self._policy_backtest = None
+        self.version = 0  # incrementado a cada tabela reaberta do disco
+        self._lock = threading.Lock()
+
+    def frame(self, name, columns=None):
+        """Projeção ``columns`` (todas, se ``None``) da tabela ``name`` como DataFrame.
+
+        Como em ``_lazy``, a conversão roda fora do lock e só é guardada se a tabela não
+        foi reaberta no meio; senão, quem pediu recebe a projeção da versão que leu.
+        """
+        key = (name, tuple(columns) if columns else None)
+        frame = self._frames.get(key)
+        if frame is None:
+            table = self._tables[name]
+            built = (table.select(list(columns)) if columns else table).to_pandas(split_blocks=True)
+            with self._lock:
+                frame = self._frames.get(key)
+                if frame is None:
+                    frame = built
+                    if self._tables[name] is table:
+                        self._frames[key] = built
+        return frame
+
+    def refresh(self, name):
+        """Reabre ``name`` após uma reescrita no disco (ex.: novos scores), mesma ordem de linhas.
+
+        Descarta as projeções da tabela e a fila de investigação (ou a grade de densidade
+        das apostas); os índices de chaves e os anéis continuam válidos porque as chaves
+        não mudam. O histograma de scores e o cubo geográfico também são mantidos: quem
+        reescreve os scores os atualiza incrementalmente (``score_users(..., aggregates=...)``).
+        """
+        table = self.store.read_table(name)
+        with self._lock:
+            self._tables[name] = table
+            self._frames = {key: frame for key, frame in self._frames.items() if key[0] != name}
+            if name == "users":
+                self._investigation_queue = None
+            if name == "bets":
+                self._bet_density = None
+            self.version += 1
+
+    def table(self, name):
+        """Tabela Arrow ``name`` mapeada do disco (a versão atual)."""
+        return self._tables[name]
+
+    def users(self, *columns):
+        return self.frame("users", columns)
+
+    def take(self, name, positions, columns=None):
+        """Linhas nas posições dadas (apenas elas são convertidas para pandas)."""
+        table = self._tables[name]
+        if columns:
+            table = table.select(list(columns))
+        return table.take(pa.array(positions, type=pa.int64())).to_pandas()
+
+    def user_record(self, position):
+        """Registro completo de um usuário como dict, lido direto da tabela mapeada."""
+        return self._tables["users"].slice(position, 1).to_pylist()[0]
+
+    def _lazy(self, attr, name, build):
+        """Estrutura ``attr`` construída por ``build(tabela)`` na primeira consulta.
+
+        A construção roda fora do lock (``frame`` e ``refresh`` das outras sessões não
+        esperam por ela); só a publicação é feita sob o lock, e apenas se a tabela ``name``
+        não foi reaberta no meio. Duas consultas simultâneas podem construir em dobro; a
+        primeira a terminar é a que fica.
+        """
+        value = getattr(self, attr)
+        if value is None:
+            table = self._tables[name]
+            built = build(table)
+            with self._lock:
+                value = getattr(self, attr)
+                if value is None:
+                    value = built
+                    if self._tables[name] is table:
+                        setattr(self, attr, built)
+        return value
+
+    @property
+    def user_index(self):
+        """``UserIndex`` do processo, construído na primeira consulta."""
+        return self._lazy("_user_index", "users",
+                          lambda table: UserIndex(table.select([*INDEXED_COLUMNS, "status"]).to_pandas()))
+
+    @property
+    def entity_resolver(self):
+        """``EntityResolver`` (anéis de contas ligadas) do processo, construído na primeira consulta."""
+        user_index = self.user_index
+        return self._lazy("_entity_resolver", "users", lambda table: EntityResolver(user_index))
+
+    @property
+    def investigation_queue(self):
+        """``InvestigationQueue`` das contas ativas, construída na primeira consulta."""
+        def build(table):
+            users = self.users("risk_score", "main_risk_factor", "status")
+            return InvestigationQueue(users["risk_score"], users["main_risk_factor"], (users["status"] == "active").to_numpy())
+        return self._lazy("_investigation_queue", "users", build)
+
+    @property
+    def score_histogram(self):
+        """``ScoreHistogram`` de todas as contas, contado na primeira consulta."""
+        return self._lazy("_score_histogram", "users", lambda table: ScoreHistogram(table.column("risk_score").to_numpy()))
+
+    @property
+    def geo_cube(self):
+        """``GeoCube`` (agregados por estado e célula), construído na primeira consulta."""
+        return self._lazy("_geo_cube", "users", lambda table: GeoCube(table, background=self.background_typology))
+
+    @property
+    def bet_density(self):
+        """``BetDensity`` (grade valor x odd das apostas), construída na primeira consulta."""
+        return self._lazy("_bet_density", "bets", BetDensity)
+
+    @property
+    def policy_backtest(self):
+        """``PolicyBacktest`` do histórico de transações, contado na primeira consulta."""
+        return self._lazy("_policy_backtest", "transactions", PolicyBacktest)
+
+    def bets(self, *columns):
+        return self.frame("bets", columns)
+
+    @property
+    def mapped_bytes(self):
+        """Bytes das tabelas mapeadas do disco (páginas compartilhadas via page cache)."""
+        return sum(table.nbytes for table in self._tables.values())
+
+    @property
+    def materialized_bytes(self):
+        """Bytes das projeções já convertidas para pandas neste processo."""
+        with self._lock:
+            frames = list(self._frames.values())
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in frames))
+
+
+class SessionOverlay:
+    """Edições de uma sessão sobre o ``SharedDataset``."""
+
+    __slots__ = ("blocked", "monitoring", "reports", "selected_case_id", "version", "_views", "__weakref__")
+
+    def __init__(self):
+        self.blocked = set()
+        self.monitoring = set()
+        self.reports = set()
+        self.selected_case_id = None
+        self.version = 0  # incrementado a cada edição que altera a visão dos dados
+        self._views = {}
+
+    def block(self, user_id):
+        if user_id not in self.blocked:
+            self.blocked.add(user_id)
+            self.version += 1
+            self._views.clear()
+
+    def monitor(self, user_id):
+        self.monitoring.add(user_id)
+
+    def generate_report(self, user_id):
+        self.reports.add(user_id)
+
+    def users_view(self, shared, *columns):
+        """Usuários vistos por esta sessão; sem edições, é a própria projeção compartilhada."""
+        frame = shared.users(*columns)
+        if not self.blocked or 'status' not in frame.columns:
+            return frame
+        key = (shared.version, tuple(frame.columns))
+        view = self._views.get(key)
+        if view is None:
+            view = frame.copy(deep=False)
+            status = view['status'].copy()
+            status.iloc[self.blocked_positions(shared)] = 'blocked'
+            view['status'] = status
+            # Visões de versões anteriores do conjunto compartilhado não servem mais
+            self._views = {k: v for k, v in self._views.items() if k[0] == shared.version}
+            self._views[key] = view
+        return view
+
+    def blocked_positions(self, shared):
+        """Posições (via índice, sem varrer a tabela) dos usuários bloqueados nesta sessão."""
+        index = shared.user_index
+        return [p for p in (index.position(user_id) for user_id in self.blocked) if p is not None]
+
+    def user_record(self, shared, user_id):
+        """Registro do usuário com as edições da sessão aplicadas, ou ``None`` se não existir."""
+        position = shared.user_index.position(user_id)
+        if position is None:
+            return None
+        record = shared.user_record(position)
+        if user_id in self.blocked:
+            record['status'] = 'blocked'
+        return record
+
+    def nbytes(self):
+        """Bytes ocupados exclusivamente por esta sessão (edições e colunas copiadas)."""
+        total = sys.getsizeof(self) + sys.getsizeof(self.selected_case_id)
+        for edits in (self.blocked, self.monitoring, self.reports):
+            total += sys.getsizeof(edits) + sum(sys.getsizeof(user_id) for user_id in edits)
+        for view in self._views.values():
+            total += int(view['status'].memory_usage(deep=True))
+        return total
+
+
+class OverlayRegistry:
+    """Registro (por referência fraca) dos overlays ativos, usado no relatório de memória."""
+
+    def __init__(self):
+        self._overlays = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def new_overlay(self):
+        overlay = SessionOverlay()
+        with self._lock:
+            self._overlays.add(overlay)
+        return overlay
+
+    def memory_report(self, shared):
+        with self._lock:
+            per_session = [overlay.nbytes() for overlay in self._overlays]
+        return {
+            "mapped_bytes": shared.mapped_bytes,
+            "materialized_bytes": shared.materialized_bytes,
+            "sessions": len(per_session),
+            "session_bytes_total": sum(per_session),
+            "session_bytes_max": max(per_session, default=0),
+        }
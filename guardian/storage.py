@@ -0,0 +1,160 @@
+"""Armazenamento colunar em disco local: tabelas particionadas em Arrow IPC ou Parquet.
+
+Cada versão publicada de uma tabela é um diretório ``<raiz>/<nome>/vN/`` com arquivos
+``part-NNNNN.arrow`` (ou ``.parquet``) e um ``_manifest.json``; o arquivo
+``<raiz>/<nome>/CURRENT`` aponta para a versão atual. Publicar é gravar a nova versão
+ao lado das outras e trocar o ponteiro com um único ``os.replace``: quem lê vê a versão
+antiga ou a nova, nunca um diretório ausente. As versões anteriores à última
+substituída são removidas na publicação seguinte. Partições Arrow IPC não comprimidas são abertas
+com memory-map e lidas sem cópia: as páginas ficam no page cache do sistema operacional
+e são compartilhadas entre todos os processos (workers) que abrem os mesmos arquivos.
+Partições Parquet são decodificadas lendo apenas as colunas pedidas.
+"""
+import glob
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MANIFEST = "_manifest.json"
+POINTER = "CURRENT"
+STAGING_PREFIX = ".staging-"
+# Versões mantidas no disco (a atual e a anterior, ainda aberta por leitores lentos)
+KEEP_VERSIONS = 2
+_VERSION_DIR = re.compile(r"^v(\d+)$")
+FORMATS = ("arrow", "parquet")
+
+DEFAULT_DATA_DIR = os.environ.get("GUARDIAN_DATA_DIR", os.path.join(tempfile.gettempdir(), "guardian_data"))
+
+
+class DatasetStore:
+    """Conjunto de tabelas colunares particionadas sob um diretório raiz."""
+
+    def __init__(self, root=DEFAULT_DATA_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def table_dir(self, name):
+        return os.path.join(self.root, name)
+
+    def current_version(self, name):
+        """Diretório da versão atual (``vN``), ou ``None`` se a tabela ainda não foi publicada."""
+        try:
+            with open(os.path.join(self.table_dir(name), POINTER), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, name):
+        """Manifesto da versão atual da tabela, ou ``None`` se ela ainda não foi publicada."""
+        version = self.current_version(name)
+        if version is None:
+            return None
+        with open(os.path.join(self.table_dir(name), version, MANIFEST), encoding="utf-8") as f:
+            return {**json.load(f), "version": version}
+
+    def write_table(self, name, frames, fmt="arrow", metadata=None):
+        """Grava um iterável de DataFrames (uma partição cada) e publica a tabela atomicamente.
+
+        As partições são escritas numa nova versão e o ponteiro ``CURRENT`` é trocado no
+        fim; leitores já abertos continuam usando os arquivos antigos até fechá-los.
+        """
+        tables = (pa.Table.from_pandas(frame, preserve_index=False) for frame in frames)
+        return self._write_partitions(name, tables, fmt, metadata or {})
+
+    def rewrite_table(self, name, transform, metadata=None):
+        """Reescreve a tabela partição a partição com ``transform(pa.Table) -> pa.Table``.
+
+        Cada partição é lida mapeada, transformada e gravada numa nova versão; ela é
+        publicada atomicamente, com ``metadata`` somado ao manifesto atual.
+        """
+        manifest = self.manifest(name)
+        if manifest is None:
+            raise FileNotFoundError(f"Tabela {name!r} não encontrada em {self.root}")
+        tables = (transform(_read_partition(path, None)) for path in self._partition_paths(name, manifest))
+        return self._write_partitions(name, tables, manifest["format"], {**manifest["metadata"], **(metadata or {})})
+
+    def _write_partitions(self, name, tables, fmt, metadata):
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato desconhecido: {fmt!r} (use {FORMATS})")
+        table_dir = self.table_dir(name)
+        os.makedirs(table_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=table_dir)
+        rows, parts, columns = 0, 0, []
+        try:
+            for part, table in enumerate(tables):
+                path = os.path.join(staging, f"part-{part:05d}.{fmt}")
+                if fmt == "arrow":
+                    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                else:
+                    pq.write_table(table, path)
+                rows, parts, columns = rows + table.num_rows, parts + 1, table.schema.names
+            manifest = {"name": name, "format": fmt, "rows": rows, "partitions": parts,
+                        "columns": columns, "created_at": time.time(), "metadata": metadata}
+            with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            version = self._publish(staging, table_dir)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return {**manifest, "version": version}
+
+    def _versions(self, table_dir):
+        numbers = sorted(int(match.group(1)) for match in map(_VERSION_DIR.match, os.listdir(table_dir)) if match)
+        return [f"v{number}" for number in numbers]
+
+    def _publish(self, staging, table_dir):
+        """Renomeia ``staging`` para a próxima ``vN``, troca o ponteiro e remove as versões antigas."""
+        while True:
+            existing = self._versions(table_dir)
+            version = f"v{int(existing[-1][1:]) + 1 if existing else 1}"
+            try:
+                os.rename(staging, os.path.join(table_dir, version))
+                break
+            except OSError:
+                if not os.path.isdir(os.path.join(table_dir, version)):
+                    raise  # outro escritor publicou a mesma vN; tenta a seguinte
+        fd, pointer = tempfile.mkstemp(prefix=".pointer-", dir=table_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(table_dir, POINTER))
+        keep = set(self._versions(table_dir)[-KEEP_VERSIONS:]) | {version, POINTER}
+        for entry in os.listdir(table_dir):
+            # Versões antigas e arquivos do layout anterior (partições direto no diretório da tabela)
+            if entry in keep or entry.startswith((STAGING_PREFIX, ".pointer-")):
+                continue
+            path = os.path.join(table_dir, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        return version
+
+    def read_table(self, name, columns=None):
+        """Lê a tabela como ``pa.Table`` (uma fatia por partição), apenas com as colunas pedidas."""
+        manifest = self.manifest(name)
+        if manifest is None:
+            raise FileNotFoundError(f"Tabela {name!r} não encontrada em {self.root}")
+        parts = [_read_partition(path, columns) for path in self._partition_paths(name, manifest)]
+        if not parts:
+            return pa.table({c: pa.array([]) for c in (columns or manifest["columns"])})
+        return pa.concat_tables(parts)
+
+    def _partition_paths(self, name, manifest):
+        version_dir = os.path.join(self.table_dir(name), manifest["version"])
+        return sorted(glob.glob(os.path.join(version_dir, f"part-*.{manifest['format']}")))
+
+
+def _read_partition(path, columns):
+    if path.endswith(".arrow"):
+        # Leitura sem cópia: os buffers da tabela apontam direto para o arquivo mapeado
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns, memory_map=True)
+
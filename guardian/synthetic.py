@@ -0,0 +1,395 @@
+"""Gerador vetorizado e parametrizável de usuários, apostas e transações sintéticos.
+
+Todos os campos são sorteados em blocos de ``BLOCK_ROWS`` linhas com um
+``np.random.Generator`` próprio por bloco, de modo que o conjunto gerado em memória
+e o gravado em disco (partições do ``DatasetStore``) são idênticos para a mesma semente.
+
+Uso em linha de comando (teste de carga)::
+
+    python -m guardian.synthetic --perfil carga --saida /tmp/guardian_carga
+
+O mesmo diretório pode ser usado pelo dashboard via ``GUARDIAN_DATA_DIR``.
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from guardian.storage import DatasetStore
+
+# Linhas por bloco de geração (e por partição gravada em disco).
+BLOCK_ROWS = 1 << 20
+
+# Versão do algoritmo de geração; conjuntos gravados por outra versão são regenerados
+GENERATOR_VERSION = 3
+
+# Nos anéis, a cada ``RING_LINK_STRIDE`` membros o último usa um aparelho próprio e só se
+# liga ao anel pela chave PIX que compartilha com o membro anterior.
+RING_LINK_STRIDE = 4
+
+RING_TYPOLOGY = "Anel de Fraude (Multi-Conta)"
+LEGIT_TYPOLOGY = "Sem Alerta"
+
+# Estado: (lat, lon, peso na população)
+STATES = {
+    "SP": (-23.5505, -46.6333, 0.28), "RJ": (-22.9068, -43.1729, 0.12), "MG": (-19.9167, -43.9345, 0.11),
+    "RS": (-30.0346, -51.2177, 0.06), "PR": (-25.4284, -49.2733, 0.06), "SC": (-27.5954, -48.5480, 0.04),
+    "BA": (-12.9777, -38.5016, 0.07), "GO": (-16.6869, -49.2648, 0.04), "PE": (-8.0476, -34.8770, 0.05),
+    "CE": (-3.7319, -38.5267, 0.05), "PA": (-1.4558, -48.4902, 0.04), "MA": (-2.5391, -44.2829, 0.03),
+    "PB": (-7.1195, -34.8450, 0.02), "ES": (-20.3155, -40.3128, 0.02), "PI": (-5.0919, -42.8034, 0.01),
+}
+
+# Perfil de cada tipologia: faixa de score, meios de pagamento, ASNs e valores típicos
+TYPOLOGY_PROFILES = {
+    RING_TYPOLOGY: {
+        "prefix": "multi_acct", "device_prefix": "dev_burner", "score": (920, 960),
+        "payment": ("PIX",), "asn": ("AS28573 (Vivo/Telefonica)",),
+        "deposit": 250.0, "avg_bet": 75.5, "session": 45, "peer_group": "Apostador Casual", "age_hours": (1, 4),
+    },
+    "Fraude de Identidade (CPF)": {
+        "prefix": "cpf_fraud", "device_prefix": "dev_vm_cloud", "score": (960, 1000),
+        "payment": ("Cartão de Crédito",), "asn": ("AS262372 (Amazon AWS)", "AS16509 (Amazon)"),
+        "deposit": 5000.0, "avg_bet": 500.0, "session": 120, "peer_group": "High Roller", "age_hours": (24, 72),
+    },
+    "Abuso de Bônus": {
+        "prefix": "bonus_hunter", "device_prefix": "dev_mobile_proxy", "score": (680, 760),
+        "payment": ("Boleto", "PIX"), "asn": ("AS_Proxy_Network",),
+        "deposit": 50.0, "avg_bet": 10.0, "session": 30, "peer_group": "Caçador de Bônus", "age_hours": (1, 12),
+    },
+    "Chargeback Fraudulento": {
+        "prefix": "pix_chargeback", "device_prefix": "dev_mobile", "score": (820, 900),
+        "payment": ("PIX", "Cartão de Crédito"), "asn": ("AS28573 (Claro)", "AS18881 (Vivo)"),
+        "deposit": 1500.0, "avg_bet": 150.0, "session": 85, "peer_group": "Apostador Casual", "age_hours": (72, 480),
+    },
+    LEGIT_TYPOLOGY: {
+        "prefix": "usr", "device_prefix": "dev", "score": (50, 600),
+        "payment": ("PIX", "Cartão de Crédito", "Boleto"),
+        "asn": ("AS28573 (Claro)", "AS18881 (Vivo)", "AS26599 (TIM)", "AS7738 (Oi)"),
+        "deposit": 300.0, "avg_bet": 40.0, "session": 600, "peer_group": "Apostador Casual", "age_hours": (24, 8760),
+    },
+}
+
+PAYMENT_PREFIXES = {"PIX": "pix_key", "Cartão de Crédito": "card_hash", "Boleto": "boleto"}
+PEER_GROUPS = ["Apostador Casual", "High Roller", "Caçador de Bônus"]
+USER_STATUSES = ["active", "blocked"]
+BET_TYPES = ["Padrão", "Anômala"]
+
+TYPOLOGIES = list(TYPOLOGY_PROFILES)
+PAYMENT_TYPES = list(PAYMENT_PREFIXES)
+ASNS = list(dict.fromkeys(asn for p in TYPOLOGY_PROFILES.values() for asn in p["asn"]))
+STATE_CODES = list(STATES)
+
+# Perfis prontos: "demo" reproduz o conjunto original de 11 casos; "carga" é a escala de produção
+DATA_PROFILES = {
+    "demo": {
+        "n_users": 11, "n_bets": 420, "n_rings": 1, "ring_size": 8, "anomaly_rate": 20 / 420,
+        "n_transactions": 200_000, "fraud_rate": 0.01,
+        "typology_mix": {"Fraude de Identidade (CPF)": 1, "Abuso de Bônus": 1, "Chargeback Fraudulento": 1},
+    },
+    "carga": {
+        "n_users": 10_000_000, "n_bets": 100_000_000, "n_rings": 20_000, "ring_size": 12, "anomaly_rate": 0.01,
+        "n_transactions": 100_000_000, "fraud_rate": 0.01,
+        "typology_mix": {LEGIT_TYPOLOGY: 0.95, "Fraude de Identidade (CPF)": 0.01,
+                         "Abuso de Bônus": 0.025, "Chargeback Fraudulento": 0.015},
+    },
+}
+
+
+def _profile_table(field, dtype):
+    return np.array([p[field] for p in TYPOLOGY_PROFILES.values()], dtype=dtype)
+
+
+def _choice_table(field, vocabulary):
+    """Tabela (tipologia x opção) de códigos, preenchida ciclicamente, para sorteio vetorizado."""
+    width = max(len(p[field]) for p in TYPOLOGY_PROFILES.values())
+    table = np.zeros((len(TYPOLOGIES), width), dtype=np.int8)
+    for t, profile in enumerate(TYPOLOGY_PROFILES.values()):
+        codes = [vocabulary.index(v) for v in profile[field]]
+        table[t] = [codes[k % len(codes)] for k in range(width)]
+    counts = np.array([len(p[field]) for p in TYPOLOGY_PROFILES.values()], dtype=np.int64)
+    return table, counts
+
+
+_SCORE_RANGE = _profile_table("score", np.int32)
+_AGE_RANGE = _profile_table("age_hours", np.float64)
+_DEPOSIT = _profile_table("deposit", np.float64)
+_AVG_BET = _profile_table("avg_bet", np.float64)
+_SESSION = _profile_table("session", np.float64)
+_PEER = np.array([PEER_GROUPS.index(p["peer_group"]) for p in TYPOLOGY_PROFILES.values()], dtype=np.int8)
+_PAYMENT_CHOICES = _choice_table("payment", PAYMENT_TYPES)
+_ASN_CHOICES = _choice_table("asn", ASNS)
+_STATE_COORDS = np.array([(lat, lon) for lat, lon, _ in STATES.values()])
+_STATE_WEIGHTS = np.array([w for _, _, w in STATES.values()])
+_STATE_WEIGHTS = _STATE_WEIGHTS / _STATE_WEIGHTS.sum()
+
+_USER_PREFIXES = pa.array([p["prefix"] for p in TYPOLOGY_PROFILES.values()])
+_DEVICE_PREFIXES = pa.array([p["device_prefix"] for p in TYPOLOGY_PROFILES.values()])
+_PAYMENT_ID_PREFIXES = pa.array(list(PAYMENT_PREFIXES.values()))
+_STATES_LOWER = pa.array([s.lower() for s in STATE_CODES])
+_STATES_UPPER = pa.array(STATE_CODES)
+
+
+def population_plan(n_users, n_rings=1, ring_size=8, typology_mix=None, seed=42):
+    """Distribui as posições de usuário entre anéis e tipologias (cotas exatas, sem sorteio)."""
+    typology_mix = typology_mix or DATA_PROFILES["demo"]["typology_mix"]
+    unknown = set(typology_mix) - set(TYPOLOGIES)
+    if unknown:
+        raise ValueError(f"Tipologias desconhecidas: {sorted(unknown)}")
+    mix = {k: float(v) for k, v in typology_mix.items() if v > 0}
+
+    ring_size = max(int(ring_size), 1)
+    n_ring_members = min(int(n_users), int(n_rings) * ring_size)
+    rest = int(n_users) - n_ring_members
+    if rest and not mix:
+        raise ValueError("typology_mix precisa de ao menos uma tipologia com peso positivo")
+
+    # Maiores restos: as cotas somam exatamente o número de usuários fora de anéis
+    weights = np.array(list(mix.values()))
+    exact = weights / weights.sum() * rest
+    quotas = np.floor(exact).astype(np.int64)
+    quotas[np.argsort(quotas - exact)[:rest - quotas.sum()]] += 1
+
+    n_ring_total = -(-n_ring_members // ring_size)
+    ring_rng = np.random.default_rng([seed, 2])
+    return {
+        "n_users": int(n_users),
+        "n_ring_members": n_ring_members,
+        "ring_size": ring_size,
+        "ring_states": ring_rng.choice(len(STATE_CODES), size=n_ring_total, p=_STATE_WEIGHTS).astype(np.int8),
+        "codes": np.array([TYPOLOGIES.index(k) for k in mix], dtype=np.int8),
+        "bounds": n_ring_members + np.cumsum(quotas),
+    }
+
+
+def _pick(rng, choices, typology):
+    table, counts = choices
+    k = (rng.random(len(typology)) * counts[typology]).astype(np.int64)
+    return table[typology, k]
+
+
+def _jitter(rng, base, n, sigma):
+    return (base * rng.lognormal(0.0, sigma, n)).astype(np.float32)
+
+
+def user_block(plan, start, stop, seed=42, now=None):
+    """Gera as linhas ``[start, stop)`` da tabela de usuários como DataFrame colunar."""
+    rng = np.random.default_rng([seed, 0, start // BLOCK_ROWS])
+    now = now or datetime.now()
+    n = stop - start
+    pos = np.arange(start, stop, dtype=np.int64)
+
+    in_ring = pos < plan["n_ring_members"]
+    typology = np.full(n, TYPOLOGIES.index(RING_TYPOLOGY), dtype=np.int8)
+    typology[~in_ring] = plan["codes"][np.searchsorted(plan["bounds"], pos[~in_ring], side="right")]
+    ring_idx = pos[in_ring] // plan["ring_size"]
+
+    state = rng.choice(len(STATE_CODES), size=n, p=_STATE_WEIGHTS).astype(np.int8)
+    state[in_ring] = plan["ring_states"][ring_idx]
+    coords = _STATE_COORDS[state] + rng.normal(0.0, 0.35, (n, 2))
+
+    lo, hi = _SCORE_RANGE[typology, 0], _SCORE_RANGE[typology, 1]
+    risk_score = (lo + rng.random(n) * (hi - lo)).astype(np.int16)
+    age_lo, age_hi = _AGE_RANGE[typology, 0], _AGE_RANGE[typology, 1]
+    age_ns = ((age_lo + rng.random(n) * (age_hi - age_lo)) * 3.6e12).astype("timedelta64[ns]")
+    payment = _pick(rng, _PAYMENT_CHOICES, typology)
+    asn = _pick(rng, _ASN_CHOICES, typology)
+
+    # Identificadores textuais montados em lote pelo Arrow (sem laço Python por linha)
+    pos_str = pa.array(pos + 1).cast(pa.string())
+    typology_arr = pa.array(typology)
+    user_id = pc.binary_join_element_wise(
+        _USER_PREFIXES.take(typology_arr), _STATES_LOWER.take(pa.array(state)), pos_str, "_")
+    device_id = pc.binary_join_element_wise(_DEVICE_PREFIXES.take(typology_arr), pos_str, "_")
+    payment_method_id = pc.binary_join_element_wise(_PAYMENT_ID_PREFIXES.take(pa.array(payment)), pos_str, "_")
+    if in_ring.any():
+        # Aparelho compartilhado pelo anel, exceto os membros "ponte" (ligados só via PIX)
+        member = pos[in_ring] % plan["ring_size"]
+        bridge = member % RING_LINK_STRIDE == RING_LINK_STRIDE - 1
+        shares_device = np.zeros(n, dtype=bool)
+        shares_device[np.flatnonzero(in_ring)[~bridge]] = True
+        ring_device = pc.binary_join_element_wise(
+            "dev_shared", _STATES_UPPER.take(pa.array(state[shares_device])),
+            pa.array(pos[shares_device] // plan["ring_size"]).cast(pa.string()), "_")
+        device_id = pc.replace_with_mask(device_id, pa.array(shares_device), ring_device)
+
+        # Ponte e membro anterior usam a mesma chave PIX
+        paired = np.zeros(n, dtype=bool)
+        paired[np.flatnonzero(in_ring)[member % RING_LINK_STRIDE >= RING_LINK_STRIDE - 2]] = True
+        pair_key = pc.binary_join_element_wise(
+            "pix_key_anel", pa.array(pos[paired] // plan["ring_size"]).cast(pa.string()),
+            pa.array(pos[paired] % plan["ring_size"] // RING_LINK_STRIDE).cast(pa.string()), "_")
+        payment_method_id = pc.replace_with_mask(payment_method_id, pa.array(paired), pair_key)
+        payment[paired] = PAYMENT_TYPES.index("PIX")
+
+    return pd.DataFrame({
+        "user_id": user_id.to_pandas(),
+        "risk_score": risk_score,
+        "main_risk_factor": pd.Categorical.from_codes(typology, TYPOLOGIES),
+        "device_id": device_id.to_pandas(),
+        "payment_method_id": payment_method_id.to_pandas(),
+        "payment_type": pd.Categorical.from_codes(payment, PAYMENT_TYPES),
+        "ip_asn": pd.Categorical.from_codes(asn, ASNS),
+        "registration_time": np.datetime64(now, "ns") - age_ns,
+        "state": pd.Categorical.from_codes(state, STATE_CODES),
+        "lat": coords[:, 0].astype(np.float32),
+        "lon": coords[:, 1].astype(np.float32),
+        "status": pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), USER_STATUSES),
+        "total_deposited": _jitter(rng, _DEPOSIT[typology], n, 0.35).round(2),
+        "avg_bet_value": _jitter(rng, _AVG_BET[typology], n, 0.25).round(2),
+        "session_time_sec": np.maximum(_jitter(rng, _SESSION[typology], n, 0.3), 5).astype(np.int32),
+        "peer_group": pd.Categorical.from_codes(_PEER[typology], PEER_GROUPS),
+    })
+
+
+def bet_block(n_bets, start, stop, anomaly_rate=0.01, seed=42):
+    """Gera as linhas ``[start, stop)`` da tabela de apostas; as anômalas ocupam o final da tabela."""
+    rng = np.random.default_rng([seed, 1, start // BLOCK_ROWS])
+    n = stop - start
+    # As anômalas são o sufixo da tabela: dentro do bloco basta um ponto de corte
+    split = min(max(n_bets - int(round(n_bets * anomaly_rate)) - start, 0), n)
+    odd = rng.random(n, dtype=np.float32)
+    value = rng.random(n, dtype=np.float32)
+    odd[:split] = 1.1 + odd[:split] * 3.9
+    odd[split:] = 8.0 + odd[split:] * 17.0
+    value[:split] = 5.0 + value[:split] * 95.0
+    value[split:] = 200.0 + value[split:] * 300.0
+    codes = np.zeros(n, dtype=np.int8)
+    codes[split:] = 1
+    return pd.DataFrame({
+        "odd": odd,
+        "value": value,
+        "type": pd.Categorical.from_codes(codes, BET_TYPES),
+    })
+
+
+# Histórico rotulado: scores (Beta) das fraudes concentrados no topo e das legítimas no
+# fundo, com sobreposição; probabilidade de cada sinal (velocity, geo, device) por classe
+TRANSACTION_SCORE_BETA = {"fraud": (5.0, 1.6), "legit": (1.3, 6.0)}
+TRANSACTION_FLAG_RATES = {"velocity_flag": (0.35, 0.03), "geo_flag": (0.10, 0.005), "device_flag": (0.30, 0.02)}
+
+
+def transaction_block(start, stop, fraud_rate=0.01, seed=42):
+    """Gera as linhas ``[start, stop)`` do histórico de transações pontuadas e rotuladas."""
+    rng = np.random.default_rng([seed, 2, start // BLOCK_ROWS])
+    n = stop - start
+    is_fraud = rng.random(n) < fraud_rate
+    n_fraud = int(is_fraud.sum())
+    score = np.empty(n)
+    score[is_fraud] = rng.beta(*TRANSACTION_SCORE_BETA["fraud"], n_fraud)
+    score[~is_fraud] = rng.beta(*TRANSACTION_SCORE_BETA["legit"], n - n_fraud)
+    value = np.empty(n, dtype=np.float32)
+    value[is_fraud] = rng.lognormal(5.0, 1.0, n_fraud)
+    value[~is_fraud] = rng.lognormal(3.5, 1.0, n - n_fraud)
+    block = {"risk_score": np.minimum(score * 1001, 1000).astype(np.int16), "value": value.round(2), "is_fraud": is_fraud}
+    for flag, (fraud_rate_flag, legit_rate_flag) in TRANSACTION_FLAG_RATES.items():
+        block[flag] = rng.random(n) < np.where(is_fraud, fraud_rate_flag, legit_rate_flag)
+    return pd.DataFrame(block)
+
+
+def _block_ranges(n_rows):
+    # Tabela vazia ainda gera um bloco (vazio), para manter o esquema
+    return [(start, min(start + BLOCK_ROWS, n_rows)) for start in range(0, n_rows, BLOCK_ROWS)] or [(0, 0)]
+
+
+def iter_user_blocks(n_users, n_rings=1, ring_size=8, typology_mix=None, seed=42, now=None):
+    plan = population_plan(n_users, n_rings, ring_size, typology_mix, seed)
+    now = now or datetime.now()
+    for start, stop in _block_ranges(n_users):
+        yield user_block(plan, start, stop, seed, now)
+
+
+def iter_bet_blocks(n_bets, anomaly_rate=0.01, seed=42):
+    for start, stop in _block_ranges(n_bets):
+        yield bet_block(n_bets, start, stop, anomaly_rate, seed)
+
+
+def iter_transaction_blocks(n_transactions, fraud_rate=0.01, seed=42):
+    for start, stop in _block_ranges(n_transactions):
+        yield transaction_block(start, stop, fraud_rate, seed)
+
+
+def _concat(blocks):
+    blocks = list(blocks)
+    if len(blocks) == 1:
+        return blocks[0]
+    return pd.concat(blocks, ignore_index=True)
+
+
+def generate_synthetic_data(n_users=11, n_bets=420, n_rings=1, ring_size=8, typology_mix=None,
+                            anomaly_rate=20 / 420, seed=42, now=None, n_transactions=0, fraud_rate=0.01):
+    """Gera ``(df_users, df_bets)`` em memória, no mesmo esquema consumido pelos gráficos.
+
+    O histórico de transações (``n_transactions``) não entra aqui: ele só é gravado em
+    disco, bloco a bloco, por ``write_synthetic_dataset``.
+    """
+    df_users = _concat(iter_user_blocks(n_users, n_rings, ring_size, typology_mix, seed, now))
+    df_bets = _concat(iter_bet_blocks(n_bets, anomaly_rate, seed))
+    return df_users, df_bets
+
+
+def write_synthetic_dataset(root, n_users=11, n_bets=420, n_rings=1, ring_size=8, typology_mix=None,
+                            anomaly_rate=20 / 420, seed=42, now=None, fmt="arrow", n_transactions=0, fraud_rate=0.01):
+    """Grava o conjunto sintético nas tabelas ``users``, ``bets`` e ``transactions`` do ``DatasetStore`` em ``root``.
+
+    Cada bloco vira uma partição e apenas um bloco fica em memória por vez, então o
+    tamanho total não é limitado pela RAM.
+    """
+    store = DatasetStore(root)
+    params = {"n_users": n_users, "n_bets": n_bets, "n_rings": n_rings, "ring_size": ring_size,
+              "typology_mix": typology_mix, "anomaly_rate": anomaly_rate, "seed": seed,
+              "n_transactions": n_transactions, "fraud_rate": fraud_rate, "generator_version": GENERATOR_VERSION}
+    tables = {
+        "users": iter_user_blocks(n_users, n_rings, ring_size, typology_mix, seed, now),
+        "bets": iter_bet_blocks(n_bets, anomaly_rate, seed),
+        "transactions": iter_transaction_blocks(n_transactions, fraud_rate, seed),
+    }
+    return {name: store.write_table(name, blocks, fmt, metadata={"synthetic_params": params})["rows"]
+            for name, blocks in tables.items()}
+
+
+def ensure_synthetic_dataset(root, **params):
+    """Abre o ``DatasetStore`` em ``root``, gerando os dados só se faltarem ou forem de outros parâmetros."""
+    store = DatasetStore(root)
+    wanted = json.loads(json.dumps({"seed": 42, "typology_mix": None, **params, "generator_version": GENERATOR_VERSION}))
+    for name in ("users", "bets", "transactions"):
+        manifest = store.manifest(name)
+        stored = (manifest or {}).get("metadata", {}).get("synthetic_params", {})
+        if manifest is None or any(stored.get(k) != v for k, v in wanted.items()):
+            write_synthetic_dataset(root, **params)
+            break
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de usuários, apostas e transações em disco.")
+    parser.add_argument("--perfil", choices=sorted(DATA_PROFILES), default="carga")
+    parser.add_argument("--usuarios", type=int, help="sobrescreve o número de usuários do perfil")
+    parser.add_argument("--apostas", type=int, help="sobrescreve o número de apostas do perfil")
+    parser.add_argument("--aneis", type=int, help="sobrescreve o número de anéis de fraude do perfil")
+    parser.add_argument("--transacoes", type=int, help="sobrescreve o tamanho do histórico de transações do perfil")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--formato", choices=("arrow", "parquet"), default="arrow",
+                        help="arrow (memory-map, sem cópia) ou parquet (comprimido)")
+    parser.add_argument("--saida", required=True, help="diretório de destino")
+    args = parser.parse_args(argv)
+
+    params = dict(DATA_PROFILES[args.perfil])
+    for key, value in (("n_users", args.usuarios), ("n_bets", args.apostas), ("n_rings", args.aneis),
+                       ("n_transactions", args.transacoes)):
+        if value is not None:
+            params[key] = value
+
+    started = time.perf_counter()
+    written = write_synthetic_dataset(args.saida, seed=args.semente, fmt=args.formato, **params)
+    elapsed = time.perf_counter() - started
+    print(f"{written['users']:,} usuários, {written['bets']:,} apostas e {written['transactions']:,} transações "
+          f"gravados em {elapsed:.1f}s -> {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Treino do modelo de fraude (regressão logística em NumPy) fora da thread do Streamlit.
+
+O modelo aprende ``is_fraud`` do histórico rotulado de transações a partir de cinco
+features (score, valor e os três sinais), padronizadas com média e escala fixadas no
+primeiro lote. ``partial_fit`` faz uma passada de SGD em mini-lotes a partir dos pesos
+atuais (warm start), então uma atualização incremental é só mais uma passada sobre os
+rótulos novos. As fraudes pesam ``POS_WEIGHT`` vezes mais no gradiente, o que desloca as
+probabilidades; ``calibrate`` reajusta inclinação e intercepto (Platt) em rótulos
+recentes e dobra o ajuste nos próprios pesos.
+
+``ModelTrainer`` roda cada pedaço do treino (``TRAIN_CHUNK_ROWS`` linhas) num processo
+do pool. O processo lê as linhas direto do ``DatasetStore`` mapeado; só os pesos (alguns
+floats) vão e voltam. Entre um pedaço e outro, o chamador recebe o progresso e pode
+cancelar. Cada versão treinada é medida nas últimas linhas do histórico (nunca usadas
+no treino, ver ``holdout_start``) e publicada no ``ModelRegistry``; o deploy fica a cargo
+de quem chama. A avaliação contínua da versão em produção vem do ``LabelReplay`` sobre
+essas mesmas linhas, não do treino.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from guardian.evaluation import ModelEvaluator
+from guardian.storage import DatasetStore
+
+FEATURES = ("risk_score", "value", "velocity_flag", "geo_flag", "device_flag")
+LABEL = "is_fraud"
+POS_WEIGHT = 10.0
+LEARNING_RATE = 0.05
+BATCH_SIZE = 4096
+L2 = 1e-4
+TRAIN_CHUNK_ROWS = 100_000
+FULL_TRAIN_MAX_ROWS = 2_000_000
+FULL_TRAIN_EPOCHS = 3
+INCREMENTAL_ROWS = 50_000
+CALIBRATION_ROWS = 100_000
+HOLDOUT_FRACTION = 0.2
+HOLDOUT_MAX_ROWS = 500_000
+# Limiar (probabilidade) em que precisão e recall da validação são medidos
+HOLDOUT_THRESHOLD = 0.5
+MP_START_METHOD = "spawn"
+MODES = ("completo", "incremental", "calibracao")
+
+
+def transaction_features(table):
+    """Matriz de features (linhas x ``FEATURES``) de um bloco de transações."""
+    columns = [np.asarray(table[name]).astype(np.float64) for name in FEATURES]
+    columns[0] = columns[0] / 1000
+    columns[1] = np.log1p(columns[1])
+    return np.column_stack(columns)
+
+
+def holdout_start(rows):
+    """Primeira linha reservada à validação num histórico de ``rows`` transações (as anteriores são de treino)."""
+    return rows - min(int(rows * HOLDOUT_FRACTION), HOLDOUT_MAX_ROWS)
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+class LogisticModel:
+    """Regressão logística com padronização embutida; pesos exportáveis como arrays."""
+
+    def __init__(self, n_features=len(FEATURES)):
+        self.weights = np.zeros(n_features)
+        self.bias = 0.0
+        self.mean = None
+        self.scale = None
+        self.rows_trained = 0
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        model = cls(len(arrays["weights"]))
+        model.weights = np.array(arrays["weights"], dtype=np.float64)
+        model.bias = float(arrays["bias"][0])
+        model.mean = np.array(arrays["mean"], dtype=np.float64)
+        model.scale = np.array(arrays["scale"], dtype=np.float64)
+        model.rows_trained = int(arrays["rows_trained"][0])
+        return model
+
+    def to_arrays(self):
+        return {"weights": self.weights.copy(), "bias": np.array([self.bias]), "mean": self.mean.copy(),
+                "scale": self.scale.copy(), "rows_trained": np.array([self.rows_trained], dtype=np.int64)}
+
+    def decision(self, X):
+        return ((X - self.mean) / self.scale) @ self.weights + self.bias
+
+    def predict_proba(self, X):
+        return _sigmoid(self.decision(X))
+
+    def partial_fit(self, X, y, learning_rate=LEARNING_RATE, batch_size=BATCH_SIZE, l2=L2, pos_weight=POS_WEIGHT, seed=0):
+        """Uma passada de SGD em mini-lotes a partir dos pesos atuais; devolve a log-loss média (ponderada)."""
+        if self.mean is None:
+            self.mean = X.mean(axis=0)
+            self.scale = np.where(X.std(axis=0) > 0, X.std(axis=0), 1.0)
+        Z = (X - self.mean) / self.scale
+        y = np.asarray(y, dtype=np.float64)
+        order = np.random.default_rng(seed).permutation(len(y))
+        loss = 0.0
+        for start in range(0, len(y), batch_size):
+            rows = order[start:start + batch_size]
+            z, t = Z[rows], y[rows]
+            p = _sigmoid(z @ self.weights + self.bias)
+            sample_weight = np.where(t > 0, pos_weight, 1.0)
+            error = sample_weight * (p - t)
+            self.weights -= learning_rate * (z.T @ error / len(rows) + l2 * self.weights)
+            self.bias -= learning_rate * error.mean()
+            loss -= (sample_weight * (t * np.log(p + 1e-12) + (1 - t) * np.log(1 - p + 1e-12))).sum()
+        self.rows_trained += len(y)
+        return loss / max(len(y), 1)
+
+    def calibrate(self, X, y, iterations=25):
+        """Platt: ajusta ``p = sigmoid(a * logit + b)`` por Newton e dobra ``a`` e ``b`` nos pesos."""
+        z = self.decision(X)
+        y = np.asarray(y, dtype=np.float64)
+        a, b = 1.0, 0.0
+        for _ in range(iterations):
+            p = _sigmoid(a * z + b)
+            w = np.maximum(p * (1 - p), 1e-9)
+            gradient = np.array([((p - y) * z).sum(), (p - y).sum()])
+            hessian = np.array([[(w * z * z).sum(), (w * z).sum()], [(w * z).sum(), w.sum()]]) + 1e-9 * np.eye(2)
+            step = np.linalg.solve(hessian, gradient)
+            a, b = a - step[0], b - step[1]
+            if np.abs(step).max() < 1e-8:
+                break
+        self.weights = self.weights * a
+        self.bias = self.bias * a + b
+        return a, b
+
+
+def _read_rows(data_root, start, stop):
+    table = DatasetStore(data_root).read_table("transactions", [*FEATURES, LABEL]).slice(start, stop - start)
+    return transaction_features(table), table.column(LABEL).to_numpy(zero_copy_only=False)
+
+
+def fit_chunk(data_root, arrays, start, stop, seed=0):
+    """Uma passada de ``partial_fit`` nas linhas ``[start, stop)`` (roda no processo do pool)."""
+    X, y = _read_rows(data_root, start, stop)
+    model = LogisticModel.from_arrays(arrays) if arrays is not None else LogisticModel()
+    loss = model.partial_fit(X, y, seed=seed)
+    return model.to_arrays(), loss
+
+
+def calibrate_chunk(data_root, arrays, start, stop):
+    """Calibração de Platt nas linhas ``[start, stop)`` (roda no processo do pool)."""
+    X, y = _read_rows(data_root, start, stop)
+    model = LogisticModel.from_arrays(arrays)
+    a, b = model.calibrate(X, y)
+    return model.to_arrays(), {"slope": float(a), "intercept": float(b)}
+
+
+class ModelTrainer:
+    """Treina, valida e registra versões de um modelo, com os pedaços do treino num processo à parte."""
+
+    def __init__(self, registry, data_root, max_workers=1, start_method=MP_START_METHOD):
+        self.registry = registry
+        self.data_root = data_root
+        self.max_workers = max_workers
+        self.start_method = start_method
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context(self.start_method))
+            return self._pool
+
+    def _split(self):
+        """Linhas de treino e de validação (as últimas) do histórico."""
+        rows = DatasetStore(self.data_root).manifest("transactions")["rows"]
+        return holdout_start(rows), rows
+
+    def plan(self, mode, parent_metadata=None):
+        """Faixas de linhas ``(início, fim)`` de cada pedaço e a posição de leitura ao final."""
+        train_rows, _ = self._split()
+        if mode == "calibracao":
+            return [(max(0, train_rows - CALIBRATION_ROWS), train_rows)], (parent_metadata or {}).get("rows_seen", 0)
+        if mode == "incremental":
+            # Os rótulos "novos" são as linhas seguintes às já vistas (recomeçando do início ao fim do treino)
+            start = (parent_metadata or {}).get("rows_seen", 0) % max(train_rows, 1)
+            stop = min(start + INCREMENTAL_ROWS, train_rows)
+            return [(lo, min(lo + TRAIN_CHUNK_ROWS, stop)) for lo in range(start, stop, TRAIN_CHUNK_ROWS)], stop
+        stop = min(train_rows, FULL_TRAIN_MAX_ROWS)
+        chunks = [(lo, min(lo + TRAIN_CHUNK_ROWS, stop)) for lo in range(0, stop, TRAIN_CHUNK_ROWS)]
+        return chunks * FULL_TRAIN_EPOCHS, stop
+
+    def train(self, model_name, mode, progress=None):
+        """Treina uma nova versão de ``model_name`` e a registra (sem deploy).
+
+        ``mode``: ``completo`` (do zero), ``incremental`` (warm start da última versão
+        sobre os rótulos seguintes) ou ``calibracao`` (Platt sobre a última versão). Sem
+        versão anterior, ``incremental`` e ``calibracao`` treinam do zero. ``progress(fração,
+        etapa)`` é chamado entre os pedaços; uma exceção nele interrompe o treino sem
+        registrar nada. As métricas da validação ficam só nos metadados da versão.
+        """
+        started = time.perf_counter()
+        parent = self.registry.latest_version(model_name)
+        if mode not in MODES:
+            raise ValueError(f"Modo de treino desconhecido: {mode!r} (use {MODES})")
+        if parent is None:
+            mode = "completo"
+        parent_arrays, parent_metadata = (None, {}) if mode == "completo" else self.registry.load(model_name, parent)
+        arrays = None if parent_arrays is None else {name: np.array(array) for name, array in parent_arrays.items()}
+        chunks, rows_seen = self.plan(mode, parent_metadata)
+        pool, losses = self._executor(), []
+        for done, (start, stop) in enumerate(chunks):
+            if progress is not None:
+                progress(done / (len(chunks) + 1), f"{'Calibrando' if mode == 'calibracao' else 'Treinando'}: "
+                                                   f"linhas {start:,}–{stop:,} ({done + 1} de {len(chunks)})")
+            if mode == "calibracao":
+                arrays, calibration = pool.submit(calibrate_chunk, self.data_root, arrays, start, stop).result()
+            else:
+                arrays, loss = pool.submit(fit_chunk, self.data_root, arrays, start, stop, done).result()
+                losses.append(loss)
+        if progress is not None:
+            progress(len(chunks) / (len(chunks) + 1), "Validando nas transações reservadas...")
+
+        validation = self.validate(LogisticModel.from_arrays(arrays))
+        metadata = {"mode": mode, "parent": None if mode == "completo" else parent, "features": list(FEATURES),
+                    "rows_seen": rows_seen, "chunks": len(chunks), "train_loss": losses[-1] if losses else None,
+                    "calibration": calibration if mode == "calibracao" else None,
+                    "validation": {key: value for key, value in validation.items() if key not in ("scores", "labels")},
+                    "seconds": time.perf_counter() - started}
+        version = self.registry.save(model_name, arrays, metadata)
+        return {"version": version, **metadata}
+
+    def validate(self, model):
+        """Métricas da versão nas linhas de validação (no ``HOLDOUT_THRESHOLD``) e os scores delas."""
+        train_rows, rows = self._split()
+        X, y = _read_rows(self.data_root, train_rows, rows)
+        scores = model.predict_proba(X)
+        evaluator = ModelEvaluator(n_bootstrap=0)
+        evaluator.observe("validação", "-", scores, y)
+        metrics = evaluator.evaluate("validação", threshold=HOLDOUT_THRESHOLD, confidence=None)
+        log_loss = -np.mean(np.where(y, np.log(scores + 1e-12), np.log(1 - scores + 1e-12))) if len(y) else 0.0
+        return {"rows": int(len(y)), "precision": metrics["precision"], "recall": metrics["recall"],
+                "pr_auc": metrics["pr_auc"], "log_loss": float(log_loss), "scores": scores, "labels": y}
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,67 @@
+"""Benchmark: gráfico de apostas por grade de densidade vs. um ponto por aposta.
+
+Uso: python scripts/bench_density.py [--apostas 10000000] [--orcamento 262144]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guardian.density import BetDensity  # noqa: E402
+from guardian.synthetic import iter_bet_blocks  # noqa: E402
+
+# Acima disso o gráfico ponto a ponto nem é serializado: o tamanho é extrapolado
+POINTS_BASELINE_MAX = 1_000_000
+
+
+def payload_bytes(view):
+    """Bytes do JSON de uma figura equivalente à do app (heatmap + pontos anômalos)."""
+    counts = view["counts"].T.astype(np.float32)
+    density = np.log10(counts, where=counts > 0, out=np.full_like(counts, np.nan))
+    return len(pio.to_json(go.Figure([
+        go.Heatmap(x=view["x_edges"], y=view["y_edges"], z=density),
+        go.Scattergl(x=view["anomaly_value"], y=view["anomaly_odd"], mode="markers"),
+    ]), validate=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apostas", type=int, default=10_000_000)
+    parser.add_argument("--orcamento", type=int, default=256 * 1024, help="bytes por gráfico")
+    args = parser.parse_args()
+
+    table = pa.Table.from_batches([pa.RecordBatch.from_pandas(block, preserve_index=False)
+                                   for block in iter_bet_blocks(args.apostas)])
+
+    sample = table.slice(0, min(args.apostas, POINTS_BASELINE_MAX))
+    points = len(pio.to_json(go.Figure(go.Scattergl(x=sample.column("value").to_numpy(), y=sample.column("odd").to_numpy(),
+                                                    mode="markers")), validate=False))
+    points = points * args.apostas / max(sample.num_rows, 1)
+
+    started = time.perf_counter()
+    density = BetDensity(table)
+    build = time.perf_counter() - started
+    print(f"{args.apostas:,} apostas | grade base: {build:.2f}s | um ponto por aposta: ~{points / 1e6:,.1f} MB")
+
+    x_mid, y_mid = sum(density.x_extent) / 2, sum(density.y_extent) / 2
+    windows = (("tudo", None, None),
+               ("zoom 10x", (density.x_extent[0], x_mid / 5), (density.y_extent[0], y_mid / 5)),
+               ("zoom fino", (20.0, 20.5), (2.0, 2.05)))
+    print(f"{'janela':<12}{'vista (ms)':>12}{'células':>10}{'anômalas':>12}{'payload (KB)':>14}{'exata':>8}")
+    for name, x_range, y_range in windows:
+        started = time.perf_counter()
+        view = density.view(x_range, y_range, args.orcamento)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<12}{elapsed * 1e3:>12.1f}{view['counts'].size:>10,}{view['anomalies_shown']:>12,}"
+              f"{payload_bytes(view) / 1024:>14.1f}{'sim' if view['exact'] else 'não':>8}")
+
+
+if __name__ == "__main__":
+    main()
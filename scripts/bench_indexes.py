@@ -0,0 +1,66 @@
+"""Benchmark: índices hash (UserIndex) vs. varreduras com máscara booleana.
+
+Uso: python scripts/bench_indexes.py [--usuarios 5000000] [--repeticoes 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guardian.indexes import UserIndex  # noqa: E402
+from guardian.synthetic import DATA_PROFILES, generate_synthetic_data  # noqa: E402
+
+
+def _per_call(fn, keys):
+    started = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return (time.perf_counter() - started) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=5_000_000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    params = dict(DATA_PROFILES["carga"], n_users=args.usuarios, n_bets=0)
+    df_users, _ = generate_synthetic_data(**params)
+    rng = np.random.default_rng(0)
+    sample = df_users.iloc[rng.integers(0, len(df_users), args.repeticoes)]
+    scan_sample = sample.iloc[:max(args.repeticoes // 20, 3)]
+
+    started = time.perf_counter()
+    index = UserIndex(df_users)
+    build = time.perf_counter() - started
+
+    rows = [
+        ("busca por user_id",
+         _per_call(lambda k: df_users[df_users['user_id'] == k].iloc[0], scan_sample['user_id']),
+         _per_call(index.position, sample['user_id'])),
+        ("vizinhos por device_id",
+         _per_call(lambda k: df_users.loc[df_users['device_id'] == k, 'user_id'], scan_sample['device_id']),
+         _per_call(lambda k: index.neighbours('device_id', k), sample['device_id'])),
+        ("vizinhos por payment_method_id",
+         _per_call(lambda k: df_users.loc[df_users['payment_method_id'] == k, 'user_id'], scan_sample['payment_method_id']),
+         _per_call(lambda k: index.neighbours('payment_method_id', k), sample['payment_method_id'])),
+    ]
+
+    new_users = df_users.iloc[:10_000]
+    started = time.perf_counter()
+    index.add_users(new_users)
+    add = time.perf_counter() - started
+
+    print(f"{len(df_users):,} usuários | construção do índice: {build:.2f}s | "
+          f"inserção incremental de {len(new_users):,}: {add * 1e3:.1f} ms")
+    print(f"{'operação':<32}{'máscara (ms)':>14}{'índice (µs)':>14}{'ganho':>10}")
+    for name, scan, indexed in rows:
+        print(f"{name:<32}{scan * 1e3:>14.2f}{indexed * 1e6:>14.1f}{scan / indexed:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
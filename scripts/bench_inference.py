@@ -0,0 +1,55 @@
+"""Benchmark: vazão (linhas/s) por cabeça de risco conforme o número de processos do pool.
+
+Uso: python scripts/bench_inference.py [--contas 10000000] [--processos 1,2,4]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guardian.inference import FEATURES, HEADS, BatchInference  # noqa: E402
+
+
+def worker_counts():
+    """1, 2, 4, ... até o número de núcleos (inclusive)."""
+    cores = os.cpu_count() or 1
+    counts = [1 << i for i in range(cores.bit_length()) if 1 << i < cores]
+    return ",".join(map(str, counts + [cores]))
+
+
+def fill_features(out, seed=0):
+    """Matriz sintética com a mesma escala das features reais (log-razões e indicadores 0/1)."""
+    rng = np.random.default_rng(seed)
+    for index, name in enumerate(FEATURES):
+        if name in ("datacenter", "proxy", "credit_card", "pix"):
+            out[:, index] = rng.random(len(out), dtype=np.float32) < 0.2
+        else:
+            out[:, index] = rng.standard_normal(len(out), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contas", type=int, default=10_000_000)
+    parser.add_argument("--processos", default=worker_counts(), help="lista de tamanhos de pool, separados por vírgula")
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in map(int, args.processos.split(",")):
+        engine = BatchInference(max_workers=workers)
+        try:
+            result = engine.predict("bench", args.contas, fill_features)
+        finally:
+            engine.close()
+        rates = {head: stats["rows_per_sec"] for head, stats in result["heads"].items()}
+        baseline = baseline or rates
+        print(f"{workers} processo(s) | layout da matriz: {result['layout_seconds']:.2f}s | " + " | ".join(
+            f"{head}: {rate / 1e6:,.1f}M linhas/s ({rate / baseline[head]:.2f}x)" for head, rate in rates.items()))
+    print(f"{args.contas:,} contas x {len(FEATURES)} features "
+          f"({args.contas * len(FEATURES) * 4 / 2**20:,.0f} MiB em memória compartilhada), {len(HEADS)} cabeças")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark: fila de investigação (InvestigationQueue) vs. filtro + ordenação completa.
+
+Uso: python scripts/bench_queue.py [--casos 1000000] [--paginas 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guardian.queue import InvestigationQueue  # noqa: E402
+from guardian.synthetic import DATA_PROFILES, generate_synthetic_data  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--casos", type=int, default=1_000_000)
+    parser.add_argument("--paginas", type=int, default=200)
+    args = parser.parse_args()
+
+    params = dict(DATA_PROFILES["carga"], n_users=args.casos, n_bets=0)
+    df_users, _ = generate_synthetic_data(**params)
+    blocked = np.zeros(len(df_users), dtype=bool)
+
+    started = time.perf_counter()
+    queue = InvestigationQueue(df_users['risk_score'], df_users['main_risk_factor'])
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(5):
+        df_users[df_users['risk_score'] >= 800].sort_values('risk_score', ascending=False).head(10)
+    full_sort = (time.perf_counter() - started) / 5
+
+    print(f"{len(queue):,} casos | construção do índice: {build:.2f}s | filtro + sort_values: {full_sort * 1e3:.1f} ms")
+    print(f"{'filtro':<24}{'1ª página (ms)':>16}{'página funda (ms)':>20}")
+    for name, min_score, codes in (("todos", 0, None), ("score 800+", 800, None),
+                                   ("Bônus", 0, queue.typology_codes("Bônus"))):
+        started = time.perf_counter()
+        _, _, cursor = queue.page(10, min_score, codes, blocked=blocked)
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(args.paginas):
+            _, _, cursor = queue.page(10, min_score, codes, after=cursor, blocked=blocked)
+        deep = (time.perf_counter() - started) / args.paginas
+        print(f"{name:<24}{first * 1e3:>16.3f}{deep * 1e3:>20.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Segmentos de memória compartilhada da ``BatchInference``."""
+import os
+
+import numpy as np
+import pytest
+
+from guardian.inference import FEATURES, HEADS, BatchInference
+
+SHM_DIR = "/dev/shm"
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(SHM_DIR), reason="sem /dev/shm")
+
+
+def test_close_leaves_no_shared_memory_segment():
+    before = set(os.listdir(SHM_DIR))
+    engine = BatchInference(max_workers=1)
+    try:
+        result = engine.predict("teste", 1000, lambda matrix: matrix.fill(0.5))
+        segment = engine._features[0].name
+        assert os.path.exists(os.path.join(SHM_DIR, segment.lstrip("/")))
+    finally:
+        engine.close()
+    assert set(result["columns"]) == set(HEADS)
+    assert set(os.listdir(SHM_DIR)) <= before
+
+
+def test_failed_fill_leaves_no_shared_memory_segment():
+    before = set(os.listdir(SHM_DIR))
+    engine = BatchInference(max_workers=1)
+
+    def fill(matrix):
+        matrix[:, :len(FEATURES)] = np.nan
+        raise RuntimeError("falha ao montar as features")
+
+    try:
+        with pytest.raises(RuntimeError):
+            engine.predict("teste", 1000, fill)
+    finally:
+        engine.close()
+    assert set(os.listdir(SHM_DIR)) <= before
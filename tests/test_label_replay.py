@@ -0,0 +1,44 @@
+"""Rótulos do ``LabelReplay`` para uma versão treinada e implantada no meio do replay."""
+from guardian.evaluation import LabelReplay, ModelEvaluator
+from guardian.registry import ModelRegistry
+from guardian.storage import DatasetStore
+from guardian.synthetic import iter_transaction_blocks
+from guardian.training import LogisticModel, ModelTrainer, holdout_start, transaction_features
+
+MODEL = "Fraud Detection"
+
+
+def test_deployed_version_labels_never_exceed_confirmed(tmp_path):
+    store = DatasetStore(str(tmp_path / "data"))
+    store.write_table("transactions", iter_transaction_blocks(20_000, fraud_rate=0.05))
+    registry = ModelRegistry(str(tmp_path / "models"))
+    table = store.read_table("transactions")
+    holdout = table.slice(holdout_start(table.num_rows))
+
+    def score(batch):
+        production = registry.production(MODEL)
+        if production is None:
+            return {}
+        version, weights, _ = production
+        return {(MODEL, version): LogisticModel.from_arrays(weights).predict_proba(transaction_features(batch))}
+
+    evaluator = ModelEvaluator(n_bootstrap=0)
+    replay = LabelReplay(evaluator, holdout, score, rows_per_tick=500)
+    replay._feed(1000)
+    trainer = ModelTrainer(registry, store.root)
+    try:
+        version = trainer.train(MODEL, "completo")["version"]
+    finally:
+        trainer.close()
+    assert evaluator.histogram(MODEL, version) is None
+
+    registry.deploy(MODEL, version)
+    # Lote confirmado antes do catch-up perceber o deploy: não pode ser somado duas vezes
+    replay._feed(500)
+    for _ in range(holdout.num_rows):
+        replay._catch_up()
+        assert evaluator.histogram(MODEL, version).sum() == replay.confirmed
+        if replay.confirmed == holdout.num_rows:
+            break
+        replay._feed(replay.rows_per_tick)
+    assert replay.confirmed == holdout.num_rows
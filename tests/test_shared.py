@@ -0,0 +1,35 @@
+"""Projeções do ``SharedDataset`` quando a tabela é reaberta durante a conversão."""
+import pyarrow as pa
+
+from guardian.shared import SharedDataset
+from guardian.storage import DatasetStore
+from guardian.synthetic import write_synthetic_dataset
+
+
+class RefreshingTable:
+    """Tabela que reabre ``name`` no ``SharedDataset`` no meio da conversão para pandas."""
+
+    def __init__(self, shared, name, table):
+        self.shared, self.name, self.table = shared, name, table
+
+    def to_pandas(self, **kwargs):
+        frame = self.table.to_pandas(**kwargs)
+        self.shared.refresh(self.name)
+        return frame
+
+
+def test_frame_built_during_refresh_is_not_cached(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    write_synthetic_dataset(store.root, n_users=50, n_bets=100)
+    shared = SharedDataset(store)
+    store.rewrite_table("users", lambda table: table.set_column(
+        table.schema.get_field_index("total_deposited"), "total_deposited",
+        pa.array([0.0] * table.num_rows, type=table.schema.field("total_deposited").type)))
+    shared._tables["users"] = RefreshingTable(shared, "users", shared._tables["users"])
+
+    stale = shared.frame("users")
+    assert stale["total_deposited"].sum() > 0
+    assert ("users", None) not in shared._frames
+    fresh = shared.frame("users")
+    assert fresh["total_deposited"].sum() == 0
+    assert shared.frame("users") is fresh